@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Multi-slot save archive: many save slots in one file.
+
+    header   MAGIC, version (u16), offset and length of the current index (u64, u32)
+    blobs    saves in the savefile format, appended as slots are written
+    index    JSON list of {slot, offset, length, depth, class, saved_at}
+
+Writing a slot appends its save to the file. A timer thread then appends a
+new index (one for every save within ARCHIVE_FLUSH_DELAY seconds), syncs
+the file and points the header at the new index, so the previous state stays
+readable until the header changes; a crash loses at most the saves of the
+last delay. Superseded saves and indexes are left behind as garbage; once
+they make up more than ARCHIVE_COMPACT_RATIO of the file a background thread
+rewrites the archive with only the live slots. It copies them without the
+lock, so slots are still saved and loaded meanwhile, and takes it only to
+copy the slots saved since it started and swap the files. Slots are read
+through a memory map, so loading one touches only its own bytes.
+
+    python archive.py saves.arc            # list slots
+    python archive.py saves.arc --compact  # compact now
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+import savefile
+from config import ARCHIVE_COMPACT_RATIO, ARCHIVE_FLUSH_DELAY
+
+MAGIC = b'SOTX'
+VERSION = 1
+HEADER = struct.Struct('<4sHQI')
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class SaveArchive:
+    def __init__(self, path: str, compact_ratio: float = ARCHIVE_COMPACT_RATIO,
+                 flush_delay: float = ARCHIVE_FLUSH_DELAY):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.flush_delay = flush_delay
+        # Serializes writers, index flushes and the end of a compaction
+        self._lock = threading.Lock()
+        # Pending index write, while the file has saves the header doesn't cover
+        self._flusher: Optional[threading.Timer] = None
+        # One compaction at a time
+        self._compacting = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self.index: Dict[str, Dict] = {}
+        if not os.path.exists(path):
+            self._write_empty()
+        self._read_index()
+
+    # -------------------------
+    # Index
+    # -------------------------
+    def _write_empty(self):
+        index = b'[]'
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, HEADER.size, len(index)))
+            f.write(index)
+
+    def _read_index(self):
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ArchiveError("Archive is truncated")
+            magic, version, offset, length = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ArchiveError("Not a Shadows of the Abyss save archive")
+            if version != VERSION:
+                raise ArchiveError(f"Unsupported archive version {version}")
+            f.seek(offset)
+            entries = json.loads(f.read(length).decode('utf-8'))
+        self.index = {entry['slot']: entry for entry in entries}
+
+    def slots(self) -> List[Dict]:
+        """Slot entries (slot, depth, class, saved_at), most recent first."""
+        return sorted(self.index.values(), key=lambda entry: entry['saved_at'], reverse=True)
+
+    def __contains__(self, slot: str) -> bool:
+        return slot in self.index
+
+    def garbage_ratio(self) -> float:
+        size = os.path.getsize(self.path)
+        live = HEADER.size + sum(entry['length'] for entry in self.index.values())
+        return 1 - live / size if size else 0.0
+
+    # -------------------------
+    # Slots
+    # -------------------------
+    def save(self, slot: str, game):
+        data = savefile.encode_game(game)
+        with self._lock:
+            with open(self.path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(data)
+            # A new dict, so readers outside the lock never see one change
+            index = dict(self.index)
+            index[slot] = {
+                'slot': slot,
+                'offset': offset,
+                'length': len(data),
+                'depth': game.dungeon_level,
+                'class': game.player.character_class,
+                'saved_at': time.time(),
+            }
+            self.index = index
+            self._schedule_flush()
+        self._maybe_compact()
+
+    def delete(self, slot: str):
+        with self._lock:
+            index = dict(self.index)
+            del index[slot]
+            self.index = index
+            self._schedule_flush()
+        self._maybe_compact()
+
+    def _schedule_flush(self):
+        # With the lock held
+        if self._flusher is None:
+            self._flusher = threading.Timer(self.flush_delay, self.flush)
+            self._flusher.daemon = True
+            self._flusher.start()
+
+    def flush(self):
+        """Writes the index for the slots saved or deleted since the last
+        flush (run by a timer after a save, and on close)."""
+        with self._lock:
+            if self._flusher is None:
+                return
+            self._flusher.cancel()
+            self._flusher = None
+            with open(self.path, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                self._append_index(f, self.index)
+
+    def _append_index(self, f, index: Dict[str, Dict]):
+        # The blobs and index must be on disk before the header points at them
+        encoded = json.dumps(list(index.values())).encode('utf-8')
+        offset = f.tell()
+        f.write(encoded)
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, offset, len(encoded)))
+        f.flush()
+
+    def read(self, slot: str) -> bytes:
+        # The lock keeps a compaction from swapping the file between
+        # looking up the slot and reading it
+        with self._lock, open(self.path, 'rb') as f:
+            entry = self.index[slot]
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[entry['offset']:entry['offset'] + entry['length']]
+
+    def load(self, slot: str, game):
+        game.apply_save_state(savefile.decode_game(self.read(slot)))
+
+    # -------------------------
+    # Compaction
+    # -------------------------
+    def _maybe_compact(self):
+        if self.garbage_ratio() > self.compact_ratio:
+            self.compact_async()
+
+    def compact_async(self):
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        """Rewrites the archive with only the live slots."""
+        with self._compacting:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            snapshot = dict(self.index)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as dst:
+            dst.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+            copied = self._copy_slots(snapshot.values(), dst)
+            # Synced now, so the sync with the lock held only covers the rest
+            dst.flush()
+            os.fsync(dst.fileno())
+        # Held open until the lock is released, so freeing the old file
+        # (slow for a big one) happens after the swap, not during it
+        with open(self.path, 'rb'):
+            with self._lock:
+                # Slots saved while copying; deleted ones are left out
+                with open(tmp, 'r+b') as dst:
+                    dst.seek(0, os.SEEK_END)
+                    copied.update(self._copy_slots(
+                        [entry for slot, entry in self.index.items() if snapshot.get(slot) is not entry], dst))
+                    index = {slot: copied[slot] for slot in self.index}
+                    self._append_index(dst, index)
+                os.replace(tmp, self.path)
+                self.index = index
+                # The new file's index already covers any pending flush
+                if self._flusher is not None:
+                    self._flusher.cancel()
+                    self._flusher = None
+
+    def _copy_slots(self, entries, dst) -> Dict[str, Dict]:
+        """Appends the entries' saves to dst; returns their entries there."""
+        copied = {}
+        with open(self.path, 'rb') as src:
+            with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for entry in sorted(entries, key=lambda e: e['offset']):
+                    start = entry['offset']
+                    copied[entry['slot']] = dict(entry, offset=dst.tell())
+                    dst.write(mapped[start:start + entry['length']])
+        return copied
+
+    def close(self):
+        # Lets a running compaction finish, then writes any pending index
+        if self._compactor is not None:
+            self._compactor.join()
+        self.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or compact a save archive")
+    parser.add_argument('archive')
+    parser.add_argument('--compact', action='store_true')
+    args = parser.parse_args()
+
+    archive = SaveArchive(args.archive)
+    if args.compact:
+        before = os.path.getsize(args.archive)
+        archive.compact()
+        print(f"Compacted {before} -> {os.path.getsize(args.archive)} bytes")
+    for entry in archive.slots():
+        saved_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['saved_at']))
+        print(f"{entry['slot']:<20} {entry['class']:<10} depth {entry['depth']:<4} {saved_at}")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo balance runner for Shadows of the Abyss.
+
+Plays N seeded headless games for every class in CLASS_DEFS across a process
+pool. Workers fold their runs into small per-class aggregates before sending
+them back, so memory stays flat no matter how many runs are requested.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import CLASS_DEFS
+from headless import DescendPolicy, RunResult, new_game, play
+
+
+class ClassStats:
+    def __init__(self):
+        self.runs = 0
+        self.deaths = 0
+        self.timeouts = 0
+        self.turns = 0
+        self.gold_total = 0
+        self.level_total = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.depths: Counter = Counter()
+        self.death_causes: Counter = Counter()
+
+    def add(self, result: RunResult):
+        self.runs += 1
+        self.turns += result.turns
+        self.gold_total += result.gold
+        self.level_total += result.level
+        self.depth_total += result.depth
+        self.max_depth = max(self.max_depth, result.depth)
+        self.depths[result.depth] += 1
+        if result.died:
+            self.deaths += 1
+            self.death_causes[result.death_cause] += 1
+        elif result.timed_out:
+            self.timeouts += 1
+
+    def merge(self, other: 'ClassStats'):
+        self.runs += other.runs
+        self.deaths += other.deaths
+        self.timeouts += other.timeouts
+        self.turns += other.turns
+        self.gold_total += other.gold_total
+        self.level_total += other.level_total
+        self.depth_total += other.depth_total
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.depths.update(other.depths)
+        self.death_causes.update(other.death_causes)
+
+    def summary(self) -> Dict:
+        runs = self.runs or 1
+        return {
+            'runs': self.runs,
+            'death_rate': self.deaths / runs,
+            'timeout_rate': self.timeouts / runs,
+            'mean_depth': self.depth_total / runs,
+            'max_depth': self.max_depth,
+            'mean_gold': self.gold_total / runs,
+            'mean_level': self.level_total / runs,
+            'mean_turns': self.turns / runs,
+            'depths': {str(d): n for d, n in sorted(self.depths.items())},
+            'death_causes': dict(self.death_causes.most_common()),
+        }
+
+
+def run_seed(base_seed: int, character_class: str, index: int) -> int:
+    # String seeding is stable across processes and Python runs
+    return random.Random(f"{base_seed}:{character_class}:{index}").getrandbits(64)
+
+
+def _play_chunk(task: Tuple[str, int, int, int, int]) -> Tuple[str, ClassStats]:
+    character_class, start, count, base_seed, max_turns = task
+    stats = ClassStats()
+    for index in range(start, start + count):
+        seed = run_seed(base_seed, character_class, index)
+        policy = DescendPolicy(rng=random.Random(seed))
+        stats.add(play(new_game(policy, character_class, seed), policy, max_turns))
+    return character_class, stats
+
+
+def _tasks(classes: List[str], runs: int, chunk_size: int,
+           base_seed: int, max_turns: int) -> Iterator[Tuple[str, int, int, int, int]]:
+    for start in range(0, runs, chunk_size):
+        count = min(chunk_size, runs - start)
+        for character_class in classes:
+            yield character_class, start, count, base_seed, max_turns
+
+
+def run_balance(runs: int, classes: Optional[List[str]] = None, workers: Optional[int] = None,
+                base_seed: int = 0, max_turns: int = 5000, chunk_size: int = 100) -> Dict[str, ClassStats]:
+    classes = classes or list(CLASS_DEFS)
+    totals = {name: ClassStats() for name in classes}
+    tasks = _tasks(classes, runs, chunk_size, base_seed, max_turns)
+
+    if workers == 1:
+        for character_class, stats in map(_play_chunk, tasks):
+            totals[character_class].merge(stats)
+        return totals
+
+    with Pool(processes=workers) as pool:
+        for character_class, stats in pool.imap_unordered(_play_chunk, tasks):
+            totals[character_class].merge(stats)
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play seeded headless games for every class")
+    parser.add_argument('--runs', type=int, default=1000, help="games per class")
+    parser.add_argument('--class', dest='classes', action='append', choices=list(CLASS_DEFS))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-turns', type=int, default=5000)
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--json', help="write the full summary to this file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = run_balance(args.runs, args.classes, args.workers, args.seed, args.max_turns, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    total_runs = sum(stats.runs for stats in totals.values())
+    print(f"{total_runs} runs in {elapsed:.1f}s ({total_runs / elapsed:.1f} runs/s, {args.workers} workers)\n")
+    print(f"{'Class':<10}{'Depth':>8}{'Max':>6}{'Level':>8}{'Gold':>9}{'Died':>8}  Top killer")
+    for name, stats in totals.items():
+        s = stats.summary()
+        killer = next(iter(s['death_causes']), '-')
+        print(f"{name:<10}{s['mean_depth']:>8.2f}{s['max_depth']:>6}{s['mean_level']:>8.2f}"
+              f"{s['mean_gold']:>9.1f}{s['death_rate']:>7.0%}  {killer}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({name: stats.summary() for name, stats in totals.items()}, f, indent=2)
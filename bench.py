@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for Shadows of the Abyss.
+
+Times map generation, level setup, enemy turns, rendering, inventory
+combining and save/load with fixed seeds and no terminal, writes the results
+as JSON and compares them with a stored baseline:
+
+    python bench.py --save-baseline bench_baseline.json   # on the known-good tree
+    python bench.py --baseline bench_baseline.json        # exits 1 on a regression
+
+Each benchmark reports the best of --repeat rounds, in seconds per call.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dataclasses import Item
+from enemy import Enemy
+from enums import EnemyType, Rarity, TileType
+from game import Game
+from generators import GENERATORS
+from inventory import Inventory
+from renderer import Renderer
+from tile_grid import TileGrid
+
+SEED = 1234
+
+
+def timed(run: Callable, setup: Optional[Callable] = None, repeat: int = 5, number: int = 1) -> float:
+    """Seconds per call of run(state), best of repeat rounds of number calls;
+    setup() makes each call's state and isn't timed."""
+    clock = time.perf_counter
+    best = math.inf
+    for _ in range(repeat):
+        total = 0.0
+        for _ in range(number):
+            state = setup() if setup is not None else None
+            start = clock()
+            run(state)
+            total += clock() - start
+        best = min(best, total / number)
+    return best
+
+
+def new_game() -> Game:
+    return Game(character_class='Warrior', seed=SEED, prefetch_depth=0,
+                renderer=Renderer(io.StringIO(), check_terminal_size=False))
+
+
+# -------------------------
+# Benchmarks
+# -------------------------
+def bench_generate(width: int, height: int, rooms: int, engine: str = 'rooms') -> Callable[[int], float]:
+    def bench(repeat: int) -> float:
+        return timed(lambda gen: gen.generate(rooms),
+                     lambda: GENERATORS[engine](width, height, rng=random.Random(SEED)), repeat)
+    return bench
+
+
+def bench_generate_level(repeat: int) -> float:
+    game = new_game()
+
+    def run(_):
+        # Floors entered this way aren't stashed, so each call builds one
+        game.dungeon_level = 3
+        game.generate_level()
+    return timed(run, repeat=repeat, number=10)
+
+
+def bench_enemy_turns(count: int) -> Callable[[int], float]:
+    def bench(repeat: int) -> float:
+        game = new_game()
+        # An open floor about a quarter full of enemies around the player
+        side = max(20, int(math.sqrt(count * 4)))
+        game.grid = TileGrid(side, side, TileType.FLOOR)
+        game.width = game.height = side
+        game.player_pos = (side // 2, side // 2)
+        game.player.hp = game.player.max_hp = 10 ** 9
+        rng = random.Random(SEED)
+        cells = [(x, y) for y in range(side) for x in range(side) if (x, y) != game.player_pos]
+        spawn = {pos: Enemy(rng.choice(list(EnemyType)), 3) for pos in rng.sample(cells, count)}
+
+        def setup():
+            game.enemies.clear()
+            game.enemies.update(spawn)
+        return timed(lambda _: game._enemy_turns(), setup, repeat, number=20)
+    return bench
+
+
+def bench_render(full: bool) -> Callable[[int], float]:
+    def bench(repeat: int) -> float:
+        game = new_game()
+        out = game.renderer.out
+        game.render()
+
+        def run(_):
+            if full:
+                game.renderer.invalidate()
+            game.render()
+            out.seek(0)
+            out.truncate()
+        return timed(run, repeat=repeat, number=50)
+    return bench
+
+
+def large_inventory(size: int) -> List[Item]:
+    rng = random.Random(SEED)
+    kinds = [('Sword', 'attack'), ('Axe', 'attack'), ('Shield', 'defense'), ('Chain Mail', 'defense'),
+             ('Amulet of Power', 'crit_damage'), ('Health Potion', 'heal')]
+    rarities = [Rarity.COMMON, Rarity.UNCOMMON, Rarity.RARE]
+    return [Item(name, item_type, rng.randint(1, 20), name, rng.choice(rarities))
+            for name, item_type in (rng.choice(kinds) for _ in range(size))]
+
+
+def bench_combine_items(size: int) -> Callable[[int], float]:
+    def bench(repeat: int) -> float:
+        game = new_game()
+        items = large_inventory(size)
+        # Two items of one kind at opposite ends of the inventory
+        first = next(i for i, item in enumerate(items) if item.item_type == 'attack')
+        last = max(i for i, item in enumerate(items) if item.name == items[first].name)
+
+        def setup():
+            game.inventory = Inventory(items)
+            game.inventory_view = game.inventory.view()
+        return timed(lambda _: game.combine_items(first, last), setup, repeat, number=20)
+    return bench
+
+
+def bench_combine_all(size: int) -> Callable[[int], float]:
+    def bench(repeat: int) -> float:
+        game = new_game()
+        items = large_inventory(size)
+
+        def setup():
+            game.inventory = Inventory(items)
+            game.inventory_view = game.inventory.view()
+        return timed(lambda _: game.combine_all(), setup, repeat, number=20)
+    return bench
+
+
+def bench_save_load(repeat: int) -> float:
+    game = new_game()
+    loaded = Game(skip_class_select=True, prefetch_depth=0,
+                  renderer=Renderer(io.StringIO(), check_terminal_size=False))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.sav')
+
+        def run(_):
+            game.save_game(path)
+            loaded.load_game(path)
+        return timed(run, repeat=repeat, number=10)
+
+
+BENCHMARKS: List[Tuple[str, Callable[[int], float]]] = [
+    ('generate/80x40/10_rooms', bench_generate(80, 40, 10)),
+    ('generate/200x100/40_rooms', bench_generate(200, 100, 40)),
+    ('generate/500x250/150_rooms', bench_generate(500, 250, 150)),
+    ('generate/bsp/80x40', bench_generate(80, 40, 10, 'bsp')),
+    ('generate/bsp/200x100', bench_generate(200, 100, 40, 'bsp')),
+    ('generate/caves/80x40', bench_generate(80, 40, 10, 'caves')),
+    ('generate/caves/200x100', bench_generate(200, 100, 40, 'caves')),
+    ('generate/caves/500x250', bench_generate(500, 250, 150, 'caves')),
+    ('generate_level', bench_generate_level),
+    ('enemy_turns/10', bench_enemy_turns(10)),
+    ('enemy_turns/100', bench_enemy_turns(100)),
+    ('enemy_turns/1000', bench_enemy_turns(1000)),
+    ('render/full', bench_render(full=True)),
+    ('render/unchanged', bench_render(full=False)),
+    ('combine_items/1000', bench_combine_items(1000)),
+    ('combine_items/10000', bench_combine_items(10000)),
+    ('combine_all/1000', bench_combine_all(1000)),
+    ('save_load', bench_save_load),
+]
+
+
+# -------------------------
+# Running and comparing
+# -------------------------
+def run_benchmarks(repeat: int, only: Optional[str] = None) -> Dict:
+    results = {}
+    for name, bench in BENCHMARKS:
+        if only and only not in name:
+            continue
+        seconds = bench(repeat)
+        results[name] = seconds
+        print(f"{name:<30} {seconds * 1e6:12.1f} us", flush=True)
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'seconds': results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Benchmarks slower than the baseline by more than tolerance (0.2 = 20%)."""
+    regressions = []
+    print(f"\n{'benchmark':<30} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, seconds in results['seconds'].items():
+        base = baseline['seconds'].get(name)
+        if base is None:
+            print(f"{name:<30} {'-':>12} {seconds * 1e6:10.1f}us {'new':>8}")
+            continue
+        change = seconds / base - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<30} {base * 1e6:10.1f}us {seconds * 1e6:10.1f}us {change:+7.0%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Shadows of the Abyss")
+    parser.add_argument('--repeat', type=int, default=5, help="rounds per benchmark (the best is kept)")
+    parser.add_argument('--only', help="run the benchmarks whose name contains this")
+    parser.add_argument('--json', help="write the results here")
+    parser.add_argument('--baseline', help="compare with results saved earlier")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="slowdown allowed before a benchmark counts as a regression")
+    parser.add_argument('--save-baseline', help="write the results here as the new baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.only)
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.tolerance:.0%}")
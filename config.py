@@ -17,3 +17,73 @@ CLASS_DEFS = {
         "weapon_name": "Hunting Bow", "weapon_bonus": 6, "playstyle": "Balanced ranged fighter"
     }
 }
+
+# Enemies chase the player when they are this many steps away or closer
+# (walking distance around walls, not a straight line)
+ENEMY_CHASE_RANGE = 5
+
+# Field of view: how far the player sees, and how many positions' visible
+# sets are kept per floor (walking back over them needs no recomputing).
+# Enemies only chase a player who can see them.
+FOV = {"radius": 8, "cache_size": 128}
+
+# Map generation: rooms are joined by a minimum spanning tree of corridors,
+# plus this many extra corridors per room, which make loops. Each run of
+# floors between shops takes the next engine in "generators" (see
+# generators.py); caves start with "cave_fill" of the map as wall and are
+# smoothed "cave_steps" times.
+DUNGEON = {
+    "loops": 0.15,
+    "generators": ["rooms", "bsp", "caves"],
+    "cave_fill": 0.45,
+    "cave_steps": 4,
+}
+
+# Loot: items found on floors and the shop's stock. Each table gives the
+# chance of a gold pouch instead of an item, the weights of each kind of item
+# and of each rarity, and weapon/armor values (base_value plus depth_value per
+# floor, times the rarity's multiplier). loot.py compiles them per depth.
+LOOT = {
+    "floor": {
+        "gold_chance": 0.3,
+        "kinds": {"weapon": 0.3, "armor": 0.3, "amulet": 0.25, "potion": 0.15},
+        "rarity": {"COMMON": 0.5, "UNCOMMON": 0.3, "RARE": 0.15, "EPIC": 0.05},
+        "weapons": ["Sword", "Axe", "Mace", "Spear", "Dagger"],
+        "armors": ["Leather Armor", "Chain Mail", "Plate Armor", "Shield"],
+        "base_value": (2, 5), "depth_value": 1.0,
+    },
+    "shop": {
+        "gold_chance": 0.0,
+        "kinds": {"weapon": 1, "armor": 1, "amulet": 1},
+        "rarity": {"COMMON": 0.5, "UNCOMMON": 0.35, "RARE": 0.15},
+        "weapons": ["Sword", "Axe", "Mace", "Spear", "Dagger", "Halberd"],
+        "armors": ["Leather Armor", "Chain Mail", "Plate Armor", "Shield", "Helmet"],
+        "base_value": (3, 7), "depth_value": 0.5,
+        # Items for sale, plus this many health potions
+        "stock": 8, "potions": 2,
+    },
+}
+
+# Large-world mode: each floor is chunks_x x chunks_y chunks of chunk_size
+# tiles, generated as the player comes within load_radius chunks of them.
+LARGE_WORLD = {
+    "chunks_x": 64, "chunks_y": 64, "chunk_size": 64,
+    "load_radius": 1, "rooms_per_chunk": 8,
+}
+
+# Floors the player can climb back to: the most recent live_floors are kept
+# as they are, older ones compressed up to max_bytes in total (beyond that
+# the oldest are dropped and regenerate from their seed)
+FLOOR_CACHE = {"live_floors": 3, "max_bytes": 4 * 1024 * 1024}
+
+# Floors below the current one generated in the background while it is
+# played, so taking the stairs doesn't wait on the generator
+FLOOR_PREFETCH = {"depth": 2, "workers": 1}
+
+# Autosave journal: commands between full checkpoints of the game state
+JOURNAL_CHECKPOINT_EVERY = 500
+
+# Save archives are compacted once superseded saves make up this share of the file
+ARCHIVE_COMPACT_RATIO = 0.5
+# Slots saved within this many seconds of each other share one index write
+ARCHIVE_FLUSH_DELAY = 1.0
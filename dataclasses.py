@@ -36,3 +36,23 @@ class Character:
     crit_chance: float   # stored as percent (e.g., 3.0 for 3%)
     crit_damage: float   # multiplier (e.g., 1.4)
     character_class: str
+
+@dataclass
+class EffectiveStats:
+    # Player stats with equipment applied (what combat uses and the status bar shows)
+    attack: int
+    defense: int
+    crit_chance: float   # percent
+    crit_damage: float   # multiplier
+
+    @classmethod
+    def compute(cls, player: Character, weapon: Optional[Item], armor: Optional[Item],
+                amulet: Optional[Item]) -> 'EffectiveStats':
+        crit_chance_bonus = amulet.value if amulet and amulet.item_type == 'crit_chance' else 0
+        crit_dmg_bonus = amulet.value if amulet and amulet.item_type == 'crit_damage' else 0
+        return cls(
+            attack=player.attack + (weapon.value if weapon else 0),
+            defense=player.defense + (armor.value if armor else 0),
+            crit_chance=player.crit_chance + crit_chance_bonus,
+            crit_damage=player.crit_damage + crit_dmg_bonus / 100,
+        )
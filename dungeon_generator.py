@@ -1,6 +1,10 @@
 import random
-from typing import List, Tuple
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from config import DUNGEON
 from enums import TileType
+from tile_grid import TileGrid
 
 class Room:
     def __init__(self, x: int, y: int, width: int, height: int):
@@ -16,71 +20,282 @@ class Room:
                 self.y < other.y + other.height and
                 self.y + self.height > other.y)
 
-class DungeonGenerator:
-    def __init__(self, width: int, height: int):
+class RoomIndex:
+    """Uniform grid of buckets over the map; each room is filed under every
+    bucket it covers, so overlap checks only look at nearby rooms."""
+
+    def __init__(self, cell_size: int = 16):
+        self.cell_size = cell_size
+        self.buckets: Dict[Tuple[int, int], List[Room]] = defaultdict(list)
+        self.count = 0
+
+    def _cells(self, x: int, y: int, width: int, height: int):
+        size = self.cell_size
+        for by in range(y // size, (y + height - 1) // size + 1):
+            for bx in range(x // size, (x + width - 1) // size + 1):
+                yield bx, by
+
+    def add(self, room: Room):
+        for cell in self._cells(room.x, room.y, room.width, room.height):
+            self.buckets[cell].append(room)
+        self.count += 1
+
+    def intersects(self, room: Room) -> bool:
+        buckets = self.buckets
+        for cell in self._cells(room.x, room.y, room.width, room.height):
+            bucket = buckets.get(cell)
+            if bucket and any(room.intersects(other) for other in bucket):
+                return True
+        return False
+
+    def near(self, x: int, y: int, radius: int) -> List[Room]:
+        found = {}
+        for cell in self._cells(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1):
+            for room in self.buckets.get(cell, ()):
+                found[id(room)] = room
+        return list(found.values())
+
+    def __len__(self):
+        return self.count
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 (union by size, path halving)."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+        self.components = n
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> bool:
+        """Joins a's and b's sets; False if they were already one."""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        self.components -= 1
+        return True
+
+
+class RoomGraph:
+    """A floor's rooms and the corridors between them, as pairs of room
+    indexes. Every room can be reached from every other."""
+
+    def __init__(self, rooms: List[Room], edges: List[Tuple[int, int]]):
+        self.rooms = rooms
+        self.edges = edges
+        self.adjacency: List[List[int]] = [[] for _ in rooms]
+        for a, b in edges:
+            self.adjacency[a].append(b)
+            self.adjacency[b].append(a)
+
+    def neighbors(self, room: int) -> List[int]:
+        return self.adjacency[room]
+
+    def room_at(self, x: int, y: int) -> Optional[int]:
+        for i, room in enumerate(self.rooms):
+            if room.x <= x < room.x + room.width and room.y <= y < room.y + room.height:
+                return i
+        return None
+
+    def hops_from(self, room: int) -> List[int]:
+        """Corridors to cross from room to each room (BFS over the graph)."""
+        hops = [-1] * len(self.rooms)
+        hops[room] = 0
+        frontier = [room]
+        while frontier:
+            nxt = []
+            for a in frontier:
+                for b in self.adjacency[a]:
+                    if hops[b] < 0:
+                        hops[b] = hops[a] + 1
+                        nxt.append(b)
+            frontier = nxt
+        return hops
+
+
+def neighbour_pairs(centers: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+    """(walking distance, a, b) from each center to its nearest other center
+    in each of the eight octants around it, shortest first. At most 4n pairs,
+    found by sweeps in O(n log n), and they always hold a minimum spanning
+    tree of all the centers (so they join any groups of them too)."""
+    points = [list(center) for center in centers]
+    order = list(range(len(points)))
+    pairs = set()
+    # Each pass finds the neighbours in one octant (dx >= dy >= 0), then
+    # the points are reflected so the next pass sees another
+    for turn in range(4):
+        order.sort(key=lambda i: points[i][0] + points[i][1])
+        # Points still looking for a neighbour, by -y
+        keys: List[int] = []
+        waiting: List[int] = []
+        for i in order:
+            x, y = points[i]
+            start = end = bisect_left(keys, -y)
+            while end < len(keys):
+                j = waiting[end]
+                dx, dy = x - points[j][0], y - points[j][1]
+                if dy > dx:
+                    break
+                pairs.add((dx + dy, min(i, j), max(i, j)))
+                end += 1
+            del keys[start:end], waiting[start:end]
+            if start < len(keys) and keys[start] == -y:
+                waiting[start] = i
+            else:
+                keys.insert(start, -y)
+                waiting.insert(start, i)
+        for point in points:
+            if turn & 1:
+                point[0] = -point[0]
+            else:
+                point[0], point[1] = point[1], point[0]
+    return sorted(pairs)
+
+
+def spanning_tree(centers: List[Tuple[int, int]], sets: UnionFind) -> List[Tuple[int, int]]:
+    """The shortest edges (by walking distance between centers) that join
+    the groups in sets into one, as pairs of indexes; sets is updated."""
+    edges = []
+    if sets.components > 1:
+        for _, a, b in neighbour_pairs(centers):
+            if sets.union(a, b):
+                edges.append((a, b))
+                if sets.components == 1:
+                    break
+    return edges
+
+
+class MapGenerator:
+    """Builds one floor's map. generate returns the grid and its rooms (the
+    player arrives in the first, the stairs go in the last; every room can
+    be reached from every other) and keeps the rooms and how they connect
+    as self.graph. Engines are listed in generators.py."""
+
+    def __init__(self, width: int, height: int, rng: Optional[random.Random] = None):
         self.width = width
         self.height = height
-        self.grid = [[TileType.WALL for _ in range(width)] for _ in range(height)]
+        self.rng = rng or random.Random()
+        self.grid = TileGrid(width, height)
         self.rooms: List[Room] = []
+        self.graph: Optional[RoomGraph] = None
 
-    def generate(self, num_rooms: int) -> Tuple[List[List[TileType]], List[Room]]:
-        attempts = 0
-        max_attempts = 100
+    def generate(self, num_rooms: int) -> Tuple[TileGrid, List[Room]]:
+        raise NotImplementedError
 
-        while len(self.rooms) < num_rooms and attempts < max_attempts:
-            w = random.randint(5, 9)
-            h = random.randint(4, 7)
-            x = random.randint(1, self.width - w - 1)
-            y = random.randint(1, self.height - h - 1)
+    def _carve_corridor(self, start: Tuple[int, int], end: Tuple[int, int]):
+        if self.rng.random() < 0.5:
+            self._carve_h_tunnel(start[0], end[0], start[1])
+            self._carve_v_tunnel(start[1], end[1], end[0])
+        else:
+            self._carve_v_tunnel(start[1], end[1], start[0])
+            self._carve_h_tunnel(start[0], end[0], end[1])
 
-            new_room = Room(x, y, w, h)
+    def _carve_room(self, room: Room):
+        self.grid.fill_rect(room.x, room.y, room.width, room.height, TileType.FLOOR)
+
+    def _carve_h_tunnel(self, x1: int, x2: int, y: int):
+        self.grid.fill_row(y, x1, x2, TileType.FLOOR)
 
-            if not any(new_room.intersects(room) for room in self.rooms):
-                self._carve_room(new_room)
+    def _carve_v_tunnel(self, y1: int, y2: int, x: int):
+        self.grid.fill_col(x, y1, y2, TileType.FLOOR)
 
-                if self.rooms:
-                    prev_center = self.rooms[-1].center
-                    new_center = new_room.center
 
-                    # Check if tunnel would be too long
-                    h_dist = abs(new_center[0] - prev_center[0])
-                    v_dist = abs(new_center[1] - prev_center[1])
+class DungeonGenerator(MapGenerator):
+    """Rectangular rooms placed at random, joined by corridors."""
 
-                    if h_dist > 20 or v_dist > 20:
-                        attempts += 1
-                        continue
+    # Default placement budget, scaled with the number of rooms asked for
+    # (10 rooms -> the original 100 attempts).
+    ATTEMPTS_PER_ROOM = 10
 
-                    if random.random() < 0.5:
-                        self._carve_h_tunnel(prev_center[0], new_center[0], prev_center[1])
-                        self._carve_v_tunnel(prev_center[1], new_center[1], new_center[0])
-                    else:
-                        self._carve_v_tunnel(prev_center[1], new_center[1], prev_center[0])
-                        self._carve_h_tunnel(prev_center[0], new_center[0], new_center[1])
+    def __init__(self, width: int, height: int, rng: Optional[random.Random] = None,
+                 max_tunnel: Optional[int] = 20, loops: float = DUNGEON['loops']):
+        super().__init__(width, height, rng)
+        # Longest corridor leg allowed between two rooms (None = any)
+        self.max_tunnel = max_tunnel
+        # Corridors added beyond the spanning tree, per room
+        self.loops = loops
+        self.index = RoomIndex()
 
-                self.rooms.append(new_room)
+    def generate(self, num_rooms: int, max_attempts: Optional[int] = None) -> Tuple[TileGrid, List[Room]]:
+        """Places up to num_rooms rooms, joins them with corridors and carves
+        both. The rooms, and the corridors between them, are also kept as
+        self.graph."""
+        attempts = 0
+        if max_attempts is None:
+            max_attempts = max(100, num_rooms * self.ATTEMPTS_PER_ROOM)
 
+        placed: List[Room] = []
+        while len(placed) < num_rooms and attempts < max_attempts:
+            w = self.rng.randint(5, 9)
+            h = self.rng.randint(4, 7)
+            x = self.rng.randint(1, self.width - w - 1)
+            y = self.rng.randint(1, self.height - h - 1)
+
+            new_room = Room(x, y, w, h)
+            if not self.index.intersects(new_room):
+                placed.append(new_room)
+                self.index.add(new_room)
             attempts += 1
 
         # ensure at least one room exists
-        if not self.rooms:
+        if not placed:
             fallback = Room(2, 2, 6, 5)
-            self._carve_room(fallback)
-            self.rooms.append(fallback)
+            placed.append(fallback)
+            self.index.add(fallback)
 
+        self.rooms = placed
+        edges = self._plan_corridors(placed)
+        self.graph = RoomGraph(self.rooms, edges)
+        for room in self.rooms:
+            self._carve_room(room)
+        for a, b in edges:
+            self._carve_corridor(self.rooms[a].center, self.rooms[b].center)
         return self.grid, self.rooms
 
-    def _carve_room(self, room: Room):
-        for y in range(room.y, room.y + room.height):
-            for x in range(room.x, room.x + room.width):
-                if 0 <= x < self.width and 0 <= y < self.height:
-                    self.grid[y][x] = TileType.FLOOR
+    def _candidate_corridors(self, rooms: List[Room]) -> List[Tuple[int, int, int]]:
+        """(length, a, b) for pairs of rooms a < b, shortest first: every
+        pair within max_tunnel of each other, or with no limit each room's
+        nearest neighbours (see neighbour_pairs)."""
+        limit = self.max_tunnel
+        centers = [room.center for room in rooms]
+        if limit is None:
+            return neighbour_pairs(centers)
+        # Only rooms near each other can be within the limit
+        number = {id(room): i for i, room in enumerate(rooms)}
+        candidates = []
+        for a, (ax, ay) in enumerate(centers):
+            for other in self.index.near(ax, ay, limit):
+                b = number[id(other)]
+                if b > a:
+                    bx, by = centers[b]
+                    dx, dy = abs(ax - bx), abs(ay - by)
+                    if dx <= limit and dy <= limit:
+                        candidates.append((dx + dy, a, b))
+        candidates.sort()
+        return candidates
 
-    def _carve_h_tunnel(self, x1: int, x2: int, y: int):
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            if 0 <= x < self.width and 0 <= y < self.height:
-                self.grid[y][x] = TileType.FLOOR
+    def _plan_corridors(self, rooms: List[Room]) -> List[Tuple[int, int]]:
+        """Corridors (pairs of room indexes) joining every room: a minimum
+        spanning tree by length (Kruskal), plus a few of the corridors left
+        over as loops. Groups of rooms that no corridor within max_tunnel
+        can join are joined by their shortest corridor regardless."""
+        sets = UnionFind(len(rooms))
+        tree, spare = [], []
+        for _, a, b in self._candidate_corridors(rooms):
+            (tree if sets.union(a, b) else spare).append((a, b))
 
-    def _carve_v_tunnel(self, y1: int, y2: int, x: int):
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            if 0 <= x < self.width and 0 <= y < self.height:
-                self.grid[y][x] = TileType.FLOOR
+        tree += spanning_tree([room.center for room in rooms], sets)
+
+        extra = min(len(spare), int(len(rooms) * self.loops))
+        loops = sorted(self.rng.sample(range(len(spare)), extra)) if extra else []
+        return tree + [spare[i] for i in loops]
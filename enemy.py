@@ -1,5 +1,16 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
 from enums import EnemyType
 
+Pos = Tuple[int, int]
+
+# Enemy types by their code in EnemyStore.types
+ENEMY_TYPES = list(EnemyType)
+TYPE_CODES = {enemy_type: code for code, enemy_type in enumerate(ENEMY_TYPES)}
+GLYPHS = [enemy_type.color + enemy_type.symbol for enemy_type in ENEMY_TYPES]
+
+
 class Enemy:
     def __init__(self, enemy_type: EnemyType, level: int):
         self.type = enemy_type
@@ -16,3 +27,209 @@ class Enemy:
 
     def is_alive(self):
         return self.hp > 0
+
+
+class EnemyRef:
+    """A live view of one enemy in an EnemyStore, with the same attributes as
+    Enemy. Writes (e.g. `enemy.hp -= dmg`) go straight to the store."""
+
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store: 'EnemyStore', slot: int):
+        self.store = store
+        self.slot = slot
+
+    @property
+    def pos(self) -> Pos:
+        return self.store.xs[self.slot], self.store.ys[self.slot]
+
+    @property
+    def type(self) -> EnemyType:
+        return ENEMY_TYPES[self.store.types[self.slot]]
+
+    @property
+    def level(self) -> int:
+        return self.store.levels[self.slot]
+
+    @property
+    def hp(self) -> int:
+        return self.store.hp[self.slot]
+
+    @hp.setter
+    def hp(self, value: int):
+        self.store.hp[self.slot] = value
+
+    @property
+    def attack(self) -> int:
+        return self.store.attack[self.slot]
+
+    @property
+    def defense(self) -> int:
+        return self.store.defense[self.slot]
+
+    @property
+    def name(self) -> str:
+        return self.type.display_name
+
+    @property
+    def max_hp(self) -> int:
+        return self.type.base_hp + (self.level - 1) * 5
+
+    @property
+    def xp_reward(self) -> int:
+        return self.type.xp_reward + (self.level - 1) * 10
+
+    @property
+    def gold_reward(self) -> int:
+        return self.type.gold_reward + (self.level - 1) * 5
+
+    @property
+    def symbol(self) -> str:
+        return self.type.symbol
+
+    @property
+    def color(self) -> str:
+        return self.type.color
+
+    def is_alive(self):
+        return self.hp > 0
+
+
+class EnemyStore:
+    """The enemies of a floor as parallel arrays (struct of arrays), indexed
+    by slot, plus a position -> slot map.
+
+    Behaves like the Dict[Pos, Enemy] it replaces: `pos in store`,
+    `store[pos]` (an EnemyRef), `items()`, `pop()` (a detached Enemy),
+    `update()` and so on, but turns work on whole columns at a time and
+    moving an enemy is two array writes instead of a dict delete + insert.
+    """
+
+    def __init__(self):
+        self.xs = array('i')
+        self.ys = array('i')
+        self.hp = array('i')
+        self.attack = array('i')
+        self.defense = array('i')
+        self.levels = array('i')
+        self.types = array('B')
+        self.slot_at: Dict[Pos, int] = {}
+        self._refs: List[Optional[EnemyRef]] = []
+        self._free: List[int] = []
+
+    # -------------------------
+    # Mapping interface
+    # -------------------------
+    def __len__(self) -> int:
+        return len(self.slot_at)
+
+    def __contains__(self, pos) -> bool:
+        return pos in self.slot_at
+
+    def __iter__(self) -> Iterator[Pos]:
+        return iter(self.slot_at)
+
+    def __getitem__(self, pos: Pos) -> EnemyRef:
+        return self.ref(self.slot_at[pos])
+
+    def get(self, pos: Pos, default=None):
+        slot = self.slot_at.get(pos)
+        return default if slot is None else self.ref(slot)
+
+    def __setitem__(self, pos: Pos, enemy):
+        # Accepts an Enemy or an EnemyRef (of this or another store)
+        if pos in self.slot_at:
+            self._release(self.slot_at.pop(pos))
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.xs)
+            for column in (self.xs, self.ys, self.hp, self.attack, self.defense, self.levels, self.types):
+                column.append(0)
+            self._refs.append(None)
+        self.xs[slot], self.ys[slot] = pos
+        self.hp[slot] = enemy.hp
+        self.attack[slot] = enemy.attack
+        self.defense[slot] = enemy.defense
+        self.levels[slot] = enemy.level
+        self.types[slot] = TYPE_CODES[enemy.type]
+        self.slot_at[pos] = slot
+
+    def __delitem__(self, pos: Pos):
+        self._release(self.slot_at.pop(pos))
+
+    def keys(self):
+        return self.slot_at.keys()
+
+    def values(self) -> List[EnemyRef]:
+        return [self.ref(slot) for slot in self.slot_at.values()]
+
+    def items(self) -> List[Tuple[Pos, EnemyRef]]:
+        return [(pos, self.ref(slot)) for pos, slot in self.slot_at.items()]
+
+    def remove(self, enemy: EnemyRef):
+        # The ref knows its slot and the slot its position, so no search
+        del self[enemy.pos]
+
+    def pop(self, pos: Pos) -> Enemy:
+        """Removes the enemy at pos and returns it as a standalone Enemy."""
+        enemy = self.detach(self.slot_at[pos])
+        del self[pos]
+        return enemy
+
+    def detach_all(self) -> Dict[Pos, Enemy]:
+        """Empties the store, returning its enemies as standalone Enemys."""
+        enemies = {pos: self.detach(slot) for pos, slot in self.slot_at.items()}
+        self.clear()
+        return enemies
+
+    def update(self, enemies):
+        for pos, enemy in enemies.items():
+            self[pos] = enemy
+
+    def clear(self):
+        self.__init__()
+
+    # -------------------------
+    # Slots
+    # -------------------------
+    def ref(self, slot: int) -> EnemyRef:
+        # One ref per occupied slot, so refs compare with `is`
+        ref = self._refs[slot]
+        if ref is None:
+            ref = self._refs[slot] = EnemyRef(self, slot)
+        return ref
+
+    def detach(self, slot: int) -> Enemy:
+        enemy = Enemy(ENEMY_TYPES[self.types[slot]], self.levels[slot])
+        enemy.hp = self.hp[slot]
+        enemy.attack = self.attack[slot]
+        enemy.defense = self.defense[slot]
+        return enemy
+
+    def _release(self, slot: int):
+        self._refs[slot] = None
+        self._free.append(slot)
+
+    def move(self, old: Pos, new: Pos):
+        slot = self.slot_at.pop(old)
+        self.slot_at[new] = slot
+        self.xs[slot], self.ys[slot] = new
+
+    def move_all(self, moves: List[Tuple[int, Pos]]):
+        """Applies (slot, new_pos) moves together; none of the targets may be
+        occupied by an enemy that isn't moving too."""
+        slot_at = self.slot_at
+        xs, ys = self.xs, self.ys
+        for slot, _ in moves:
+            del slot_at[(xs[slot], ys[slot])]
+        for slot, (x, y) in moves:
+            xs[slot] = x
+            ys[slot] = y
+            slot_at[(x, y)] = slot
+
+    def glyphs(self) -> Iterator[Tuple[int, int, str]]:
+        # (x, y, colored symbol) of every enemy, straight from the columns
+        xs, ys, types = self.xs, self.ys, self.types
+        for slot in self.slot_at.values():
+            yield xs[slot], ys[slot], GLYPHS[types[slot]]
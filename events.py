@@ -0,0 +1,269 @@
+"""
+Game events and the bus they are published on.
+
+Game code publishes what happened -- a hit, a kill, a pickup, a purchase --
+as a small typed event rather than a formatted message. Subscribers pick
+what they need: MessageLog keeps the last few events for the screen and only
+turns them into text when they're drawn, and Telemetry tallies events in
+batches. Headless runs, where nobody reads the log, never format a message.
+"""
+
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from dataclasses import Item
+from enums import EnemyType
+
+Handler = Callable[['Event'], None]
+
+
+# -------------------------
+# Events
+# -------------------------
+class Event:
+    __slots__ = ()
+
+    def text(self) -> str:
+        raise NotImplementedError
+
+
+class Message(Event):
+    """Anything without an event type of its own, already as text."""
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def text(self) -> str:
+        return self.message
+
+
+class Hit(Event):
+    """The player hit an enemy."""
+    __slots__ = ('enemy_type', 'damage', 'crit')
+
+    def __init__(self, enemy_type: EnemyType, damage: int, crit: bool):
+        self.enemy_type = enemy_type
+        self.damage = damage
+        self.crit = crit
+
+    def text(self) -> str:
+        prefix = "CRIT! " if self.crit else ""
+        return f"{prefix}Hit {self.enemy_type.display_name} for {self.damage} damage!"
+
+
+class Hurt(Event):
+    """An enemy hit the player."""
+    __slots__ = ('enemy_type', 'damage')
+
+    def __init__(self, enemy_type: EnemyType, damage: int):
+        self.enemy_type = enemy_type
+        self.damage = damage
+
+    def text(self) -> str:
+        return f"{self.enemy_type.display_name} hit you for {self.damage} damage!"
+
+
+class Kill(Event):
+    __slots__ = ('enemy_type', 'xp', 'gold')
+
+    def __init__(self, enemy_type: EnemyType, xp: int, gold: int):
+        self.enemy_type = enemy_type
+        self.xp = xp
+        self.gold = gold
+
+    def text(self) -> str:
+        return f"Defeated {self.enemy_type.display_name}! +{self.xp} XP, +{self.gold} gold"
+
+
+class Death(Event):
+    __slots__ = ('enemy_type',)
+
+    def __init__(self, enemy_type: EnemyType):
+        self.enemy_type = enemy_type
+
+    def text(self) -> str:
+        return "You died! Game Over."
+
+
+class Pickup(Event):
+    """An item or a gold pouch picked up from the floor."""
+    __slots__ = ('item',)
+
+    def __init__(self, item: Item):
+        self.item = item
+
+    def text(self) -> str:
+        item = self.item
+        if item.item_type == 'gold':
+            return f"Found {item.value} gold!"
+        return f"Picked up {item.rarity.display_name} {item.name}"
+
+
+class LevelUp(Event):
+    __slots__ = ('level',)
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def text(self) -> str:
+        return f"Level Up! Now level {self.level}"
+
+
+class Purchase(Event):
+    __slots__ = ('item', 'price')
+
+    def __init__(self, item: Item, price: int):
+        self.item = item
+        self.price = price
+
+    def text(self) -> str:
+        return f"Bought {self.item.name} for {self.price} gold"
+
+
+class Sale(Event):
+    __slots__ = ('items', 'gold')
+
+    def __init__(self, items: List[Item], gold: int):
+        self.items = items
+        self.gold = gold
+
+    def text(self) -> str:
+        if len(self.items) == 1:
+            return f"Sold {self.items[0].name} for {self.gold} gold"
+        return f"Sold {len(self.items)} items for {self.gold} gold"
+
+
+# -------------------------
+# Bus
+# -------------------------
+class EventBus:
+    """Delivers each published event to the handlers subscribed to its type
+    and to those subscribed to everything, in subscription order."""
+
+    def __init__(self):
+        self._subscriptions: List[Tuple[Handler, Tuple[type, ...]]] = []
+        # Handlers per event type, worked out on first publish
+        self._routes: Dict[type, List[Handler]] = {}
+
+    def subscribe(self, handler: Handler, *types: type):
+        """Calls handler with every event of the given types (all events
+        when none are given)."""
+        self._subscriptions.append((handler, types))
+        self._routes.clear()
+
+    def unsubscribe(self, handler: Handler):
+        self._subscriptions = [(h, types) for h, types in self._subscriptions if h != handler]
+        self._routes.clear()
+
+    def publish(self, event: Event):
+        handlers = self._routes.get(type(event))
+        if handlers is None:
+            handlers = self._route(type(event))
+        for handler in handlers:
+            handler(event)
+
+    def _route(self, event_type: type) -> List[Handler]:
+        handlers = self._routes[event_type] = [
+            handler for handler, types in self._subscriptions
+            if not types or issubclass(event_type, types)
+        ]
+        return handlers
+
+
+# -------------------------
+# Subscribers
+# -------------------------
+class MessageLog:
+    """The last `size` events, shown as text on the map screen. Events are
+    kept as they are and only formatted when the log is read."""
+
+    def __init__(self, size: int = 5):
+        self._events: deque = deque(maxlen=size)
+
+    def add(self, event: Event):
+        self._events.append(event)
+
+    def lines(self) -> List[str]:
+        return [event.text() for event in self._events]
+
+    def replace(self, lines: Iterable[str]):
+        # Logs restored from a save are already text
+        self._events.clear()
+        self._events.extend(Message(line) for line in lines)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[str]:
+        return (event.text() for event in self._events)
+
+
+class Telemetry:
+    """Counts of events by type plus damage, gold and kill totals.
+
+    Events are buffered and folded into the totals batch_size at a time,
+    so each event costs an append while the game runs; call flush before
+    reading the totals.
+    """
+
+    def __init__(self, batch_size: int = 1024):
+        self.batch_size = batch_size
+        self._pending: List[Event] = []
+        self.counts: Counter = Counter()
+        self.kills: Counter = Counter()
+        self.damage_dealt = 0
+        self.damage_taken = 0
+        self.crits = 0
+        self.gold_earned = 0
+        self.gold_spent = 0
+
+    def add(self, event: Event):
+        pending = self._pending
+        pending.append(event)
+        if len(pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        events, self._pending = self._pending, []
+        self.counts.update(type(event).__name__ for event in events)
+        for event in events:
+            kind = type(event)
+            if kind is Hit:
+                self.damage_dealt += event.damage
+                self.crits += event.crit
+            elif kind is Hurt:
+                self.damage_taken += event.damage
+            elif kind is Kill:
+                self.kills[event.enemy_type.display_name] += 1
+                self.gold_earned += event.gold
+            elif kind is Pickup:
+                if event.item.item_type == 'gold':
+                    self.gold_earned += event.item.value
+            elif kind is Sale:
+                self.gold_earned += event.gold
+            elif kind is Purchase:
+                self.gold_spent += event.price
+
+    def merge(self, other: 'Telemetry'):
+        self.flush()
+        other.flush()
+        self.counts.update(other.counts)
+        self.kills.update(other.kills)
+        self.damage_dealt += other.damage_dealt
+        self.damage_taken += other.damage_taken
+        self.crits += other.crits
+        self.gold_earned += other.gold_earned
+        self.gold_spent += other.gold_spent
+
+    def summary(self) -> Dict:
+        self.flush()
+        return {
+            'events': dict(self.counts),
+            'kills': dict(self.kills),
+            'damage_dealt': self.damage_dealt,
+            'damage_taken': self.damage_taken,
+            'crits': self.crits,
+            'gold_earned': self.gold_earned,
+            'gold_spent': self.gold_spent,
+        }
@@ -0,0 +1,177 @@
+"""
+Floors the player has left, kept so they can climb back up to them.
+
+The most recently visited floors stay live; older ones are compressed. When
+the compressed floors outgrow the memory cap the least recently visited are
+dropped, and climbing back to one of those regenerates it from its seed.
+"""
+
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import savefile
+from config import FLOOR_CACHE, FLOOR_PREFETCH
+from dataclasses import Item
+from dungeon_generator import RoomGraph
+from enemy import Enemy
+from world import ChunkedWorld
+
+Pos = Tuple[int, int]
+
+
+class Floor:
+    """One dungeon level: its map (a TileGrid or a ChunkedWorld), where the
+    player arrives from above (start_pos), both stairs, enemies, items, the
+    cells the player has seen and the room graph."""
+
+    def __init__(self, level: int, grid, start_pos: Pos, stairs_pos: Pos, up_pos: Optional[Pos],
+                 enemies: Dict[Pos, Enemy], items: Dict[Pos, Item], explored: Optional[Set[Pos]] = None,
+                 room_graph: Optional[RoomGraph] = None):
+        self.level = level
+        self.grid = grid
+        self.start_pos = start_pos
+        self.stairs_pos = stairs_pos
+        self.up_pos = up_pos
+        self.enemies = enemies
+        self.items = items
+        self.explored = explored if explored is not None else set()
+        # Rooms and corridors of a generated floor (None for chunked worlds)
+        self.room_graph = room_graph
+
+    def pack(self) -> bytes:
+        return zlib.compress(savefile.encode_floor(self))
+
+    @classmethod
+    def unpack(cls, level: int, blob: bytes, populate: Optional[Callable] = None,
+               version: int = savefile.VERSION) -> 'Floor':
+        data = savefile.decode_floor(zlib.decompress(blob), version)
+        grid = data['grid']
+        if data['world'] is not None:
+            grid = ChunkedWorld.restore(data['world'], populate=populate)
+        return cls(level, grid, data['start_pos'], data['stairs_pos'], data['up_pos'],
+                   data['enemies'], data['items'], data['explored'], data['room_graph'])
+
+
+class FloorCache:
+    def __init__(self, live_floors: int = FLOOR_CACHE['live_floors'],
+                 max_bytes: int = FLOOR_CACHE['max_bytes']):
+        self.live_floors = live_floors
+        self.max_bytes = max_bytes
+        # Least recently visited first
+        self.live: 'OrderedDict[int, Floor]' = OrderedDict()
+        self.packed: 'OrderedDict[int, bytes]' = OrderedDict()
+        self.packed_bytes = 0
+
+    def __contains__(self, level: int) -> bool:
+        return level in self.live or level in self.packed
+
+    def put(self, floor: Floor):
+        self._discard(floor.level)
+        self.live[floor.level] = floor
+        while len(self.live) > self.live_floors:
+            level, oldest = self.live.popitem(last=False)
+            self._put_packed(level, oldest.pack())
+
+    def take(self, level: int, populate: Optional[Callable] = None) -> Optional[Floor]:
+        """Removes and returns the floor, or None if it isn't kept."""
+        if level in self.live:
+            return self.live.pop(level)
+        if level in self.packed:
+            blob = self.packed.pop(level)
+            self.packed_bytes -= len(blob)
+            return Floor.unpack(level, blob, populate)
+        return None
+
+    def clear(self):
+        self.live.clear()
+        self.packed.clear()
+        self.packed_bytes = 0
+
+    def _discard(self, level: int):
+        self.live.pop(level, None)
+        blob = self.packed.pop(level, None)
+        if blob is not None:
+            self.packed_bytes -= len(blob)
+
+    def _put_packed(self, level: int, blob: bytes):
+        self.packed[level] = blob
+        self.packed_bytes += len(blob)
+        while self.packed_bytes > self.max_bytes:
+            _, dropped = self.packed.popitem(last=False)
+            self.packed_bytes -= len(dropped)
+
+    # -------------------------
+    # Save / restore
+    # -------------------------
+    def entries(self) -> List[Tuple[int, bool, bytes]]:
+        """(level, live, compressed floor) in the order to restore them."""
+        return ([(level, False, blob) for level, blob in self.packed.items()] +
+                [(level, True, floor.pack()) for level, floor in self.live.items()])
+
+    def restore(self, entries: List[Tuple[int, bool, bytes]], populate: Optional[Callable] = None,
+                version: int = savefile.VERSION):
+        """Restores entries() read from a save of the given format version."""
+        self.clear()
+        for level, live, blob in entries:
+            if live:
+                self.live[level] = Floor.unpack(level, blob, populate, version)
+            else:
+                if version != savefile.VERSION:
+                    # Stored packed, so bring it up to the current format now
+                    blob = Floor.unpack(level, blob, populate, version).pack()
+                self.packed[level] = blob
+                self.packed_bytes += len(blob)
+
+    def memory_stats(self) -> Dict[str, int]:
+        return {
+            'live_floors': len(self.live),
+            'packed_floors': len(self.packed),
+            'packed_bytes': self.packed_bytes,
+        }
+
+
+# Shared by every game in the process; created on first use
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=FLOOR_PREFETCH['workers'],
+                                       thread_name_prefix='floor-prefetch')
+    return _executor
+
+
+class FloorPrefetcher:
+    """Builds floors the player hasn't reached yet on a worker thread.
+
+    `build(level)` must depend only on the level (and the run's seed), so a
+    floor built ahead of time is the same one the player would get by
+    building it on arrival.
+    """
+
+    def __init__(self, build: Callable[[int], Floor]):
+        self.build = build
+        self.pending: Dict[int, Future] = {}
+
+    def prefetch(self, levels: Iterable[int]):
+        """Starts building levels; floors pending for other levels are dropped."""
+        wanted = set(levels)
+        for level in [level for level in self.pending if level not in wanted]:
+            self.pending.pop(level).cancel()
+        for level in sorted(wanted):
+            if level not in self.pending:
+                self.pending[level] = _pool().submit(self.build, level)
+
+    def take(self, level: int) -> Optional[Floor]:
+        """The prefetched floor (waiting for it if still being built), or
+        None if it wasn't prefetched."""
+        future = self.pending.pop(level, None)
+        return None if future is None else future.result()
+
+    def clear(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
@@ -0,0 +1,132 @@
+"""
+Field of view by recursive shadowcasting.
+
+Each of the eight octants around the viewer is scanned row by row outwards;
+a wall casts a shadow (a range of slopes) that later rows skip, so every
+cell within the radius is looked at once at most and nothing behind a wall
+is. Floors never change shape while they're played, so what is visible from
+a cell never changes either and FieldOfView keeps the results per position.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import FrozenSet, List, Set, Tuple
+
+from config import FOV
+from tile_grid import TileGrid, WALL
+
+Pos = Tuple[int, int]
+
+# (xx, xy, yx, yy) transforms from octant-local (col, row) to map offsets
+OCTANTS = [
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+]
+
+
+@lru_cache(maxsize=None)
+def _octant_rows(radius: int, xx: int, xy: int, yx: int, yy: int) -> List[List[Tuple]]:
+    """Per row of an octant, each cell's (left slope, right slope, map
+    offset x, map offset y, within radius), so casting does no arithmetic
+    beyond adding the origin."""
+    rows = []
+    for j in range(1, radius + 1):
+        dy = -j
+        rows.append([((dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5),
+                      dx * xx + dy * xy, dx * yx + dy * yy, dx * dx + dy * dy <= radius * radius)
+                     for dx in range(-j, 1)])
+    return rows
+
+
+def shadowcast(grid, origin: Pos, radius: int) -> FrozenSet[Pos]:
+    """Cells visible from origin within radius, walls included (they're
+    seen, they just block what's behind them)."""
+    ox, oy = origin
+    visible: Set[Pos] = {origin}
+    width, height = grid.width, grid.height
+    is_wall = grid.is_wall
+    # A TileGrid's cells are read directly; a ChunkedWorld goes through is_wall
+    cells = grid.cells if isinstance(grid, TileGrid) else None
+
+    def cast(rows: List[List[Tuple]], row: int, start: float, end: float):
+        if start < end:
+            return
+        new_start = start
+        for j in range(row, radius + 1):
+            blocked = False
+            for left, right, mx, my, lit in rows[j - 1]:
+                if start < right:
+                    continue
+                if end > left:
+                    break
+                x = ox + mx
+                y = oy + my
+                if 0 <= x < width and 0 <= y < height:
+                    if lit:
+                        visible.add((x, y))
+                    opaque = cells[y * width + x] == WALL if cells is not None else is_wall(x, y)
+                else:
+                    opaque = True
+                if blocked:
+                    if opaque:
+                        new_start = right
+                    else:
+                        blocked = False
+                        start = new_start
+                elif opaque and j < radius:
+                    # Scan the lit part before this wall one row further,
+                    # then carry on past the wall's shadow
+                    blocked = True
+                    cast(rows, j + 1, start, left)
+                    new_start = right
+            if blocked:
+                break
+
+    for octant in OCTANTS:
+        cast(_octant_rows(radius, *octant), 1, 1.0, 0.0)
+    return frozenset(visible)
+
+
+class FieldOfView:
+    """What the player can see on the current floor.
+
+    Visible sets are cached per position (least recently used dropped past
+    cache_size), so walking back over ground already covered costs a dict
+    lookup; the cache is per floor and starts over when the map changes.
+    A cast from a neighbouring cell can't be patched into a new one (every
+    slope moves with the viewer), so a new position is cast in full and the
+    radius is what bounds the work.
+    """
+
+    def __init__(self, radius: int = FOV['radius'], cache_size: int = FOV['cache_size']):
+        self.radius = radius
+        self.cache_size = cache_size
+        self.visible: FrozenSet[Pos] = frozenset()
+        self.origin = None
+        self._grid = None
+        self._cache: 'OrderedDict[Pos, FrozenSet[Pos]]' = OrderedDict()
+        self.computed = 0
+
+    def update(self, grid, origin: Pos) -> bool:
+        """Looks from origin; returns whether the visible set changed."""
+        if grid is not self._grid:
+            self._grid = grid
+            self._cache.clear()
+        elif origin == self.origin:
+            return False
+        self.origin = origin
+
+        cache = self._cache
+        visible = cache.get(origin)
+        if visible is None:
+            visible = cache[origin] = shadowcast(grid, origin, self.radius)
+            self.computed += 1
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(origin)
+        self.visible = visible
+        return True
+
+    def __contains__(self, pos: Pos) -> bool:
+        return pos in self.visible
@@ -3,69 +3,162 @@ import json
 import os
 import sys
 import time
-import pickle
 from collections import defaultdict
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Set
 
 from enums import Rarity, TileType, EnemyType
-from dataclasses import Item, Character, asdict
-from dungeon_generator import DungeonGenerator, Room
-from enemy import Enemy
-from config import CLASS_DEFS
+from dataclasses import Item, Character, EffectiveStats
+from dungeon_generator import Room, RoomGraph
+from enemy import Enemy, EnemyRef, EnemyStore, ENEMY_TYPES
+from pathfinding import FlowField, Occupancy
+from config import CLASS_DEFS, LARGE_WORLD, ENEMY_CHASE_RANGE, FLOOR_PREFETCH
+from renderer import Renderer
+from world import ChunkedWorld, Chunk
+from floors import Floor, FloorCache, FloorPrefetcher
+from fov import FieldOfView
+from generators import generator_for
+from inventory import Inventory, merge
+from loot import loot_table
+from events import (EventBus, MessageLog, Message, Hit, Hurt, Kill, Death, Pickup, LevelUp,
+                    Purchase, Sale)
+import savefile
+import journal
 
 class Game:
-    def __init__(self, skip_class_select: bool = False):
+    def __init__(self, skip_class_select: bool = False, character_class: Optional[str] = None,
+                 seed: Optional[int] = None, large_world: bool = False,
+                 prefetch_depth: int = FLOOR_PREFETCH['depth'], renderer: Optional[Renderer] = None,
+                 fog_of_war: bool = True):
+        # Every random draw in a run goes through this stream so a seed
+        # reproduces the whole game and games can run side by side.
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.renderer = renderer or Renderer()
         self.width = 80
         self.height = 24
+        # The screen shows a view_width x view_height window of the map
+        # around the player; for normal floors that is the whole map.
+        self.view_width = 80
+        self.view_height = 24
+        # Large-world floors are chunked and generated around the player
+        self.large_world = large_world
+        self.world: Optional[ChunkedWorld] = None
         self.player_pos = (0, 0)
         self.dungeon_level = 1
-        self.enemies: Dict[Tuple[int, int], Enemy] = {}
+        # Where the player arrives from above, and the stairs back up (none on
+        # the first floor or below a shop)
+        self.start_pos = (0, 0)
+        self.up_pos: Optional[Tuple[int, int]] = None
+        # Floors above, so the player can climb back to them
+        self.floors = FloorCache()
+        # Floors below, built in the background before the player gets there
+        self.prefetch_depth = prefetch_depth
+        self.prefetcher = FloorPrefetcher(self._build_floor)
+        self.enemies = EnemyStore()
         self.items: Dict[Tuple[int, int], Item] = {}
+        # Distances to the player shared by every enemy's move each turn
+        self.flow_field = FlowField(ENEMY_CHASE_RANGE)
+        # What the player sees now, and every cell of this floor they have
+        # seen (the rest is drawn as fog). Without fog of war only enemies'
+        # line of sight uses the field of view, and only as far as they
+        # chase; a shorter cast sees the same cells within that range.
+        self.fov = FieldOfView() if fog_of_war else FieldOfView(radius=ENEMY_CHASE_RANGE)
+        self.fog_of_war = fog_of_war
+        self.explored: Set[Tuple[int, int]] = set()
+        # This floor's rooms and the corridors between them
+        self.room_graph: Optional[RoomGraph] = None
         # placeholders; will be set by class selection or by load_game
         # Provide a safe default Character to avoid __init__ issues when loading.
         self.player = Character("Hero", 100, 100, 10, 5, 1, 0, 100, 0, 5.0, 1.5, "Adventurer")
-        self.inventory: List[Item] = []
+        self.inventory = Inventory()
+        # The inventory as the screens list it, and the order their numbers
+        # refer to
+        self.inventory_view = self.inventory.view()
         self.weapon: Optional[Item] = None
         self.armor: Optional[Item] = None
         self.amulet: Optional[Item] = None
-        self.message_log: List[str] = []
+        # Attack/defense/crit with equipment applied; rebuilt by _refresh_stats
+        # whenever the player or their equipment changes
+        self.stats = EffectiveStats.compute(self.player, None, None, None)
+        # What happens in the game is published here; the message log on
+        # the map screen is one subscriber
+        self.events = EventBus()
+        self.messages = MessageLog()
+        self.events.subscribe(self.messages.add)
         self.game_over = False
+        self.death_cause: Optional[EnemyType] = None
         self.in_shop = False
-
-        # Only ask the player for class selection for brand-new games
-        if not skip_class_select:
+        self.shop_items: List[Item] = []
+        # Screen that input goes to: 'class', 'play' or 'inventory' (the
+        # shop screen follows in_shop)
+        self.mode = 'play'
+        self.class_error = ''
+        # Autosave: when set, every command is appended to this journal
+        self.journal: Optional[journal.Journal] = None
+        # Session recording (replay.Recording): when set, every line of
+        # input handled is appended to it
+        self.recording = None
+        # (SaveArchive, slot name) when playing from a save archive
+        self.archive_slot = None
+
+        # Only ask the player for class selection for brand-new games;
+        # a class passed in directly (headless runs) skips the prompt.
+        if character_class is not None:
+            self.set_class(character_class)
+        elif not skip_class_select:
             self.choose_class()
 
         # generate starting level (or will be replaced by load_game)
         self.generate_level()
 
     def add_message(self, msg: str):
-        self.message_log.append(msg)
-        if len(self.message_log) > 5:
-            self.message_log.pop(0)
+        self.events.publish(Message(msg))
+
+    @property
+    def message_log(self) -> List[str]:
+        return self.messages.lines()
+
+    @message_log.setter
+    def message_log(self, lines: List[str]):
+        self.messages.replace(lines)
 
     # -------------------------
     # Class selection
     # -------------------------
     def choose_class(self):
-        os.system('clear' if os.name != 'nt' else 'cls')
-        print("Choose your class:\n")
-        names = list(CLASS_DEFS.keys())
-        for i, name in enumerate(names, start=1):
+        # Blocking class selection for terminal play; the server feeds
+        # handle_input one line at a time instead
+        self.mode = 'class'
+        while self.mode == 'class':
+            self.render()
+            self.handle_input(input(self.prompt))
+
+    def _render_class_select(self):
+        screen = self.renderer
+        screen.begin_frame()
+        screen.add_text("Choose your class:")
+        screen.add_text()
+        for i, name in enumerate(CLASS_DEFS, start=1):
             c = CLASS_DEFS[name]
-            print(f"{i}. {name}")
-            print(f"   HP: {c['hp']} | ATK: {c['atk']} | DEF: {c['def']}")
-            print(f"   Crit: {int(c['crit'])}% | Crit DMG: {c['crit_dmg']}x")
-            print(f"   Starting Weapon: {c['weapon_name']} (+{c['weapon_bonus']} ATK)")
-            print(f"   Playstyle: {c['playstyle']}\n")
-
-        while True:
-            choice = input("Enter the number of your class: ").strip()
-            if choice.isdigit() and 1 <= int(choice) <= len(names):
-                chosen_name = names[int(choice) - 1]
-                break
-            print("Invalid selection. Try again.")
+            screen.add_text(f"{i}. {name}")
+            screen.add_text(f"   HP: {c['hp']} | ATK: {c['atk']} | DEF: {c['def']}")
+            screen.add_text(f"   Crit: {int(c['crit'])}% | Crit DMG: {c['crit_dmg']}x")
+            screen.add_text(f"   Starting Weapon: {c['weapon_name']} (+{c['weapon_bonus']} ATK)")
+            screen.add_text(f"   Playstyle: {c['playstyle']}")
+            screen.add_text()
+        screen.add_text(self.class_error)
+        screen.present()
+
+    def _class_input(self, choice: str):
+        names = list(CLASS_DEFS.keys())
+        if choice.isdigit() and 1 <= int(choice) <= len(names):
+            self.class_error = ''
+            self.mode = 'play'
+            self.set_class(names[int(choice) - 1])
+        else:
+            self.class_error = "Invalid selection. Try again."
 
+    def set_class(self, chosen_name: str):
         stats = CLASS_DEFS[chosen_name]
         # Create player Character using class stats (player.attack is base attack WITHOUT weapon)
         self.player = Character(
@@ -92,110 +185,140 @@ class Game:
             rarity=Rarity.COMMON
         )
         self.weapon = weapon_item
+        self._refresh_stats()
         self.add_message(f"Selected class: {chosen_name}. Equipped {weapon_item.name} (+{weapon_item.value} ATK)")
 
     # -------------------------
     # Level generation, items, enemies...
     # -------------------------
-    def generate_level(self):
+    def _floor_rng(self, level: int) -> random.Random:
+        # Each floor has its own stream derived from the run's seed, so it
+        # comes out the same however the run got there
+        return random.Random(f"{self.seed}:floor:{level}")
+
+    def generate_level(self, from_below: bool = False):
+        level = self.dungeon_level
         # Check if this is a shop level (every 5 levels)
-        if self.dungeon_level % 5 == 0:
+        if level % 5 == 0:
             self.in_shop = True
-            self.add_message(f"Welcome to the shop! Floor {self.dungeon_level}")
+            self.shop_items = self.stock_shop(self._floor_rng(level))
+            # Nothing from the floor above follows the player in
+            self.enemies.clear()
+            self.items = {}
+            self.add_message(f"Welcome to the shop! Floor {level}")
+            self._prefetch_floors()
             return
 
         self.in_shop = False
-        gen = DungeonGenerator(self.width, self.height)
-        self.grid, rooms = gen.generate(random.randint(6, 10))
-
-        # Place player in first room (center)
-        self.player_pos = rooms[0].center
-
-        # Place stairs in last room
-        self.stairs_pos = rooms[-1].center
-
-        # Place enemies and items
+        self.shop_items = []
+        floor = self.floors.take(level, populate=self._populate_chunk)
+        if floor is None:
+            floor = self.prefetcher.take(level) or self._build_floor(level)
+        self._enter_floor(floor, floor.stairs_pos if from_below else floor.start_pos)
+        if from_below:
+            self.add_message(f"Climbed back up to dungeon level {level}")
+        else:
+            self.add_message(f"Entered dungeon level {level}")
+        self._prefetch_floors()
+
+    def _prefetch_floors(self):
+        # Floors already visited come back from the floor cache instead
+        level = self.dungeon_level
+        below = range(level + 1, level + 1 + self.prefetch_depth)
+        self.prefetcher.prefetch(n for n in below if n % 5 != 0 and n not in self.floors)
+
+    def _build_floor(self, level: int) -> Floor:
+        # Also runs on the prefetch thread: it must not touch game state
+        # beyond the seed and the map settings
+        rng = self._floor_rng(level)
+        if self.large_world:
+            cfg = LARGE_WORLD
+            world = ChunkedWorld(rng.getrandbits(64), cfg['chunks_x'], cfg['chunks_y'],
+                                 cfg['chunk_size'], cfg['load_radius'], cfg['rooms_per_chunk'],
+                                 populate=self._populate_chunk)
+            # Enemies and items spawn as chunks load
+            grid, start_pos, stairs_pos, enemies, items = world, world.start_pos, world.stairs_pos, {}, {}
+            room_graph = None
+        else:
+            gen = generator_for(level)(self.width, self.height, rng=rng)
+            grid, rooms = gen.generate(rng.randint(6, 10))
+            room_graph = gen.graph
+            # Player arrives in the first room, stairs go in the last
+            start_pos, stairs_pos = rooms[0].center, rooms[-1].center
+            enemies, items = {}, {}
+            self._populate_rooms(rooms[1:-1], rng, enemies, items, level)  # Skip first and last room
+
+        up_pos = start_pos if level > 1 and (level - 1) % 5 != 0 else None
+        return Floor(level, grid, start_pos, stairs_pos, up_pos, enemies, items, room_graph=room_graph)
+
+    def _enter_floor(self, floor: Floor, pos: Tuple[int, int]):
+        self.grid = floor.grid
+        self.world = floor.grid if isinstance(floor.grid, ChunkedWorld) else None
+        self.width, self.height = floor.grid.width, floor.grid.height
+        self.start_pos = floor.start_pos
+        self.stairs_pos = floor.stairs_pos
+        self.up_pos = floor.up_pos
         self.enemies.clear()
-        self.items.clear()
-
-        for room in rooms[1:-1]:  # Skip first and last room
+        self.enemies.update(floor.enemies)
+        self.items = floor.items
+        self.explored = floor.explored
+        self.room_graph = floor.room_graph
+        self.player_pos = pos
+        if self.world is not None:
+            self.world.update(pos, self.enemies, self.items)
+        self._look()
+
+    def _stash_floor(self):
+        # Keep the floor being left so the player can come back to it
+        if self.in_shop:
+            return
+        self.floors.put(Floor(self.dungeon_level, self.grid, self.start_pos, self.stairs_pos, self.up_pos,
+                              self.enemies.detach_all(), self.items, self.explored, self.room_graph))
+        self.items = {}
+        self.explored = set()
+
+    def _populate_rooms(self, rooms: List[Room], rng: random.Random,
+                        enemies: Dict[Tuple[int, int], Enemy], items: Dict[Tuple[int, int], Item],
+                        level: int):
+        item_spots = []
+        for room in rooms:
             # Enemies
-            if random.random() < 0.7:
-                enemy_x = random.randint(room.x + 1, room.x + room.width - 2)
-                enemy_y = random.randint(room.y + 1, room.y + room.height - 2)
-                enemy_type = random.choice(list(EnemyType))
-                self.enemies[(enemy_x, enemy_y)] = Enemy(enemy_type, self.dungeon_level)
+            if rng.random() < 0.7:
+                enemy_x = rng.randint(room.x + 1, room.x + room.width - 2)
+                enemy_y = rng.randint(room.y + 1, room.y + room.height - 2)
+                enemy_type = rng.choice(list(EnemyType))
+                enemies[(enemy_x, enemy_y)] = Enemy(enemy_type, level)
 
             # Items
-            if random.random() < 0.4:
-                item_x = random.randint(room.x + 1, room.x + room.width - 2)
-                item_y = random.randint(room.y + 1, room.y + room.height - 2)
-                self.items[(item_x, item_y)] = self._generate_item()
-
-        self.add_message(f"Entered dungeon level {self.dungeon_level}")
-
-    def _generate_item(self) -> Item:
-        # First, determine if we should drop money instead of an item
-        money_chance = 0.3  # 30% chance to find money instead of an item
-        if random.random() < money_chance:
-            # Generate money drop
-            gold_amount = random.randint(5, 20) + (self.dungeon_level * 2)
-            return Item("Gold Pouch", 'gold', gold_amount, f"A pouch containing {gold_amount} gold", Rarity.COMMON)
-
-        item_type = random.choice(['weapon', 'armor', 'amulet', 'potion'])
-        
-        # Reduce potion frequency by adjusting weights
-        item_weights = {
-            'weapon': 0.3,
-            'armor': 0.3,
-            'amulet': 0.25,
-            'potion': 0.15  # Reduced from equal chance
-        }
-        
-        item_type = random.choices(
-            list(item_weights.keys()),
-            weights=list(item_weights.values())
-        )[0]
-
-        # Determine rarity with weighted probabilities
-        rarity_roll = random.random()
-        if rarity_roll < 0.5:
-            rarity = Rarity.COMMON
-        elif rarity_roll < 0.8:
-            rarity = Rarity.UNCOMMON
-        elif rarity_roll < 0.95:
-            rarity = Rarity.RARE
-        else:
-            rarity = Rarity.EPIC
-
-        base_value = random.randint(2, 5) + self.dungeon_level
-        actual_value = int(base_value * rarity.multiplier)
-
-        if item_type == 'weapon':
-            weapons = ['Sword', 'Axe', 'Mace', 'Spear', 'Dagger']
-            name = random.choice(weapons)
-            return Item(name, 'attack', actual_value, f"A deadly {name.lower()}", rarity)
-        elif item_type == 'armor':
-            armors = ['Leather Armor', 'Chain Mail', 'Plate Armor', 'Shield']
-            name = random.choice(armors)
-            return Item(name, 'defense', actual_value, f"Protective {name.lower()}", rarity)
-        elif item_type == 'amulet':
-            amulet_type = random.choice(['crit_chance', 'crit_damage'])
-            if amulet_type == 'crit_chance':
-                value = random.randint(2, 5) * rarity.multiplier
-                return Item('Amulet of Precision', 'crit_chance', int(value), 'Increases critical hit chance', rarity)
-            else:
-                value = random.randint(10, 25) * (rarity.multiplier / 10)
-                return Item('Amulet of Power', 'crit_damage', int(value * 10), 'Increases critical damage', rarity)
-        else:
-            # Health potion - reduced frequency due to the weights above
-            heal_amount = 30 + (self.dungeon_level * 5)  # Scale potion healing with dungeon level
-            return Item('Health Potion', 'heal', heal_amount, f'Restores {heal_amount} HP', Rarity.COMMON)
+            if rng.random() < 0.4:
+                item_x = rng.randint(room.x + 1, room.x + room.width - 2)
+                item_y = rng.randint(room.y + 1, room.y + room.height - 2)
+                item_spots.append((item_x, item_y))
+        # All of the floor's items in one batch from the depth's loot table
+        items.update(zip(item_spots, loot_table('floor', level).sample(rng, len(item_spots))))
+
+    def _populate_chunk(self, chunk: Chunk):
+        enemies: Dict[Tuple[int, int], Enemy] = {}
+        items: Dict[Tuple[int, int], Item] = {}
+        # Same rule as a normal floor: the first and last room of each chunk
+        # are left empty (they hold the start and the stairs).
+        self._populate_rooms(chunk.rooms[1:-1], chunk.rng, enemies, items, self.dungeon_level)
+        return enemies, items
+
+    def _generate_item(self, rng: Optional[random.Random] = None, level: Optional[int] = None) -> Item:
+        # A gold pouch or an item, as found on the floor (see config.LOOT)
+        level = self.dungeon_level if level is None else level
+        return loot_table('floor', level).draw(rng or self.rng)
 
     # -------------------------
     # Movement & combat
     # -------------------------
+    def _record(self, command: str, *args: int):
+        if self.journal is not None:
+            self.journal.record(self, command, *args)
+
     def move_player(self, dx: int, dy: int):
+        self._record('move_player', dx, dy)
         if self.in_shop:
             return
 
@@ -205,7 +328,7 @@ class Game:
         if not (0 <= new_x < self.width and 0 <= new_y < self.height):
             return
 
-        if self.grid[new_y][new_x] == TileType.WALL:
+        if self.grid.is_wall(new_x, new_y):
             return
 
         # Check for enemy
@@ -220,90 +343,142 @@ class Game:
             if item.item_type == 'gold':
                 # Handle money pickup
                 self.player.gold += item.value
-                self.add_message(f"Found {item.value} gold!")
             else:
                 # Handle regular item pickup
                 self.inventory.append(item)
-                self.add_message(f"Picked up {item.rarity.display_name} {item.name}")
+            self.events.publish(Pickup(item))
 
         # Check for stairs
         if (new_x, new_y) == self.stairs_pos:
+            self._stash_floor()
             self.dungeon_level += 1
             self.generate_level()
             return
+        if (new_x, new_y) == self.up_pos:
+            self._stash_floor()
+            self.dungeon_level -= 1
+            self.generate_level(from_below=True)
+            return
 
         self.player_pos = (new_x, new_y)
+        if self.world is not None:
+            self.world.update(self.player_pos, self.enemies, self.items)
+        self._look()
 
         # Enemy turns
         self._enemy_turns()
 
-    def _combat(self, enemy: Enemy):
-        # Calculate crit (crit_chance stored as percent)
-        crit_chance = self.player.crit_chance + (self.amulet.value / 100 if self.amulet and self.amulet.item_type == 'crit_chance' else 0)
-        crit_dmg_bonus = self.player.crit_damage + (self.amulet.value / 100 if self.amulet and self.amulet.item_type == 'crit_damage' else 0)
+    def _look(self):
+        # Only a move changes what is visible, and only the cells now in view
+        # need adding to the explored ones
+        if self.fog_of_war and self.fov.update(self.grid, self.player_pos):
+            self.explored |= self.fov.visible
 
-        is_crit = random.random() * 100 < crit_chance
+    def _refresh_stats(self):
+        self.stats = EffectiveStats.compute(self.player, self.weapon, self.armor, self.amulet)
 
-        base_dmg = max(1, self.player.attack + (self.weapon.value if self.weapon else 0) - enemy.defense)
-        player_dmg = int(base_dmg * crit_dmg_bonus) if is_crit else base_dmg
+    def _combat(self, enemy: EnemyRef):
+        stats = self.stats
+        # crit_chance is a percent
+        is_crit = self.rng.random() * 100 < stats.crit_chance
+
+        base_dmg = max(1, stats.attack - enemy.defense)
+        player_dmg = int(base_dmg * stats.crit_damage) if is_crit else base_dmg
 
         enemy.hp -= player_dmg
-        if is_crit:
-            self.add_message(f"CRIT! Hit {enemy.name} for {player_dmg} damage!")
-        else:
-            self.add_message(f"Hit {enemy.name} for {player_dmg} damage!")
+        publish = self.events.publish
+        publish(Hit(enemy.type, player_dmg, is_crit))
 
         if enemy.hp <= 0:
-            self.add_message(f"Defeated {enemy.name}! +{enemy.xp_reward} XP, +{enemy.gold_reward} gold")
+            publish(Kill(enemy.type, enemy.xp_reward, enemy.gold_reward))
             self.player.xp += enemy.xp_reward
             self.player.gold += enemy.gold_reward
 
-            # Remove enemy
-            for pos, e in list(self.enemies.items()):
-                if e is enemy:
-                    del self.enemies[pos]
-                    break
+            self.enemies.remove(enemy)
 
             self._check_level_up()
         else:
-            enemy_dmg = max(1, enemy.attack - (self.player.defense + (self.armor.value if self.armor else 0)))
+            enemy_dmg = max(1, enemy.attack - stats.defense)
             self.player.hp -= enemy_dmg
-            self.add_message(f"{enemy.name} hit you for {enemy_dmg} damage!")
+            publish(Hurt(enemy.type, enemy_dmg))
 
             if self.player.hp <= 0:
                 self.game_over = True
-                self.add_message("You died! Game Over.")
+                self.death_cause = enemy.type
+                publish(Death(enemy.type))
 
     def _enemy_turns(self):
-        for pos, enemy in list(self.enemies.items()):
-            # Simple AI: move towards player if in range
-            dx = self.player_pos[0] - pos[0]
-            dy = self.player_pos[1] - pos[1]
-            distance = abs(dx) + abs(dy)
-
-            if distance <= 5:
-                move_x = 1 if dx > 0 else -1 if dx < 0 else 0
-                move_y = 1 if dy > 0 else -1 if dy < 0 else 0
-
-                new_x = pos[0] + move_x
-                new_y = pos[1] + move_y
-
-                if (new_x, new_y) == self.player_pos:
-                    # Attack player
-                    enemy_dmg = random.randint(1, 15)
-                    self.player.hp -= enemy_dmg
-                    self.add_message(f"{enemy.name} hit you for {enemy_dmg} damage!")
-
-                    if self.player.hp <= 0:
-                        self.game_over = True
-                        self.add_message("You died! Game Over.")
-                elif (0 <= new_x < self.width and 0 <= new_y < self.height and
-                      self.grid[new_y][new_x] == TileType.FLOOR and
-                      (new_x, new_y) not in self.enemies):
-                    del self.enemies[pos]
-                    self.enemies[(new_x, new_y)] = enemy
+        field = self.flow_field
+        enemies = self.enemies
+        slot_at = enemies.slot_at
+        # A path is never shorter than the straight Manhattan distance, so
+        # with no enemy that close the field isn't worth building
+        px, py = self.player_pos
+        radius = field.radius
+        if not any(abs(x - px) + abs(y - py) <= radius for x, y in slot_at):
+            return
+        field.update(self.grid, self.player_pos)
+
+        # Range check: enemies within chase range (by path, not straight-line
+        # distance), closest first so the front of a crowd moves out of the
+        # way. Walk whichever of the two maps is smaller.
+        dist = field.dist
+        if len(slot_at) <= len(dist):
+            chasers = sorted((dist[pos], pos) for pos in slot_at if pos in dist)
+        else:
+            chasers = sorted((d, pos) for pos, d in dist.items() if pos in slot_at)
+        if not chasers:
+            return
+        # Of those, only the ones that can see the player chase. The field of
+        # view is only needed (and so only computed) once one is in range.
+        fov = self.fov
+        fov.update(self.grid, self.player_pos)
+        chasers = [(d, pos) for d, pos in chasers if pos in fov.visible]
+        if not chasers:
+            return
+
+        # Movement proposals for all chasers at once, ignoring each other;
+        # a proposal only needs redoing when it collides with another enemy.
+        positions = [pos for _, pos in chasers]
+        proposals = field.steps(positions)
+
+        occupied = Occupancy(slot_at)
+        vacated, claimed = occupied.vacated, occupied.claimed
+        moves = []
+        player_pos = self.player_pos
+        is_floor = self.grid.is_floor
+        for pos, step in zip(positions, proposals):
+            if step is None:
+                continue
+            if step in claimed or (step in slot_at and step not in vacated):
+                step = field.step(pos, occupied)
+                if step is None:
+                    continue
+
+            slot = slot_at[pos]
+            if step == player_pos:
+                # Attack player
+                enemy_type = ENEMY_TYPES[enemies.types[slot]]
+                enemy_dmg = self.rng.randint(1, 15)
+                self.player.hp -= enemy_dmg
+                self.events.publish(Hurt(enemy_type, enemy_dmg))
+
+                if self.player.hp <= 0:
+                    if not self.game_over:
+                        # Later attackers this turn hit a dead player
+                        self.events.publish(Death(enemy_type))
+                    self.game_over = True
+                    self.death_cause = enemy_type
+            elif is_floor(*step):
+                vacated.add(pos)
+                claimed.add(step)
+                moves.append((slot, step))
+
+        enemies.move_all(moves)
 
     def _check_level_up(self):
+        if self.player.xp < self.player.xp_to_next:
+            return
         while self.player.xp >= self.player.xp_to_next:
             self.player.level += 1
             self.player.xp -= self.player.xp_to_next
@@ -314,12 +489,14 @@ class Game:
             self.player.attack += 2
             self.player.defense += 1
 
-            self.add_message(f"Level Up! Now level {self.player.level}")
+            self.events.publish(LevelUp(self.player.level))
+        self._refresh_stats()
 
     # -------------------------
     # Items / Inventory
     # -------------------------
     def use_item(self, index: int):
+        self._record('use_item', index)
         if 0 <= index < len(self.inventory):
             item = self.inventory[index]
 
@@ -343,8 +520,10 @@ class Game:
                     self.inventory.append(self.amulet)
                 self.amulet = self.inventory.pop(index)
                 self.add_message(f"Equipped {item.name}")
+            self._refresh_stats()
 
     def combine_items(self, idx1: int, idx2: int):
+        self._record('combine_items', idx1, idx2)
         if not (0 <= idx1 < len(self.inventory) and 0 <= idx2 < len(self.inventory)):
             self.add_message("Invalid item indices")
             return
@@ -367,385 +546,438 @@ class Game:
             return
 
         # Combine items - add the values and use higher rarity
-        new_value = item1.value + item2.value
-        new_rarity = item1.rarity if item1.rarity.multiplier > item2.rarity.multiplier else item2.rarity
-        combined_item = Item(item1.name, item1.item_type, new_value, item1.description, new_rarity)
+        combined_item = merge([item1, item2])
 
         # Remove both items and add the combined one
-        higher_idx = max(idx1, idx2)
-        lower_idx = min(idx1, idx2)
-
-        self.inventory.pop(higher_idx)
-        self.inventory.pop(lower_idx)
+        self.inventory.remove_many((idx1, idx2))
         self.inventory.append(combined_item)
 
-        self.add_message(f"Combined into {new_rarity.display_name} {combined_item.name} (+{new_value})!")
+        self.add_message(f"Combined into {combined_item.rarity.display_name} {combined_item.name} "
+                         f"(+{combined_item.value})!")
+
+    def combine_all(self):
+        self._record('combine_all')
+        combined = self.inventory.combine_all()
+        if not combined:
+            self.add_message("Nothing to combine")
+        elif len(combined) == 1:
+            item = combined[0]
+            self.add_message(f"Combined into {item.rarity.display_name} {item.name} (+{item.value})!")
+        else:
+            self.add_message(f"Combined {len(combined)} kinds of items")
 
     # -------------------------
     # Shop
     # -------------------------
-    def show_shop(self):
-        shop_items = []
-        # Generate shop inventory
-        for _ in range(8):
-            item_type = random.choice(['weapon', 'armor', 'amulet'])
-            rarity = random.choices(
-                [Rarity.COMMON, Rarity.UNCOMMON, Rarity.RARE],
-                weights=[0.5, 0.35, 0.15]
-            )[0]
-
-            base_value = random.randint(3, 7) + self.dungeon_level // 2
-            actual_value = int(base_value * rarity.multiplier)
-
-            if item_type == 'weapon':
-                weapons = ['Sword', 'Axe', 'Mace', 'Spear', 'Dagger', 'Halberd']
-                name = random.choice(weapons)
-                shop_items.append(Item(name, 'attack', actual_value, f"A deadly {name.lower()}", rarity))
-            elif item_type == 'armor':
-                armors = ['Leather Armor', 'Chain Mail', 'Plate Armor', 'Shield', 'Helmet']
-                name = random.choice(armors)
-                shop_items.append(Item(name, 'defense', actual_value, f"Protective {name.lower()}", rarity))
+    def stock_shop(self, rng: Optional[random.Random] = None) -> List[Item]:
+        return loot_table('shop', self.dungeon_level).shop_stock(rng or self.rng)
+
+    def buy_item(self, idx: int):
+        self._record('buy_item', idx)
+        if 0 <= idx < len(self.shop_items):
+            item = self.shop_items[idx]
+            price = item.get_price()
+            if self.player.gold >= price:
+                self.player.gold -= price
+                self.inventory.append(item)
+                self.events.publish(Purchase(item, price))
             else:
-                amulet_type = random.choice(['crit_chance', 'crit_damage'])
-                if amulet_type == 'crit_chance':
-                    value = random.randint(2, 5) * rarity.multiplier
-                    shop_items.append(Item('Amulet of Precision', 'crit_chance', int(value), 'Increases critical hit chance', rarity))
-                else:
-                    value = random.randint(10, 25) * (rarity.multiplier / 10)
-                    shop_items.append(Item('Amulet of Power', 'crit_damage', int(value * 10), 'Increases critical damage', rarity))
-
-        # Add health potions (reduced quantity)
-        for _ in range(2):  # Reduced from 3 to 2
-            heal_amount = 30 + (self.dungeon_level * 5)
-            shop_items.append(Item('Health Potion', 'heal', heal_amount, f'Restores {heal_amount} HP', Rarity.COMMON))
+                self.add_message(f"Not enough gold! Need {price}, have {self.player.gold}")
+
+    def sell_item(self, idx: int):
+        self._record('sell_item', idx)
+        if 0 <= idx < len(self.inventory):
+            item = self.inventory.pop(idx)
+            sell_price = item.get_sell_price()
+            self.player.gold += sell_price
+            self.events.publish(Sale([item], sell_price))
+
+    def sell_items(self, *indices: int):
+        self._record('sell_items', *indices)
+        sold = self.inventory.remove_many(i for i in indices if 0 <= i < len(self.inventory))
+        if sold:
+            total = sum(item.get_sell_price() for item in sold)
+            self.player.gold += total
+            self.events.publish(Sale(sold, total))
+
+    def leave_shop(self):
+        self._record('leave_shop')
+        self.dungeon_level += 1
+        self.generate_level()
 
-        while True:
-            os.system('clear' if os.name != 'nt' else 'cls')
-            print("=" * 80)
-            print(f"{'SHOP - FLOOR ' + str(self.dungeon_level):^80}")
-            print("=" * 80)
-            print(f"Your Gold: {self.player.gold}")
-            print("\n=== SHOP INVENTORY ===")
-
-            for i, item in enumerate(shop_items):
-                print(f"{i+1}. {item.colored_repr()} - {item.get_price()} gold")
-
-            print("\n=== YOUR INVENTORY ===")
-            if not self.inventory:
-                print("Empty")
+    def _render_shop(self):
+        screen = self.renderer
+        screen.begin_frame()
+        screen.add_text("=" * 80)
+        screen.add_text(f"{'SHOP - FLOOR ' + str(self.dungeon_level):^80}")
+        screen.add_text("=" * 80)
+        screen.add_text(f"Your Gold: {self.player.gold}")
+        screen.add_text()
+        screen.add_text("=== SHOP INVENTORY ===")
+
+        for i, item in enumerate(self.shop_items):
+            screen.add_text(f"{i+1}. {item.colored_repr()} - {item.get_price()} gold")
+
+        screen.add_text()
+        screen.add_text("=== YOUR INVENTORY ===")
+        if not self.inventory:
+            screen.add_text("Empty")
+        else:
+            for i, item in enumerate(self.inventory_view):
+                screen.add_text(f"s{i+1}. {item.colored_repr()} - Sell for {item.get_sell_price()} gold")
+
+        screen.add_text()
+        screen.add_text("Type number to buy, 's' + numbers to sell (e.g., 's3' or 's1 4 5'), 'leave' to continue")
+        screen.present()
+
+    def _shop_input(self, choice: str):
+        if choice == 'leave':
+            self.leave_shop()
+        elif choice.startswith('s') and len(choice) > 1:
+            try:
+                indices = self._inventory_indices(self._parse_numbers(choice[1:]))
+            except (ValueError, IndexError):
+                self.add_message("Invalid sell command")
+                return
+            if len(indices) == 1:
+                self.sell_item(indices[0])
             else:
-                for i, item in enumerate(self.inventory):
-                    print(f"s{i+1}. {item.colored_repr()} - Sell for {item.get_sell_price()} gold")
-
-            print("\nType number to buy, 's' + number to sell (e.g., 's3'), 'leave' to continue")
-
-            choice = input("> ").strip().lower()
-
-            if choice == 'leave':
-                self.dungeon_level += 1
-                self.generate_level()
-                break
-            elif choice.startswith('s') and len(choice) > 1:
-                try:
-                    idx = int(choice[1:]) - 1
-                    if 0 <= idx < len(self.inventory):
-                        item = self.inventory.pop(idx)
-                        sell_price = item.get_sell_price()
-                        self.player.gold += sell_price
-                        self.add_message(f"Sold {item.name} for {sell_price} gold")
-                except ValueError:
-                    self.add_message("Invalid sell command")
-            elif choice.isdigit():
-                idx = int(choice) - 1
-                if 0 <= idx < len(shop_items):
-                    item = shop_items[idx]
-                    price = item.get_price()
-                    if self.player.gold >= price:
-                        self.player.gold -= price
-                        self.inventory.append(item)
-                        self.add_message(f"Bought {item.name} for {price} gold")
-                    else:
-                        self.add_message(f"Not enough gold! Need {price}, have {self.player.gold}")
+                self.sell_items(*indices)
+        elif choice.isdigit():
+            self.buy_item(int(choice) - 1)
 
     # -------------------------
     # Rendering & UI
     # -------------------------
     def render(self):
-        os.system('clear' if os.name != 'nt' else 'cls')
-
-        if self.in_shop:
-            self.show_shop()
-            return
-
-        # Draw dungeon
-        for y in range(self.height):
-            row = []
-            for x in range(self.width):
-                if (x, y) == self.player_pos:
-                    row.append('\033[93m@\033[0m')  # Yellow player
-                elif (x, y) in self.enemies:
-                    enemy = self.enemies[(x, y)]
-                    row.append(f'{enemy.color}{enemy.symbol}\033[0m')
-                elif (x, y) in self.items:
-                    # Different color for gold items
-                    item = self.items[(x, y)]
-                    if item.item_type == 'gold':
-                        row.append('\033[33m$\033[0m')  # Gold color for money
+        """Draws the screen for the current mode."""
+        if self.mode == 'class':
+            self._render_class_select()
+        elif self.in_shop:
+            self._render_shop()
+        elif self.mode == 'inventory':
+            self._render_inventory()
+        else:
+            self._render_map()
+
+    def _render_map(self):
+        # Camera: a view-sized window centred on the player, kept inside the map
+        view_w = min(self.view_width, self.width)
+        view_h = min(self.view_height, self.height)
+        x0 = min(max(0, self.player_pos[0] - view_w // 2), self.width - view_w)
+        y0 = min(max(0, self.player_pos[1] - view_h // 2), self.height - view_h)
+
+        # Draw dungeon: tiles first, then stairs, items, enemies and the
+        # player on top, touching only the cells that hold something. With
+        # fog of war, tiles out of sight are drawn dim if explored and not at
+        # all otherwise, and only stairs are remembered.
+        fog = self.fog_of_war
+        visible = self.fov.visible
+        explored = self.explored
+        if fog:
+            rows = []
+            for y in range(y0, y0 + view_h):
+                row = []
+                for x, tile in enumerate(self.grid.row(y, x0, x0 + view_w), x0):
+                    if (x, y) in visible:
+                        row.append(tile)
+                    elif (x, y) in explored:
+                        row.append('\033[90m' + tile)  # Dim: seen before
                     else:
-                        row.append('\033[92mi\033[0m')  # Green for regular items
-                elif (hasattr(self, 'stairs_pos') and (x, y) == self.stairs_pos):
-                    row.append('\033[96m>\033[0m')  # Cyan stairs
-                else:
-                    tile = self.grid[y][x]
-                    row.append(tile.value)
-            print(''.join(row))
+                        row.append(' ')
+                rows.append(row)
+        else:
+            rows = [list(self.grid.row(y, x0, x0 + view_w)) for y in range(y0, y0 + view_h)]
+
+        def in_view(x, y):
+            return 0 <= x - x0 < view_w and 0 <= y - y0 < view_h
+
+        def shown(pos, remembered=False):
+            return not fog or pos in visible or (remembered and pos in explored)
+
+        if hasattr(self, 'stairs_pos') and in_view(*self.stairs_pos) and shown(self.stairs_pos, True):
+            x, y = self.stairs_pos
+            rows[y - y0][x - x0] = '\033[96m>'  # Cyan stairs
+        if self.up_pos is not None and in_view(*self.up_pos) and shown(self.up_pos, True):
+            x, y = self.up_pos
+            rows[y - y0][x - x0] = '\033[96m' + TileType.STAIRS_UP.value
+        for (x, y), item in self.items.items():
+            if not in_view(x, y) or not shown((x, y)):
+                continue
+            # Different color for gold items
+            if item.item_type == 'gold':
+                rows[y - y0][x - x0] = '\033[33m$'  # Gold color for money
+            else:
+                rows[y - y0][x - x0] = '\033[92mi'  # Green for regular items
+        for x, y, glyph in self.enemies.glyphs():
+            if in_view(x, y) and shown((x, y)):
+                rows[y - y0][x - x0] = glyph
+        x, y = self.player_pos
+        rows[y - y0][x - x0] = '\033[93m@'  # Yellow player
+
+        screen = self.renderer
+        screen.begin_frame()
+        for row in rows:
+            screen.add_cells(row)
 
         # Status bar
-        print("=" * self.width)
-        print(f"Class: {self.player.character_class} | HP: {self.player.hp}/{self.player.max_hp} | "
-              f"Gold: {self.player.gold} | "
-              f"Lvl: {self.player.level} | XP: {self.player.xp}/{self.player.xp_to_next} | "
-              f"Depth: {self.dungeon_level}")
-
-        weapon_bonus = self.weapon.value if self.weapon else 0
-        armor_bonus = self.armor.value if self.armor else 0
-        crit_chance_bonus = self.amulet.value if self.amulet and self.amulet.item_type == 'crit_chance' else 0
-        crit_dmg_bonus = self.amulet.value if self.amulet and self.amulet.item_type == 'crit_damage' else 0
-
-        total_atk = self.player.attack + weapon_bonus
-        total_def = self.player.defense + armor_bonus
-        total_crit_chance = self.player.crit_chance + crit_chance_bonus
-        total_crit_dmg = self.player.crit_damage + (crit_dmg_bonus / 100)
-
-        print(f"ATK: {total_atk} | "
-              f"DEF: {total_def} | "
-              f"Crit: {total_crit_chance:.1f}% | "
-              f"CritDMG: {total_crit_dmg:.2f}x")
+        screen.add_text("=" * view_w)
+        screen.add_text(f"Class: {self.player.character_class} | HP: {self.player.hp}/{self.player.max_hp} | "
+                        f"Gold: {self.player.gold} | "
+                        f"Lvl: {self.player.level} | XP: {self.player.xp}/{self.player.xp_to_next} | "
+                        f"Depth: {self.dungeon_level}")
+        if self.world is not None:
+            dx = self.stairs_pos[0] - self.player_pos[0]
+            dy = self.stairs_pos[1] - self.player_pos[1]
+            screen.add_text(f"Position: {self.player_pos[0]},{self.player_pos[1]} | Stairs: {dx:+d},{dy:+d}")
+
+        stats = self.stats
+        screen.add_text(f"ATK: {stats.attack} | "
+                        f"DEF: {stats.defense} | "
+                        f"Crit: {stats.crit_chance:.1f}% | "
+                        f"CritDMG: {stats.crit_damage:.2f}x")
 
         if self.weapon:
-            print(f"Weapon: {self.weapon.name} (+{self.weapon.value} ATK) [{self.weapon.rarity.display_name}]")
+            screen.add_text(f"Weapon: {self.weapon.name} (+{self.weapon.value} ATK) [{self.weapon.rarity.display_name}]")
         if self.armor:
-            print(f"Armor: {self.armor.name} (+{self.armor.value} DEF) [{self.armor.rarity.display_name}]")
+            screen.add_text(f"Armor: {self.armor.name} (+{self.armor.value} DEF) [{self.armor.rarity.display_name}]")
         if self.amulet:
             bonus_type = "Crit%" if self.amulet.item_type == 'crit_chance' else "CritDMG"
-            print(f"Amulet: {self.amulet.name} (+{self.amulet.value} {bonus_type}) [{self.amulet.rarity.display_name}]")
-        print("\nMessages:")
-        for msg in self.message_log:
-            print(f"  {msg}")
-
-        print("\nEnemies: g=Goblin o=Orc T=Troll D=Dragon d=Demon")
-        print("Items: i=Item $=Gold")
-        print("Controls: [wasd] move (prefix with number like '5w') | [i] inventory | [save] save | [q] quit")
+            screen.add_text(f"Amulet: {self.amulet.name} (+{self.amulet.value} {bonus_type}) [{self.amulet.rarity.display_name}]")
+        screen.add_text()
+        screen.add_text("Messages:")
+        for msg in self.messages:
+            screen.add_text(f"  {msg}")
+
+        screen.add_text()
+        screen.add_text("Enemies: g=Goblin o=Orc T=Troll D=Dragon d=Demon")
+        screen.add_text("Items: i=Item $=Gold | Stairs: >=down <=up")
+        screen.add_text("Controls: [wasd] move (prefix with number like '5w') | [i] inventory | [save] save | [q] quit")
+        if self.game_over:
+            screen.add_text()
+            screen.add_text("Final Score:")
+            screen.add_text(f"  Level: {self.player.level}")
+            screen.add_text(f"  Dungeon Depth: {self.dungeon_level}")
+            screen.add_text(f"  Gold Earned: {self.player.gold}")
+        screen.present()
 
     # -------------------------
     # Inventory UI
     # -------------------------
-    def show_inventory(self):
-        while True:
-            os.system('clear' if os.name != 'nt' else 'cls')
-            print("=== INVENTORY ===")
-
-            if not self.inventory:
-                print("Empty")
-            else:
-                for i, item in enumerate(self.inventory):
-                    print(f"{i+1}. {item.colored_repr()}")
-
-            print("\nPress number to use/equip item")
-            print("Press 'c' followed by two numbers to combine items")
-            print("Press [b] to go back")
+    def _render_inventory(self):
+        screen = self.renderer
+        screen.begin_frame()
+        screen.add_text("=== INVENTORY ===")
 
-            choice = input("> ").strip().lower()
-
-            if choice == 'b':
-                break
-            elif choice.startswith('c'):
-                # Combine items - extract numbers after 'c'
-                try:
-                    nums_str = choice[1:].strip()
-                    if ' ' in nums_str:
-                        parts = nums_str.split()
-                        idx1 = int(parts[0]) - 1
-                        idx2 = int(parts[1]) - 1
-                    else:
-                        if len(nums_str) == 2:
-                            idx1 = int(nums_str[0]) - 1
-                            idx2 = int(nums_str[1]) - 1
-                        elif len(nums_str) == 3:
-                            try:
-                                idx1 = int(nums_str[0]) - 1
-                                idx2 = int(nums_str[1:]) - 1
-                            except:
-                                idx1 = int(nums_str[:2]) - 1
-                                idx2 = int(nums_str[2]) - 1
-                        elif len(nums_str) == 4:
-                            idx1 = int(nums_str[:2]) - 1
-                            idx2 = int(nums_str[2:]) - 1
-                        else:
-                            raise ValueError("Invalid format")
-
-                    self.combine_items(idx1, idx2)
-                except (ValueError, IndexError):
-                    self.add_message("Invalid combination command. Use format: c 3 5")
-            elif choice.isdigit():
-                self.use_item(int(choice) - 1)
-                if not self.inventory or all(item.item_type != 'heal' for item in self.inventory):
-                    continue
+        if not self.inventory:
+            screen.add_text("Empty")
+        else:
+            for i, item in enumerate(self.inventory_view):
+                screen.add_text(f"{i+1}. {item.colored_repr()}")
+
+        screen.add_text()
+        screen.add_text("Press number to use/equip item")
+        screen.add_text("Press 'c' followed by two numbers to combine items")
+        if self.inventory.duplicates():
+            screen.add_text("Press [ca] to combine all duplicates")
+        screen.add_text("Press [b] to go back")
+        screen.present()
+
+    def _inventory_input(self, choice: str):
+        if choice == 'b':
+            self.mode = 'play'
+        elif choice == 'ca':
+            self.combine_all()
+        elif choice.startswith('c'):
+            try:
+                numbers = self._parse_numbers(choice[1:])
+                if len(numbers) == 1 and 2 <= len(choice[1:].strip()) <= 4:
+                    # 'c35' and 'c1012': one or two digits per item
+                    digits = choice[1:].strip()
+                    half = len(digits) // 2
+                    numbers = [int(digits[:half]), int(digits[half:])]
+                if len(numbers) != 2:
+                    raise ValueError("Invalid format")
+                self.combine_items(*self._inventory_indices(numbers))
+            except (ValueError, IndexError):
+                self.add_message("Invalid combination command. Use format: c 3 5")
+        elif choice.isdigit():
+            try:
+                self.use_item(*self._inventory_indices([int(choice)]))
+            except IndexError:
+                pass
+
+    @staticmethod
+    def _parse_numbers(text: str) -> List[int]:
+        # Numbers separated by spaces and/or commas
+        return [int(part) for part in text.replace(',', ' ').split()]
+
+    def _inventory_indices(self, numbers: List[int]) -> List[int]:
+        # Item numbers as listed on screen (1-based, in view order) to
+        # inventory indices, which is what commands and the journal use
+        view = self.inventory_view
+        indices = []
+        for number in numbers:
+            if not 1 <= number <= len(view):
+                raise IndexError(number)
+            indices.append(self.inventory.index_of(view.serial(number - 1)))
+        return indices
 
     # -------------------------
     # Save / Load
     # -------------------------
-    def save_game(self, filename="game_save.sav"):
-        save_data = {
-            'player': asdict(self.player),
-            'player_pos': self.player_pos,
-            'dungeon_level': self.dungeon_level,
-            'in_shop': self.in_shop,
-            'inventory': [(asdict(item), item.rarity.name) for item in self.inventory],
-            'weapon': (asdict(self.weapon), self.weapon.rarity.name) if self.weapon else None,
-            'armor': (asdict(self.armor), self.armor.rarity.name) if self.armor else None,
-            'amulet': (asdict(self.amulet), self.amulet.rarity.name) if self.amulet else None,
-            'message_log': self.message_log,
-            'grid': [[tile.name for tile in row] for row in self.grid] if not self.in_shop else None,
-            'stairs_pos': self.stairs_pos if not self.in_shop else None,
-            'enemies': {str(pos): {'type': e.type.name, 'level': e.level, 'hp': e.hp}
-                       for pos, e in self.enemies.items()},
-            'items': {str(pos): (asdict(item), item.rarity.name)
-                     for pos, item in self.items.items()}
-        }
-
-        with open(filename, 'wb') as f:
-            pickle.dump(save_data, f)
+    def save(self):
+        # The 'save' command
+        if self.archive_slot is not None:
+            archive, slot = self.archive_slot
+            archive.save(slot, self)
+            self.add_message(f"Game saved to slot {slot}")
+        else:
+            self.save_game()
 
+    def save_game(self, filename="game_save.sav"):
+        if self.journal is not None and os.path.abspath(filename) == self.journal.path:
+            # Saving over the autosave journal compacts it into a checkpoint
+            self.journal.checkpoint(self)
+        else:
+            savefile.write_save(filename, self)
         self.add_message(f"Game saved to {filename}")
 
     def load_game(self, filename="game_save.sav"):
-        with open(filename, 'rb') as f:
-            save_data = pickle.load(f)
-
-        # ensure character_class exists in saved player dict
-        player_dict = save_data['player']
-        if 'character_class' not in player_dict:
-            player_dict['character_class'] = "Adventurer"
-        self.player = Character(**player_dict)
-        self.player_pos = tuple(save_data['player_pos'])
-        self.dungeon_level = save_data['dungeon_level']
-        self.in_shop = save_data.get('in_shop', False)
-
-        # Load inventory
-        self.inventory = []
-        for item_dict, rarity_name in save_data.get('inventory', []):
-            item_dict['rarity'] = Rarity[rarity_name]
-            self.inventory.append(Item(**item_dict))
-
-        # Load equipment
-        if save_data.get('weapon'):
-            weapon_dict, rarity_name = save_data['weapon']
-            weapon_dict['rarity'] = Rarity[rarity_name]
-            self.weapon = Item(**weapon_dict)
-        else:
-            self.weapon = None
+        if journal.is_journal(filename):
+            replayed = journal.replay(filename, self)
+            self.add_message(f"Game loaded successfully! ({replayed} actions recovered)")
+            return
+        # Reads both the binary format and older pickled saves
+        self.apply_save_state(savefile.read_save(filename))
+        self.add_message("Game loaded successfully!")
 
-        if save_data.get('armor'):
-            armor_dict, rarity_name = save_data['armor']
-            armor_dict['rarity'] = Rarity[rarity_name]
-            self.armor = Item(**armor_dict)
-        else:
-            self.armor = None
+    def apply_save_state(self, state: Dict):
+        self.player = state['player']
+        self.player_pos = state['player_pos']
+        # Saves don't record death; a character saved dead stays dead
+        self.game_over = self.player.hp <= 0
+        self.dungeon_level = state['dungeon_level']
+        # Older saves have no seed; keep the fresh stream from __init__
+        if state['seed'] is not None:
+            self.seed = state['seed']
+            self.rng.setstate(state['rng_state'])
+        self.in_shop = state['in_shop']
+
+        self.inventory = Inventory(state['inventory'])
+        self.inventory_view = self.inventory.view()
+        self.weapon = state['weapon']
+        self.armor = state['armor']
+        self.amulet = state['amulet']
+        self._refresh_stats()
+
+        self.message_log = state['message_log']
+        self.shop_items = state['shop_items']
+
+        self.large_world = state['large_world']
+        # Floors prefetched for the old state may have another seed
+        self.prefetcher.clear()
+        self.world = None
+        self.enemies.clear()
+        self.items = {}
+        self.floors.restore(state['floors'], populate=self._populate_chunk, version=state['version'])
+        if not self.in_shop and (state['grid'] is not None or state['world'] is not None):
+            if state['world'] is not None:
+                self.world = ChunkedWorld.restore(state['world'], populate=self._populate_chunk)
+                self.grid = self.world
+            else:
+                self.grid = state['grid']
+            self.width, self.height = self.grid.width, self.grid.height
+            self.start_pos = state['start_pos']
+            self.stairs_pos = state['stairs_pos']
+            self.up_pos = state['up_pos']
+
+            self.enemies.update(state['enemies'])
+            self.items = state['items']
+            self.explored = state['explored']
+            self.room_graph = state['room_graph']
+            self._look()
+        elif self.in_shop and not self.shop_items:
+            # Saves from before the stock was kept on the game have none
+            self.shop_items = self.stock_shop()
+        self._prefetch_floors()
 
-        if save_data.get('amulet'):
-            amulet_dict, rarity_name = save_data['amulet']
-            amulet_dict['rarity'] = Rarity[rarity_name]
-            self.amulet = Item(**amulet_dict)
+    # -------------------------
+    # Input
+    # -------------------------
+    @property
+    def prompt(self) -> str:
+        return "Enter the number of your class: " if self.mode == 'class' else "> "
+
+    def handle_input(self, line: str) -> bool:
+        """Handles one line typed at the current screen. Returns False when
+        the player quits."""
+        if self.recording is not None:
+            self.recording.write(line)
+        choice = line.strip().lower()
+        if self.mode == 'class':
+            self._class_input(choice)
+        elif self.in_shop:
+            self._shop_input(choice)
+        elif self.mode == 'inventory':
+            self._inventory_input(choice)
         else:
-            self.amulet = None
-
-        self.message_log = save_data.get('message_log', [])
-
-        if not self.in_shop and save_data.get('grid'):
-            # Load grid
-            self.grid = [[TileType[tile_name] for tile_name in row]
-                        for row in save_data['grid']]
-
-            self.stairs_pos = tuple(save_data['stairs_pos'])
-
-            # Load enemies
-            self.enemies = {}
-            for pos_str, enemy_data in save_data.get('enemies', {}).items():
-                pos = eval(pos_str)
-                enemy_type = EnemyType[enemy_data['type']]
-                enemy = Enemy(enemy_type, enemy_data['level'])
-                enemy.hp = enemy_data['hp']
-                self.enemies[pos] = enemy
-
-            # Load items
-            self.items = {}
-            for pos_str, (item_dict, rarity_name) in save_data.get('items', {}).items():
-                pos = eval(pos_str)
-                item_dict['rarity'] = Rarity[rarity_name]
-                self.items[pos] = Item(**item_dict)
+            return self._play_input(choice)
+        return True
+
+    def _play_input(self, cmd: str) -> bool:
+        if cmd == 'save':
+            self.save()
+            return True
+
+        # Parse command for number prefix (e.g., "5w" means move 5 spaces up)
+        steps = 1
+        direction = cmd
+
+        if len(cmd) > 1 and cmd[0].isdigit():
+            num_str = ''
+            for i, char in enumerate(cmd):
+                if char.isdigit():
+                    num_str += char
+                else:
+                    direction = cmd[i:]
+                    break
+            steps = int(num_str) if num_str else 1
 
-        self.add_message("Game loaded successfully!")
+        if direction == 'w':
+            for _ in range(steps):
+                if self.game_over:
+                    break
+                self.move_player(0, -1)
+        elif direction == 's':
+            for _ in range(steps):
+                if self.game_over:
+                    break
+                self.move_player(0, 1)
+        elif direction == 'a':
+            for _ in range(steps):
+                if self.game_over:
+                    break
+                self.move_player(-1, 0)
+        elif direction == 'd':
+            for _ in range(steps):
+                if self.game_over:
+                    break
+                self.move_player(1, 0)
+        elif direction == 'i':
+            self.mode = 'inventory'
+        elif direction == 'q':
+            return False
+        return True
 
     # -------------------------
     # Main loop
     # -------------------------
     def run(self):
-        while not self.game_over:
+        while True:
             self.render()
-
-            if self.in_shop:
-                continue
-
-            cmd = input("> ").strip().lower()
-
-            if cmd == 'save':
-                self.save_game()
-                continue
-
-            # Parse command for number prefix (e.g., "5w" means move 5 spaces up)
-            steps = 1
-            direction = cmd
-
-            if len(cmd) > 1 and cmd[0].isdigit():
-                num_str = ''
-                for i, char in enumerate(cmd):
-                    if char.isdigit():
-                        num_str += char
-                    else:
-                        direction = cmd[i:]
-                        break
-                steps = int(num_str) if num_str else 1
-
-            if direction == 'w':
-                for _ in range(steps):
-                    if self.game_over:
-                        break
-                    self.move_player(0, -1)
-            elif direction == 's':
-                for _ in range(steps):
-                    if self.game_over:
-                        break
-                    self.move_player(0, 1)
-            elif direction == 'a':
-                for _ in range(steps):
-                    if self.game_over:
-                        break
-                    self.move_player(-1, 0)
-            elif direction == 'd':
-                for _ in range(steps):
-                    if self.game_over:
-                        break
-                    self.move_player(1, 0)
-            elif direction == 'i':
-                self.show_inventory()
-            elif direction == 'q':
+            if self.game_over:
+                break
+            if not self.handle_input(input(self.prompt)):
                 print("Thanks for playing!")
                 break
-
-        if self.game_over:
-            self.render()
-            print("\nFinal Score:")
-            print(f"  Level: {self.player.level}")
-            print(f"  Dungeon Depth: {self.dungeon_level}")
-            print(f"  Gold Earned: {self.player.gold}")
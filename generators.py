@@ -0,0 +1,303 @@
+"""
+Map generator engines, chosen per depth.
+
+    rooms   DungeonGenerator: rectangular rooms placed at random, joined by a
+            spanning tree of corridors
+    bsp     BSPGenerator: the map split in two again and again (binary space
+            partitioning), one room per part, each pair of halves joined
+    caves   CaveGenerator: cellular-automaton caves
+
+The cave automaton works on the whole grid at once: the map is one Python
+int with a bit per cell, and a smoothing step is a few dozen shifts, ANDs
+and ORs over it (a bit-sliced count of every cell's wall neighbours), so its
+cost grows with the map's size in machine words, not in cells.
+
+    python generators.py --width 200 --height 100   # maps per second, per engine
+"""
+
+import argparse
+import heapq
+import random
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+from config import DUNGEON
+from dungeon_generator import DungeonGenerator, MapGenerator, Room, RoomGraph, UnionFind, spanning_tree
+from enums import TileType
+from tile_grid import TileGrid, TILE_CODES
+
+Pos = Tuple[int, int]
+
+
+class BSPGenerator(MapGenerator):
+    """Splits the map into num_rooms parts, always splitting the largest
+    part that is still big enough, puts a room in each and joins the two
+    halves of every split: the room nearest the cut on one side to the
+    closest room on the other."""
+
+    # Smallest part that still holds a room
+    MIN_WIDTH = 8
+    MIN_HEIGHT = 6
+
+    def generate(self, num_rooms: int) -> Tuple[TileGrid, List[Room]]:
+        # A node is [x, y, width, height, children, (axis, cut)]
+        root = [1, 1, self.width - 2, self.height - 2, None, None]
+        # Parts that may still split, largest first (oldest first on a tie)
+        heap = [(-root[2] * root[3], 0, root)]
+        made, leaves = 1, 1
+        while leaves < num_rooms and heap:
+            _, _, node = heapq.heappop(heap)
+            if node[2] < 2 * self.MIN_WIDTH and node[3] < 2 * self.MIN_HEIGHT:
+                continue
+            for child in self._split(node):
+                heapq.heappush(heap, (-child[2] * child[3], made, child))
+                made += 1
+            leaves += 1
+
+        rooms: List[Room] = []
+        edges: List[Tuple[int, int]] = []
+        self._build(root, rooms, edges)
+        self.rooms = rooms
+        self.graph = RoomGraph(rooms, edges)
+        for room in rooms:
+            self._carve_room(room)
+        for a, b in edges:
+            self._carve_corridor(rooms[a].center, rooms[b].center)
+        return self.grid, rooms
+
+    def _split(self, node: List) -> List[List]:
+        x, y, w, h = node[:4]
+        can_cut_x = w >= 2 * self.MIN_WIDTH
+        can_cut_y = h >= 2 * self.MIN_HEIGHT
+        # Cut across the longer side (as drawn, a cell is about twice as
+        # tall as it is wide)
+        vertical = can_cut_x and (not can_cut_y or w > 2 * h or (w * 2 >= h and self.rng.random() < 0.5))
+        if vertical:
+            cut = self.rng.randint(self.MIN_WIDTH, w - self.MIN_WIDTH)
+            children = [[x, y, cut, h, None, None], [x + cut, y, w - cut, h, None, None]]
+            node[5] = (0, x + cut)
+        else:
+            cut = self.rng.randint(self.MIN_HEIGHT, h - self.MIN_HEIGHT)
+            children = [[x, y, w, cut, None, None], [x, y + cut, w, h - cut, None, None]]
+            node[5] = (1, y + cut)
+        node[4] = children
+        return children
+
+    def _build(self, node: List, rooms: List[Room], edges: List[Tuple[int, int]]) -> List[int]:
+        """Makes the rooms of node's leaves (left to right) and the corridors
+        joining them; returns the indexes of the rooms under node."""
+        x, y, w, h, children, cut = node
+        if children is None:
+            rng = self.rng
+            rw = rng.randint(min(5, w - 2), w - 2)
+            rh = rng.randint(min(4, h - 2), h - 2)
+            rooms.append(Room(x + rng.randint(1, w - rw - 1), y + rng.randint(1, h - rh - 1), rw, rh))
+            return [len(rooms) - 1]
+        left = self._build(children[0], rooms, edges)
+        right = self._build(children[1], rooms, edges)
+        axis, line = cut
+        a = min(left, key=lambda i: line - rooms[i].center[axis])
+        b = min(right, key=lambda i: _distance(rooms[a].center, rooms[i].center))
+        edges.append((a, b))
+        return left + right
+
+
+class CaveGenerator(MapGenerator):
+    """Caves from a cellular automaton: the map starts as random noise
+    (fill is the chance of a wall) and each of `steps` smoothing steps turns
+    a cell into wall when at least five of its eight neighbours are walls
+    (four if it is one already). The largest open region is kept; the rooms
+    are open pockets spread over it, and the graph is the shortest tree
+    joining them (the cave itself is what connects them)."""
+
+    # Closest two pockets may be (in either direction)
+    POCKET_SPACING = 6
+
+    def __init__(self, width: int, height: int, rng: Optional[random.Random] = None,
+                 fill: float = DUNGEON['cave_fill'], steps: int = DUNGEON['cave_steps']):
+        super().__init__(width, height, rng)
+        self.fill = fill
+        self.steps = steps
+        n = width * height
+        self._all = (1 << n) - 1
+        # Everything but the outer ring, which is always wall
+        row = ((1 << (width - 2)) - 1) << 1
+        self._inner = sum(row << (y * width) for y in range(1, height - 1))
+
+    def generate(self, num_rooms: int) -> Tuple[TileGrid, List[Room]]:
+        walls = self._noise(self.fill) | (self._all & ~self._inner)
+        for _ in range(self.steps):
+            walls = self._smooth(walls)
+        cave = self._largest_region(self._all & ~walls)
+        self.grid = TileGrid(self.width, self.height, cells=_cells(cave, self.width * self.height))
+
+        rooms = self._pockets(cave, max(1, num_rooms))
+        if not rooms:
+            # Nothing open worth having; fall back to a single room
+            rooms = [Room(2, 2, 6, 5)]
+            self._carve_room(rooms[0])
+        centers = [room.center for room in rooms]
+        self.rooms = rooms
+        self.graph = RoomGraph(rooms, spanning_tree(centers, UnionFind(len(rooms))))
+        return self.grid, rooms
+
+    # -------------------------
+    # Whole-grid operations (bit i is cell (i % width, i // width))
+    # -------------------------
+    def _noise(self, p: float) -> int:
+        """Each bit set with probability p (to 8 bits of precision): built
+        up from p's binary digits, least significant first, by ORing
+        (digit 1) or ANDing (digit 0) in uniformly random bits."""
+        n = self.width * self.height
+        level = round(p * 256)
+        if level >= 256:
+            return self._all
+        bits = 0
+        for digit in range(8):
+            r = self.rng.getrandbits(n)
+            bits = bits | r if level >> digit & 1 else bits & r
+        return bits
+
+    def _neighbours(self, bits: int) -> List[int]:
+        # The eight neighbour grids. Rows run on into each other, but only
+        # the outer ring sees that and it is forced to wall anyway.
+        w, full = self.width, self._all
+        return [(bits << k) & full for k in (1, w - 1, w, w + 1)] + [bits >> k for k in (1, w - 1, w, w + 1)]
+
+    def _smooth(self, walls: int) -> int:
+        # Per cell wall-neighbour count in bit planes s0..s2, plus s3 for 8
+        s0 = s1 = s2 = s3 = 0
+        for n in self._neighbours(walls):
+            c0 = s0 & n
+            s0 ^= n
+            c1 = s1 & c0
+            s1 ^= c0
+            s3 |= s2 & c1
+            s2 ^= c1
+        at_least_4 = s2 | s3
+        at_least_5 = s3 | (s2 & (s1 | s0))
+        return (at_least_5 | (walls & at_least_4) | ~self._inner) & self._all
+
+    def _flood(self, seed: int, space: int) -> int:
+        """The cells of space reachable from seed in orthogonal steps."""
+        w = self.width
+        region = seed
+        while True:
+            grown = (region | (region >> 1) | (region << w) | (region >> w)) & space
+            # Rightwards in one go: adding the region to space carries
+            # through each run of open cells from the first region cell in
+            # it to the run's end, clearing them
+            grown |= space & ~(space + grown)
+            if grown == region:
+                return region
+            region = grown
+
+    def _largest_region(self, space: int) -> int:
+        best, best_size = 0, 0
+        remaining, left = space, bin(space).count('1')
+        # Done once no region left can be larger
+        while left > best_size:
+            region = self._flood(remaining & -remaining, space)
+            remaining &= ~region
+            size = bin(region).count('1')
+            left -= size
+            if size > best_size:
+                best, best_size = region, size
+        return best
+
+    def _pockets(self, cave: int, count: int) -> List[Room]:
+        """Up to count open cells spread over the cave with open ground all
+        around them (as 3x3 rooms, so spawning lands on the centre), the
+        one farthest from the first last."""
+        interior = cave
+        for n in self._neighbours(cave):
+            interior &= n
+        if not interior:
+            return []
+        n = self.width * self.height
+        data = interior.to_bytes((n + 7) // 8, 'little')
+        rng, spacing = self.rng, self.POCKET_SPACING
+        spots: List[Pos] = []
+        for _ in range(count * 50):
+            index = rng.randrange(n)
+            if not data[index >> 3] >> (index & 7) & 1:
+                continue
+            y, x = divmod(index, self.width)
+            if all(max(abs(x - sx), abs(y - sy)) >= spacing for sx, sy in spots):
+                spots.append((x, y))
+                if len(spots) == count:
+                    break
+        if not spots:
+            return []
+        first = spots[0]
+        spots[1:] = sorted(spots[1:], key=lambda spot: _distance(first, spot))
+        return [Room(x - 1, y - 1, 3, 3) for x, y in spots]
+
+
+def _distance(a: Pos, b: Pos) -> int:
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def _byte_cells() -> List[bytes]:
+    # For each byte of bits, its eight cells (bit 0 first)
+    floor, wall = TILE_CODES[TileType.FLOOR], TILE_CODES[TileType.WALL]
+    return [bytes(floor if value >> bit & 1 else wall for bit in range(8)) for value in range(256)]
+
+
+_BYTE_CELLS = _byte_cells()
+
+
+def _cells(open_bits: int, n: int) -> bytearray:
+    """TileGrid cells with floor where open_bits has a bit set."""
+    data = open_bits.to_bytes((n + 7) // 8, 'little')
+    return bytearray(b''.join(map(_BYTE_CELLS.__getitem__, data))[:n])
+
+
+# -------------------------
+# Engines
+# -------------------------
+GENERATORS: Dict[str, Type[MapGenerator]] = {
+    'rooms': DungeonGenerator,
+    'bsp': BSPGenerator,
+    'caves': CaveGenerator,
+}
+
+
+def generator_for(level: int) -> Type[MapGenerator]:
+    """The engine for a floor: each run of floors between shops (1-4, 6-9,
+    ...) takes the next entry of DUNGEON['generators'], round and round."""
+    schedule = DUNGEON['generators']
+    return GENERATORS[schedule[(level - 1) // 5 % len(schedule)]]
+
+
+def measure(engine: Type[MapGenerator], width: int, height: int, rooms: int, seconds: float) -> float:
+    """Maps per second engine makes at this size (over about `seconds`)."""
+    made = 0
+    start = time.perf_counter()
+    while True:
+        engine(width, height, rng=random.Random(made)).generate(rooms)
+        made += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return made / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the map generator engines")
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--height', type=int, default=24)
+    parser.add_argument('--rooms', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=1.0, help="time to spend on each engine")
+    parser.add_argument('--show', choices=list(GENERATORS), help="print a map from this engine")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.show:
+        grid, _ = GENERATORS[args.show](args.width, args.height, rng=random.Random(args.seed)).generate(args.rooms)
+        print('\n'.join(grid.row(y) for y in range(grid.height)))
+    else:
+        for name, engine in GENERATORS.items():
+            rate = measure(engine, args.width, args.height, args.rooms, args.seconds)
+            cells = rate * args.width * args.height
+            print(f"{name:<6} {args.width}x{args.height}: {rate:8.1f} maps/s "
+                  f"({1000 / rate:7.2f} ms each, {cells / 1e6:6.1f}M cells/s)")
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Headless simulation for Shadows of the Abyss.
+
+Drives the regular Game logic (move_player, use_item, combine_items and the
+shop actions) from a policy object instead of the keyboard, with no screen
+clearing or printing, so thousands of games can be played unattended.
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import CLASS_DEFS
+from events import Telemetry
+from game import Game
+
+# Actions are plain tuples so policies stay cheap to write:
+#   ('move', dx, dy)  ('use', idx)  ('combine', idx1, idx2)
+#   ('buy', idx)      ('sell', idx) ('leave',)            ('quit',)
+Action = Tuple
+
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+EQUIP_SLOTS = {'attack': 'weapon', 'defense': 'armor',
+               'crit_chance': 'amulet', 'crit_damage': 'amulet'}
+
+
+@dataclass
+class RunResult:
+    character_class: str
+    turns: int
+    depth: int
+    level: int
+    gold: int
+    died: bool
+    timed_out: bool
+    death_cause: Optional[str]
+    elapsed: float
+
+
+# -------------------------
+# Policies
+# -------------------------
+class Policy:
+    def choose_class(self) -> str:
+        return next(iter(CLASS_DEFS))
+
+    def next_action(self, game: Game) -> Action:
+        raise NotImplementedError
+
+    def shop_action(self, game: Game) -> Action:
+        return ('leave',)
+
+
+class RandomPolicy(Policy):
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.rng = rng or random.Random()
+
+    def next_action(self, game: Game) -> Action:
+        dx, dy = self.rng.choice(DIRECTIONS)
+        return ('move', dx, dy)
+
+
+class DescendPolicy(Policy):
+    """Heads for the stairs, drinks potions when low and equips upgrades."""
+
+    def __init__(self, heal_below: float = 0.35, rng: Optional[random.Random] = None):
+        self.heal_below = heal_below
+        self.rng = rng or random.Random()
+        self._dist_grid = None
+        self._dist: Dict[Tuple[int, int], int] = {}
+
+    def next_action(self, game: Game) -> Action:
+        if game.player.hp < game.player.max_hp * self.heal_below:
+            for i, item in enumerate(game.inventory):
+                if item.item_type == 'heal':
+                    return ('use', i)
+
+        upgrade = self._find_upgrade(game)
+        if upgrade is not None:
+            return ('use', upgrade)
+
+        dist = self._stairs_distances(game)
+        x, y = game.player_pos
+        best = None
+        best_dist = dist.get((x, y))
+        for dx, dy in DIRECTIONS:
+            d = dist.get((x + dx, y + dy))
+            if d is not None and (best_dist is None or d < best_dist):
+                best, best_dist = (dx, dy), d
+        if best is None:
+            # Stairs unreachable from here; wander
+            best = self.rng.choice(DIRECTIONS)
+        return ('move', best[0], best[1])
+
+    def shop_action(self, game: Game) -> Action:
+        # Equip purchases right away so the same upgrade isn't bought twice
+        upgrade = self._find_upgrade(game)
+        if upgrade is not None:
+            return ('use', upgrade)
+
+        has_potion = any(item.item_type == 'heal' for item in game.inventory)
+        for i, item in enumerate(game.shop_items):
+            if item.get_price() > game.player.gold:
+                continue
+            if item.item_type == 'heal' and not has_potion:
+                return ('buy', i)
+            if item.item_type != 'heal' and item.value > self._equipped_value(game, item.item_type):
+                return ('buy', i)
+        return ('leave',)
+
+    def _find_upgrade(self, game: Game) -> Optional[int]:
+        for i, item in enumerate(game.inventory):
+            if item.item_type in EQUIP_SLOTS and item.value > self._equipped_value(game, item.item_type):
+                return i
+        return None
+
+    def _equipped_value(self, game: Game, item_type: str) -> int:
+        equipped = getattr(game, EQUIP_SLOTS[item_type])
+        if equipped is None:
+            return 0
+        # Amulets of the other kind are not comparable; keep the one worn
+        # (treating the slot as empty would swap the two back and forth)
+        return equipped.value if equipped.item_type == item_type else float('inf')
+
+    def _stairs_distances(self, game: Game) -> Dict[Tuple[int, int], int]:
+        # BFS from the stairs once per floor; each turn is then a lookup
+        if self._dist_grid is game.grid:
+            return self._dist
+        dist = {game.stairs_pos: 0}
+        queue = deque([game.stairs_pos])
+        while queue:
+            x, y = queue.popleft()
+            d = dist[(x, y)] + 1
+            for dx, dy in DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) in dist or not (0 <= nx < game.width and 0 <= ny < game.height):
+                    continue
+                if game.grid.is_wall(nx, ny):
+                    continue
+                dist[(nx, ny)] = d
+                queue.append((nx, ny))
+        self._dist_grid = game.grid
+        self._dist = dist
+        return dist
+
+
+# -------------------------
+# Runner
+# -------------------------
+def apply_action(game: Game, action: Action) -> bool:
+    """Applies one action; returns False when the policy asked to stop."""
+    kind = action[0]
+    if kind == 'move':
+        game.move_player(action[1], action[2])
+    elif kind == 'use':
+        game.use_item(action[1])
+    elif kind == 'combine':
+        game.combine_items(action[1], action[2])
+    elif kind == 'buy':
+        game.buy_item(action[1])
+    elif kind == 'sell':
+        game.sell_item(action[1])
+    elif kind == 'leave':
+        game.leave_shop()
+    elif kind == 'quit':
+        return False
+    else:
+        raise ValueError(f"Unknown action: {action!r}")
+    return True
+
+
+def new_game(policy: Policy, character_class: Optional[str] = None, seed: Optional[int] = None) -> Game:
+    # No player input to hide floor generation behind, so no prefetching,
+    # and no screen to draw the fog of war or the message log on
+    game = Game(character_class=character_class or policy.choose_class(), seed=seed, prefetch_depth=0,
+                fog_of_war=False)
+    game.events.unsubscribe(game.messages.add)
+    return game
+
+
+def play(game: Game, policy: Policy, max_turns: int = 5000) -> RunResult:
+    start = time.perf_counter()
+    turns = 0
+    while not game.game_over and turns < max_turns:
+        action = policy.shop_action(game) if game.in_shop else policy.next_action(game)
+        if not apply_action(game, action):
+            break
+        turns += 1
+
+    return RunResult(
+        character_class=game.player.character_class,
+        turns=turns,
+        depth=game.dungeon_level,
+        level=game.player.level,
+        gold=game.player.gold,
+        died=game.game_over,
+        timed_out=not game.game_over and turns >= max_turns,
+        death_cause=game.death_cause.name if game.death_cause else None,
+        elapsed=time.perf_counter() - start,
+    )
+
+
+def measure_throughput(runs: int, character_class: Optional[str] = None, max_turns: int = 5000,
+                       policy: Optional[Policy] = None, seed: Optional[int] = None,
+                       telemetry: Optional[Telemetry] = None) -> Dict[str, float]:
+    policy = policy or DescendPolicy()
+    results: List[RunResult] = []
+    start = time.perf_counter()
+    for i in range(runs):
+        run_seed = seed + i if seed is not None else None
+        game = new_game(policy, character_class, run_seed)
+        if telemetry is not None:
+            game.events.subscribe(telemetry.add)
+        results.append(play(game, policy, max_turns))
+    elapsed = time.perf_counter() - start
+
+    turns = sum(r.turns for r in results)
+    return {
+        'runs': runs,
+        'turns': turns,
+        'seconds': elapsed,
+        'runs_per_second': runs / elapsed if elapsed else 0.0,
+        'turns_per_second': turns / elapsed if elapsed else 0.0,
+        'mean_depth': sum(r.depth for r in results) / runs if runs else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play games headlessly and report throughput")
+    parser.add_argument('--runs', type=int, default=100)
+    parser.add_argument('--class', dest='character_class', choices=list(CLASS_DEFS))
+    parser.add_argument('--max-turns', type=int, default=5000)
+    parser.add_argument('--policy', choices=['descend', 'random'], default='descend')
+    parser.add_argument('--seed', type=int, help="seed of the first run; run i uses seed + i")
+    parser.add_argument('--telemetry', action='store_true', help="also report totals of the runs' events")
+    args = parser.parse_args()
+
+    policy_rng = random.Random(args.seed)
+    chosen = DescendPolicy(rng=policy_rng) if args.policy == 'descend' else RandomPolicy(policy_rng)
+    telemetry = Telemetry() if args.telemetry else None
+    stats = measure_throughput(args.runs, args.character_class, args.max_turns, chosen, args.seed, telemetry)
+    print(f"{stats['runs']} runs, {stats['turns']} turns in {stats['seconds']:.2f}s")
+    print(f"  {stats['runs_per_second']:.1f} runs/s | {stats['turns_per_second']:.0f} turns/s | "
+          f"mean depth {stats['mean_depth']:.1f}")
+    if telemetry is not None:
+        print(json.dumps(telemetry.summary(), indent=2))
@@ -0,0 +1,210 @@
+"""
+The player's inventory.
+
+Items stay in pickup order (the order commands and saves refer to them by),
+with a count per kind (name, item_type) kept as items come and go, so
+finding what can be combined, combining all of it and selling many items
+each take one pass over the list instead of one per item. Sorted or filtered
+views for the screens are updated item by item rather than rebuilt.
+"""
+
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dataclasses import Item
+
+Kind = Tuple[str, str]
+
+# Item types in the order the inventory screens list them
+TYPE_ORDER = {item_type: order for order, item_type in
+              enumerate(['attack', 'defense', 'crit_chance', 'crit_damage', 'heal'])}
+
+
+def kind(item: Item) -> Kind:
+    return item.name, item.item_type
+
+
+def combinable(item: Item) -> bool:
+    return item.item_type != 'heal'
+
+
+def merge(items: List[Item]) -> Item:
+    """Combines items of one kind: values add up and the best rarity is kept
+    (the later item's on a tie, as when combining them two at a time)."""
+    first = items[0]
+    rarity = first.rarity
+    for item in items[1:]:
+        rarity = rarity if rarity.multiplier > item.rarity.multiplier else item.rarity
+    return Item(first.name, first.item_type, sum(item.value for item in items), first.description, rarity)
+
+
+def by_kind(item: Item) -> Tuple:
+    # Weapons, armor, amulets, then potions; same kinds together, best first
+    return TYPE_ORDER.get(item.item_type, len(TYPE_ORDER)), item.name, -item.value
+
+
+class InventoryView:
+    """The inventory's items that pass `where`, ordered by `sort_key`.
+
+    Created through Inventory.view and updated by it on every change, one
+    bisect per item added or removed.
+    """
+
+    def __init__(self, sort_key: Callable[[Item], Tuple], where: Optional[Callable[[Item], bool]]):
+        self.sort_key = sort_key
+        self.where = where
+        # (sort key, serial) in order, and each serial's item
+        self._entries: List[Tuple[Tuple, int]] = []
+        self._items: Dict[int, Item] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Item]:
+        items = self._items
+        return (items[serial] for _, serial in self._entries)
+
+    def serial(self, position: int) -> int:
+        return self._entries[position][1]
+
+    def _add(self, serial: int, item: Item):
+        if self.where is None or self.where(item):
+            insort(self._entries, (self.sort_key(item), serial))
+            self._items[serial] = item
+
+    def _remove(self, serial: int, item: Item):
+        if self._items.pop(serial, None) is not None:
+            entries = self._entries
+            del entries[bisect_left(entries, (self.sort_key(item), serial))]
+
+
+class Inventory:
+    """A list of Items (indexing, len, iteration, append and pop work as on
+    a list) that keeps per-kind counts and views up to date."""
+
+    def __init__(self, items: Iterable[Item] = ()):
+        self._items: List[Item] = []
+        # A serial per entry; the same Item object can be in the list twice
+        # (e.g. bought twice from the shop), so views can't go by identity
+        self._serials: List[int] = []
+        self._next_serial = 0
+        self.counts: Dict[Kind, int] = {}
+        self._views: List[InventoryView] = []
+        for item in items:
+            self.append(item)
+
+    # -------------------------
+    # List interface
+    # -------------------------
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Item]:
+        return iter(self._items)
+
+    def __getitem__(self, index: int) -> Item:
+        return self._items[index]
+
+    def __repr__(self) -> str:
+        return f"Inventory({self._items!r})"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Inventory):
+            return self._items == other._items
+        return self._items == other
+
+    def append(self, item: Item):
+        self._items.append(item)
+        self._serials.append(self._remember(item))
+
+    def pop(self, index: int) -> Item:
+        item = self._items.pop(index)
+        self._forget(self._serials.pop(index), item)
+        return item
+
+    def _remember(self, item: Item) -> int:
+        serial = self._next_serial
+        self._next_serial += 1
+        key = kind(item)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        for view in self._views:
+            view._add(serial, item)
+        return serial
+
+    def _forget(self, serial: int, item: Item):
+        key = kind(item)
+        self.counts[key] -= 1
+        if not self.counts[key]:
+            del self.counts[key]
+        for view in self._views:
+            view._remove(serial, item)
+
+    # -------------------------
+    # Bulk operations
+    # -------------------------
+    def remove_many(self, indices: Iterable[int]) -> List[Item]:
+        """Removes the items at indices (out-of-range ones are ignored) in one
+        pass; returns them in inventory order."""
+        doomed = set(indices)
+        removed = []
+        items, serials = [], []
+        for index, (item, serial) in enumerate(zip(self._items, self._serials)):
+            if index in doomed:
+                removed.append(item)
+                self._forget(serial, item)
+            else:
+                items.append(item)
+                serials.append(serial)
+        self._items, self._serials = items, serials
+        return removed
+
+    def duplicates(self) -> List[Kind]:
+        """Kinds with more than one combinable item."""
+        return [key for key, count in self.counts.items() if count > 1 and key[1] != 'heal']
+
+    def combine_all(self) -> List[Item]:
+        """Combines every group of combinable items of the same kind into one
+        item, which takes the place of the group's first. Returns the new
+        items."""
+        if not self.duplicates():
+            return []
+        groups: Dict[Kind, List[int]] = {}
+        for index, item in enumerate(self._items):
+            if combinable(item):
+                groups.setdefault(kind(item), []).append(index)
+
+        # Each group's combined item, at the index of its first item
+        merged: Dict[int, Item] = {}
+        doomed = set()
+        for indices in groups.values():
+            if len(indices) > 1:
+                merged[indices[0]] = merge([self._items[i] for i in indices])
+                doomed.update(indices)
+
+        items, serials = [], []
+        for index, (item, serial) in enumerate(zip(self._items, self._serials)):
+            if index not in doomed:
+                items.append(item)
+                serials.append(serial)
+                continue
+            self._forget(serial, item)
+            if index in merged:
+                items.append(merged[index])
+                serials.append(self._remember(merged[index]))
+        self._items, self._serials = items, serials
+        return list(merged.values())
+
+    def index_of(self, serial: int) -> int:
+        return self._serials.index(serial)
+
+    # -------------------------
+    # Views
+    # -------------------------
+    def view(self, sort_key: Callable[[Item], Tuple] = by_kind,
+             where: Optional[Callable[[Item], bool]] = None) -> InventoryView:
+        """A view kept sorted (and filtered) as the inventory changes."""
+        view = InventoryView(sort_key, where)
+        for serial, item in zip(self._serials, self._items):
+            view._add(serial, item)
+        self._views.append(view)
+        return view
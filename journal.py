@@ -0,0 +1,141 @@
+"""
+Append-only action journal for autosaving.
+
+The journal file starts with a checkpoint (a full save in the savefile
+format) followed by one small record per player command. Every command is
+appended as it happens, so autosaving costs a few bytes per turn; every
+`checkpoint_every` commands, or when the player saves, the file is rewritten
+as a fresh checkpoint. Loading restores the checkpoint and replays the
+commands after it; the game is deterministic given its RNG state, so this
+reproduces the exact state at the time of the last command.
+
+Each record is framed with its length and a CRC, so a record torn by a crash
+is detected and dropped along with anything after it.
+"""
+
+import os
+import struct
+import zlib
+from typing import Optional
+
+import savefile
+from config import JOURNAL_CHECKPOINT_EVERY
+
+MAGIC = b'SOTJ'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+RECORD = struct.Struct('<BII')  # kind, payload length, crc32 of payload
+
+CHECKPOINT = 1
+COMMAND = 2
+
+# Journaled Game methods by opcode; their arguments are all ints
+COMMANDS = ['move_player', 'use_item', 'combine_items', 'buy_item', 'sell_item', 'leave_shop',
+            'combine_all', 'sell_items']
+OPCODES = {name: code for code, name in enumerate(COMMANDS)}
+
+
+class JournalError(ValueError):
+    pass
+
+
+def _record(kind: int, payload: bytes) -> bytes:
+    return RECORD.pack(kind, len(payload), zlib.crc32(payload)) + payload
+
+
+def _command_payload(name: str, args) -> bytes:
+    return struct.pack(f'<B{len(args)}i', OPCODES[name], *args)
+
+
+class Journal:
+    def __init__(self, path: str, checkpoint_every: int = JOURNAL_CHECKPOINT_EVERY):
+        self.path = os.path.abspath(path)
+        self.checkpoint_every = checkpoint_every
+        self.since_checkpoint = 0
+        self._file = None
+
+    def start(self, game):
+        """Begins journaling game to this file, replacing what was there."""
+        game.journal = self
+        self.checkpoint(game)
+
+    def record(self, game, name: str, *args: int):
+        # Called before the command runs, so a checkpoint taken here holds
+        # the state the command starts from.
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.checkpoint(game)
+        self._file.write(_record(COMMAND, _command_payload(name, args)))
+        self._file.flush()
+        self.since_checkpoint += 1
+
+    def checkpoint(self, game):
+        # Written to a temporary file and swapped in, so a crash leaves
+        # either the old journal or the new one
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION))
+            f.write(_record(CHECKPOINT, savefile.encode_game(game)))
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, 'ab')
+        self.since_checkpoint = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def is_journal(filename: str) -> bool:
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def replay(filename: str, game) -> int:
+    """Loads the journal's checkpoint into game and replays the commands
+    after it. Returns the number of commands replayed."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise JournalError("Journal is truncated")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise JournalError("Not a Shadows of the Abyss journal")
+    if version != VERSION:
+        raise JournalError(f"Unsupported journal version {version}")
+
+    offset = HEADER.size
+    replayed = 0
+    loaded = False
+    journal: Optional[Journal] = game.journal
+    # Commands replayed here must not be journaled again
+    game.journal = None
+    try:
+        while offset + RECORD.size <= len(data):
+            kind, length, crc = RECORD.unpack_from(data, offset)
+            start = offset + RECORD.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break  # torn write at the end of the file
+            offset = start + length
+
+            if kind == CHECKPOINT:
+                game.apply_save_state(savefile.decode_game(payload))
+                loaded = True
+                replayed = 0
+            elif kind == COMMAND and loaded:
+                opcode = payload[0]
+                args = struct.unpack_from(f'<{(length - 1) // 4}i', payload, 1)
+                getattr(game, COMMANDS[opcode])(*args)
+                replayed += 1
+            else:
+                raise JournalError(f"Unexpected journal record {kind}")
+    finally:
+        game.journal = journal
+
+    if not loaded:
+        raise JournalError("Journal has no checkpoint")
+    return replayed
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Load test for server.py: many scripted players on local sockets.
+
+Starts a server in a child process and connects --sessions players to it,
+spread over the first --ramp seconds. Each picks a class and then sends a
+random command about every 1/--rate seconds. Reports the command latency
+(sending a line to receiving the end of the next frame) and the server's
+CPU use, as sessions per core at that command rate.
+
+    python loadtest.py --sessions 200 --commands 100 --rate 2
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from config import CLASS_DEFS
+from server import NAME_PROMPT
+
+# Every frame the renderer sends ends by clearing below the cursor
+FRAME_END = b'\033[J'
+COMMANDS = ['w', 'a', 's', 'd'] * 4 + ['3w', '3a', '3s', '3d', 'i', 'b', '1', 'leave']
+
+
+def start_server(port: int, archive_path: str) -> subprocess.Popen:
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py')
+    return subprocess.Popen([sys.executable, script, '--port', str(port), '--archive', archive_path],
+                            stdout=subprocess.DEVNULL)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(host: str, port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        return
+
+
+async def player(host: str, port: int, index: int, args, latencies: List[float]):
+    rng = random.Random(index)
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def send(line: str):
+        start = time.perf_counter()
+        writer.write(line.encode() + b'\r\n')
+        await writer.drain()
+        await reader.readuntil(FRAME_END)
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        await reader.readuntil(NAME_PROMPT.encode())
+        await send(f"load{index}")
+        await send(str(rng.randint(1, len(CLASS_DEFS))))
+        for _ in range(args.commands):
+            await asyncio.sleep(rng.expovariate(args.rate))
+            await send(rng.choice(COMMANDS))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass  # the player died and the server ended the session
+    finally:
+        writer.close()
+
+
+async def run_players(host: str, port: int, args) -> List[float]:
+    await wait_for_server(host, port)
+    latencies: List[float] = []
+    await asyncio.gather(*(player(host, port, i, args, latencies)
+                           for i in range(args.sessions)))
+    return latencies
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the game server")
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--commands', type=int, default=100, help="commands per session")
+    parser.add_argument('--rate', type=float, default=2.0, help="commands per second per session")
+    parser.add_argument('--ramp', type=float, default=5.0, help="seconds over which sessions connect")
+    parser.add_argument('--port', type=int, help="test a server already running on this port")
+    args = parser.parse_args()
+
+    host = '127.0.0.1'
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        port = args.port
+        if port is None:
+            port = free_port()
+            server = start_server(port, os.path.join(tmp, 'loadtest.arc'))
+        start = time.perf_counter()
+        try:
+            latencies = asyncio.run(run_players(host, port, args))
+        finally:
+            wall = time.perf_counter() - start
+            if server is not None:
+                server.send_signal(signal.SIGINT)
+                server.wait()
+
+    print(f"{args.sessions} sessions, {len(latencies)} commands in {wall:.1f}s "
+          f"({len(latencies) / wall:.0f} commands/s)")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+    if server is not None:
+        # Includes the server's start-up, so this errs on the low side
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cores = (usage.ru_utime + usage.ru_stime) / wall
+        print(f"server CPU {cores:.2f} cores -> {args.sessions / cores:.0f} sessions per core "
+              f"at {args.rate:g} commands/s each")
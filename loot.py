@@ -0,0 +1,132 @@
+"""
+Loot tables compiled into alias samplers.
+
+config.LOOT describes what floors drop and what the shop stocks. A table is
+compiled once per depth into a flat list of outcomes -- every item name at
+every rarity, with its chance and its value range at that depth -- and an
+alias table over them (Vose's method), so drawing an item takes one random()
+for what it is and one randint() for its value, however many outcomes there
+are, and no weight lists are built per draw.
+"""
+
+import random
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from config import LOOT
+from dataclasses import Item
+from enums import Rarity
+
+# (name, item_type, description, rarity, lowest roll, highest roll, scale);
+# an item's value is int(randint(lowest, highest) * scale) and the
+# description is formatted with it
+Outcome = Tuple[str, str, str, Rarity, int, int, float]
+
+AMULETS = [
+    ('Amulet of Precision', 'crit_chance', 'Increases critical hit chance', (2, 5)),
+    ('Amulet of Power', 'crit_damage', 'Increases critical damage', (10, 25)),
+]
+
+
+class AliasTable:
+    """Draws index i with probability weights[i] / sum(weights) in constant
+    time: one uniform picks a column, and its fractional part decides between
+    the column's own index and its alias."""
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.n = n
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1.0 up to rounding
+
+    def sample(self, rng: random.Random) -> int:
+        x = rng.random() * self.n
+        i = int(x)
+        return i if x - i < self.prob[i] else self.alias[i]
+
+
+class LootTable:
+    """One of config.LOOT's tables at one depth."""
+
+    def __init__(self, spec: dict, depth: int):
+        rarities = [(Rarity[name], weight) for name, weight in spec['rarity'].items()]
+        kinds = spec['kinds']
+        kind_total = sum(kinds.values())
+        item_share = 1.0 - spec['gold_chance']
+        lo, hi = spec['base_value']
+        bonus = int(depth * spec['depth_value'])
+
+        outcomes: List[Outcome] = []
+        weights: List[float] = []
+
+        def add(names: List[Tuple[str, str, str, Tuple[int, int]]], kind_weight: float):
+            # Names of a kind are equally likely; rarity is independent
+            for name, item_type, description, (low, high) in names:
+                for rarity, rarity_weight in rarities:
+                    outcomes.append((name, item_type, description, rarity, low, high, rarity.multiplier))
+                    weights.append(item_share * kind_weight / kind_total / len(names) * rarity_weight)
+
+        for kind, kind_weight in kinds.items():
+            if kind == 'weapon':
+                add([(name, 'attack', f"A deadly {name.lower()}", (lo + bonus, hi + bonus))
+                     for name in spec['weapons']], kind_weight)
+            elif kind == 'armor':
+                add([(name, 'defense', f"Protective {name.lower()}", (lo + bonus, hi + bonus))
+                     for name in spec['armors']], kind_weight)
+            elif kind == 'amulet':
+                add(AMULETS, kind_weight)
+            elif kind == 'potion':
+                outcomes.append(self.potion_outcome(depth))
+                weights.append(item_share * kind_weight / kind_total)
+            else:
+                raise ValueError(f"Unknown loot kind {kind!r}")
+        if spec['gold_chance']:
+            gold = 5 + depth * 2, 20 + depth * 2
+            outcomes.append(("Gold Pouch", 'gold', "A pouch containing {value} gold", Rarity.COMMON,
+                             gold[0], gold[1], 1.0))
+            weights.append(spec['gold_chance'])
+
+        self.depth = depth
+        self.outcomes = outcomes
+        self.alias = AliasTable(weights)
+        self.stock = spec.get('stock', 0)
+        self.potions = spec.get('potions', 0)
+
+    @staticmethod
+    def potion_outcome(depth: int) -> Outcome:
+        heal = 30 + depth * 5
+        return ('Health Potion', 'heal', f'Restores {heal} HP', Rarity.COMMON, heal, heal, 1.0)
+
+    @staticmethod
+    def _item(outcome: Outcome, rng: random.Random) -> Item:
+        name, item_type, description, rarity, low, high, scale = outcome
+        value = int((rng.randint(low, high) if high > low else low) * scale)
+        return Item(name, item_type, value, description.format(value=value), rarity)
+
+    def draw(self, rng: random.Random) -> Item:
+        return self._item(self.outcomes[self.alias.sample(rng)], rng)
+
+    def sample(self, rng: random.Random, count: int) -> List[Item]:
+        outcomes, pick, item = self.outcomes, self.alias.sample, self._item
+        return [item(outcomes[pick(rng)], rng) for _ in range(count)]
+
+    def shop_stock(self, rng: random.Random) -> List[Item]:
+        potion = self.potion_outcome(self.depth)
+        return self.sample(rng, self.stock) + [self._item(potion, rng) for _ in range(self.potions)]
+
+
+@lru_cache(maxsize=256)
+def loot_table(name: str, depth: int) -> LootTable:
+    """config.LOOT[name] compiled for depth (kept, so each is built once)."""
+    return LootTable(LOOT[name], depth)
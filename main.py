@@ -8,30 +8,96 @@ and equips each class with its proper starting weapon and stats while keeping
 The original game structure/logic intact.
 """
 
+import argparse
+import atexit
 import os
-import sys
 from game import Game
+from journal import Journal
+from archive import SaveArchive
+from replay import Recording
+
+
+def record(game, args, resumed):
+    if args.record:
+        Recording(args.record).start(game, resumed=resumed)
+
+
+def play(game, path, args, resumed=False):
+    if args.autosave:
+        # Every command is appended to the save file as it happens
+        Journal(path).start(game)
+    record(game, args, resumed)
+    game.run()
+    if game.journal is not None:
+        game.journal.close()
+    if game.recording is not None:
+        game.recording.close()
+
+
+def play_slot(archive_path, slot, args):
+    archive = SaveArchive(archive_path)
+    if slot in archive:
+        print(f"Loading slot '{slot}' from {archive_path}")
+        game = Game(skip_class_select=True)
+        archive.load(slot, game)
+        resumed = True
+    else:
+        print(f"Starting a new game in slot '{slot}'")
+        game = Game(seed=args.seed, large_world=args.large_world)
+        resumed = False
+    game.archive_slot = (archive, slot)
+    record(game, args, resumed)
+    game.run()
+    if game.recording is not None:
+        game.recording.close()
+    if not game.game_over:
+        archive.save(slot, game)
+    elif slot in archive:
+        # A dead character isn't resumed; the slot starts over next time
+        archive.delete(slot)
+    archive.close()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shadows of the Abyss")
+    parser.add_argument('save_file', nargs='?', help="save file to load")
+    parser.add_argument('--seed', type=int, help="seed for a new game (replays the same dungeon)")
+    parser.add_argument('--large-world', action='store_true', help="play on huge chunked floors")
+    parser.add_argument('--no-autosave', dest='autosave', action='store_false',
+                        help="only save when asked to ('save')")
+    parser.add_argument('--archive', help="save archive holding many slots")
+    parser.add_argument('--slot', default='default', help="slot to play in the archive")
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='JSON',
+                        help="time each phase of a turn and write the results here on exit")
+    parser.add_argument('--record', metavar='FILE', help="record the session for replay.py")
+    args = parser.parse_args()
+
+    if args.profile:
+        from profiler import Profiler
+        profiler = Profiler()
+        profiler.install()
+        atexit.register(profiler.dump, args.profile)
+
     print("=== SHADOWS OF THE ABYSS ===")
     print("A Terminal Dungeon Crawler\n")
 
     # Check if save file is passed as argument
-    save_file = None
-    if len(sys.argv) > 1:
-        save_file = sys.argv[1]
+    save_file = args.save_file
+    if args.archive:
+        play_slot(args.archive, args.slot, args)
+    elif save_file:
         if os.path.exists(save_file):
             print(f"Loading save file: {save_file}")
             game = Game(skip_class_select=True)
             game.load_game(save_file)
-            game.run()
+            play(game, save_file, args, resumed=True)
         else:
             print(f"Save file '{save_file}' not found. Starting new game.")
             print("Your quest: Descend into the abyss and survive!")
             print("\nPress Enter to begin...")
             input()
-            game = Game()  # will prompt for class selection
-            game.run()
+            game = Game(seed=args.seed, large_world=args.large_world)  # will prompt for class selection
+            play(game, save_file, args)
     else:
         # Check for default save
         if os.path.exists("game_save.sav"):
@@ -39,16 +105,22 @@ if __name__ == "__main__":
             if choice == 'y':
                 game = Game(skip_class_select=True)
                 game.load_game()
-                game.run()
+                play(game, "game_save.sav", args, resumed=True)
             else:
+                if args.autosave:
+                    # Autosave would replace the save as soon as the game starts
+                    choice = input("A new game autosaves over it. Overwrite it? (y/n): ").strip().lower()
+                    if choice != 'y':
+                        args.autosave = False
+                        print("Autosave is off for this game; 'save' still overwrites it.")
                 print("Your quest: Descend into the abyss and survive!")
                 print("\nPress Enter to begin...")
                 input()
-                game = Game()
-                game.run()
+                game = Game(seed=args.seed, large_world=args.large_world)
+                play(game, "game_save.sav", args)
         else:
             print("Your quest: Descend into the abyss and survive!")
             print("\nPress Enter to begin...")
             input()
-            game = Game()
-            game.run()
+            game = Game(seed=args.seed, large_world=args.large_world)
+            play(game, "game_save.sav", args)
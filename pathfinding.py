@@ -0,0 +1,102 @@
+from collections import deque
+from typing import Container, Dict, List, Optional, Set, Tuple
+
+Pos = Tuple[int, int]
+
+ORTHOGONAL = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+# Enemies may also step diagonally, as they always could
+NEIGHBORS = ORTHOGONAL + [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+class FlowField:
+    """Distance map from one origin (the player) over walkable tiles.
+
+    Built once per turn with a BFS capped at `radius` orthogonal steps (so in
+    open rooms the range matches the old Manhattan distance check), and shared
+    by every enemy: each one steps to its lowest neighbour, so the cost doesn't
+    depend on how many enemies there are and they follow corridors around
+    corners instead of pushing into walls.
+    """
+
+    def __init__(self, radius: int):
+        self.radius = radius
+        self.dist: Dict[Pos, int] = {}
+        self._grid = None
+        self._origin: Optional[Pos] = None
+
+    def update(self, grid, origin: Pos):
+        # The map doesn't change under a floor, so a field is reusable until
+        # the player moves (e.g. enemy turns after drinking a potion)
+        if grid is self._grid and origin == self._origin:
+            return
+        self._grid = grid
+        self._origin = origin
+
+        radius = self.radius
+        dist = {origin: 0}
+        frontier = deque([origin])
+        in_bounds = grid.in_bounds
+        is_wall = grid.is_wall
+        while frontier:
+            pos = frontier.popleft()
+            d = dist[pos] + 1
+            if d > radius:
+                continue
+            x, y = pos
+            for dx, dy in ORTHOGONAL:
+                n = (x + dx, y + dy)
+                if n in dist or not in_bounds(n[0], n[1]) or is_wall(n[0], n[1]):
+                    continue
+                dist[n] = d
+                frontier.append(n)
+        self.dist = dist
+
+    def distance(self, pos: Pos) -> Optional[int]:
+        return self.dist.get(pos)
+
+    def steps(self, positions: List[Pos]) -> List[Optional[Pos]]:
+        """The best step for each position, ignoring anything in the way."""
+        get = self.dist.get
+        result = []
+        append = result.append
+        for pos in positions:
+            best = None
+            best_d = get(pos)
+            if best_d:
+                x, y = pos
+                for dx, dy in NEIGHBORS:
+                    n = (x + dx, y + dy)
+                    d = get(n)
+                    if d is not None and d < best_d:
+                        best, best_d = n, d
+            append(best)
+        return result
+
+    def step(self, pos: Pos, blocked: Container[Pos]) -> Optional[Pos]:
+        """The free neighbour of pos closest to the origin, if it is closer
+        than pos itself."""
+        best_d = self.dist.get(pos)
+        if not best_d:
+            return None
+        dist = self.dist
+        best = None
+        x, y = pos
+        for dx, dy in NEIGHBORS:
+            n = (x + dx, y + dy)
+            d = dist.get(n)
+            if d is not None and d < best_d and n not in blocked:
+                best, best_d = n, d
+        return best
+
+
+class Occupancy:
+    """Cells taken while a batch of moves is resolved: the starting
+    positions, minus the ones vacated so far, plus the ones claimed."""
+
+    def __init__(self, start: Container[Pos]):
+        self.start = start
+        self.vacated: Set[Pos] = set()
+        self.claimed: Set[Pos] = set()
+
+    def __contains__(self, pos) -> bool:
+        return pos in self.claimed or (pos in self.start and pos not in self.vacated)
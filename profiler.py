@@ -0,0 +1,115 @@
+"""
+Per-phase timing for a game session.
+
+Profiler.install wraps the methods in PHASES with a timer that records a
+count, a total, the slowest call and a latency histogram for each. Nothing
+is wrapped until then, so a game run without profiling pays nothing. Times
+are inclusive: move_player's include the _combat and _enemy_turns it runs.
+
+    python main.py --profile profile.json
+"""
+
+import functools
+import json
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from game import Game
+from generators import GENERATORS
+
+PHASES: List[Tuple[type, str]] = [
+    (Game, 'render'), (Game, 'move_player'), (Game, '_enemy_turns'), (Game, '_combat'),
+    (Game, 'generate_level'), (Game, 'save_game'), (Game, 'load_game'),
+] + [(engine, 'generate') for engine in GENERATORS.values()]
+
+
+class PhaseStats:
+    """Timings of one phase. Histogram bucket k counts calls that took under
+    2**k microseconds (and at least 2**(k-1))."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: List[int] = []
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        bucket = int(elapsed * 1e6).bit_length()
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (in seconds) of the bucket holding the p-th call."""
+        rank = p * self.count
+        seen = 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return 2 ** bucket / 1e6
+        return 0.0
+
+    def report(self) -> Dict:
+        ms = 1000.0
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * ms, 3),
+            'mean_us': round(self.total / self.count * 1e6, 2) if self.count else 0.0,
+            'max_ms': round(self.max * ms, 3),
+            'p50_ms_at_most': self.percentile(0.5) * ms,
+            'p99_ms_at_most': self.percentile(0.99) * ms,
+            'histogram_us': {f'<{2 ** bucket}': n for bucket, n in enumerate(self.buckets) if n},
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.phases: Dict[str, PhaseStats] = {}
+        # Floors are also generated on the prefetch thread
+        self._lock = threading.Lock()
+        self._originals: List[Tuple[type, str, object]] = []
+        self.started = time.perf_counter()
+
+    def install(self, phases: List[Tuple[type, str]] = PHASES):
+        for owner, name in phases:
+            self._wrap(owner, name)
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals.clear()
+
+    def _wrap(self, owner: type, name: str):
+        original = getattr(owner, name)
+        stats = self.phases.setdefault(f'{owner.__name__}.{name}', PhaseStats())
+        lock = self._lock
+        clock = time.perf_counter
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                with lock:
+                    stats.add(elapsed)
+
+        self._originals.append((owner, name, original))
+        setattr(owner, name, timed)
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {
+                'wall_seconds': round(time.perf_counter() - self.started, 3),
+                'phases': {name: stats.report() for name, stats in self.phases.items()},
+            }
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
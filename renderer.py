@@ -0,0 +1,202 @@
+"""
+Double-buffered terminal renderer.
+
+Screens are drawn into a back buffer of cells, compared with the front buffer
+(what the terminal currently shows) and only the changed cells are sent, using
+cursor-addressing escape codes, in a single write per frame. A frame taller
+than the terminal is cut to fit, so typing at the prompt never scrolls it.
+"""
+
+import shutil
+import sys
+from typing import List, Optional, TextIO
+
+ESC = '\033['
+RESET = '\033[0m'
+CLEAR_SCREEN = '\033[2J\033[H'
+CLEAR_TO_EOL = '\033[K'
+CLEAR_BELOW = '\033[J'
+
+# Unchanged cells shorter than this between two changes are re-sent rather
+# than paying for another cursor move (which costs ~8 bytes).
+MERGE_GAP = 6
+
+
+def split_cells(text: str, color: str = '') -> List[str]:
+    """Splits text (which may contain SGR color codes) into one cell per
+    visible character. A colored cell is its SGR prefix followed by the char."""
+    cells = []
+    current = color
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == '\033' and text.startswith(ESC, i):
+            end = text.find('m', i)
+            if end == -1:
+                break
+            code = text[i:end + 1]
+            current = '' if code == RESET else current + code
+            i = end + 1
+            continue
+        cells.append(current + ch if current else ch)
+        i += 1
+    return cells
+
+
+class Renderer:
+    def __init__(self, out: Optional[TextIO] = None, check_terminal_size: bool = True):
+        self.out = out or sys.stdout
+        self.check_terminal_size = check_terminal_size
+        self.front: List[List[str]] = []
+        self.front_heights: List[int] = []
+        self.back: List[List[str]] = []
+        self._columns = 0
+        self._offsets: List[int] = []
+        self.full_redraw = True
+        self.frames = 0
+        self.last_frame_bytes = 0
+        self.total_bytes = 0
+
+    # -------------------------
+    # Building a frame
+    # -------------------------
+    def begin_frame(self):
+        self.back = []
+
+    def add_cells(self, cells: List[str]):
+        self.back.append(cells)
+
+    def add_text(self, text: str = '', color: str = ''):
+        self.back.append(split_cells(text, color) if '\033' in text or color else list(text))
+
+    def invalidate(self):
+        # Something else wrote to the terminal; repaint everything next frame
+        self.full_redraw = True
+
+    # -------------------------
+    # Output
+    # -------------------------
+    def present(self) -> int:
+        back = self.back
+        front = self.front
+        columns, lines = self._terminal_size()
+
+        # Rows longer than the terminal wrap onto extra lines; track where
+        # each row starts so cursor addressing stays right.
+        heights = [max(1, -(-len(row) // columns)) for row in back] if columns else [1] * len(back)
+        offsets = []
+        line = 0
+        for y, h in enumerate(heights):
+            if lines and line + h + 2 > lines:
+                # Clipped to the terminal, leaving two lines for the prompt
+                # and the Enter after it: a scroll would shift the screen
+                # under the front buffer
+                back = back[:y]
+                heights = heights[:y]
+                break
+            offsets.append(line)
+            line += h
+        common = min(len(back), len(front))
+        if heights[:common] != self.front_heights[:common]:
+            self.full_redraw = True
+
+        self._columns = columns
+        self._offsets = offsets
+        parts: List[str] = []
+        if self.full_redraw:
+            parts.append(CLEAR_SCREEN)
+            for y, row in enumerate(back):
+                if row:
+                    self._goto(parts, y, 0)
+                    self._emit_cells(parts, row, 0, len(row))
+            self.full_redraw = False
+        else:
+            for y, row in enumerate(back):
+                old = front[y] if y < len(front) else []
+                if row != old:
+                    self._emit_row_diff(parts, y, old, row)
+
+        # Leave the cursor just below the frame, erasing the old prompt and
+        # any rows left over from a longer previous frame
+        parts.append(f'{ESC}{line + 1};1H{CLEAR_BELOW}')
+
+        payload = ''.join(parts)
+        self.out.write(payload)
+        self.out.flush()
+
+        self.front = back
+        self.front_heights = heights
+        self.back = []
+        self.frames += 1
+        self.last_frame_bytes = len(payload.encode('utf-8'))
+        self.total_bytes += self.last_frame_bytes
+        return self.last_frame_bytes
+
+    def _terminal_size(self):
+        if not self.check_terminal_size:
+            return 0, 0
+        try:
+            size = shutil.get_terminal_size()
+        except OSError:
+            return 0, 0
+        return size.columns, size.lines
+
+    def _goto(self, parts: List[str], y: int, x: int):
+        if self._columns:
+            line = self._offsets[y] + x // self._columns
+            x %= self._columns
+        else:
+            line = self._offsets[y]
+        parts.append(f'{ESC}{line + 1};{x + 1}H')
+
+    def _emit_row_diff(self, parts: List[str], y: int, old: List[str], new: List[str]):
+        common = min(len(old), len(new))
+        start = None
+        last_change = -MERGE_GAP - 1
+        for x in range(common):
+            if old[x] != new[x]:
+                if start is None:
+                    start = x
+                elif x - last_change > MERGE_GAP:
+                    self._goto(parts, y, start)
+                    self._emit_cells(parts, new, start, last_change + 1)
+                    start = x
+                last_change = x
+
+        if len(new) > common:
+            # Row grew: the tail is new text, send it with any pending run
+            if start is None or common - last_change > MERGE_GAP:
+                if start is not None:
+                    self._goto(parts, y, start)
+                    self._emit_cells(parts, new, start, last_change + 1)
+                start = common
+            self._goto(parts, y, start)
+            self._emit_cells(parts, new, start, len(new))
+            return
+
+        if start is not None:
+            self._goto(parts, y, start)
+            self._emit_cells(parts, new, start, last_change + 1)
+        if len(old) > len(new):
+            self._goto(parts, y, len(new))
+            parts.append(CLEAR_TO_EOL)
+
+    def _emit_cells(self, parts: List[str], row: List[str], start: int, end: int):
+        active = ''
+        for cell in row[start:end]:
+            if len(cell) == 1:
+                if active:
+                    parts.append(RESET)
+                    active = ''
+                parts.append(cell)
+            else:
+                color = cell[:-1]
+                if color != active:
+                    if active:
+                        parts.append(RESET)
+                    parts.append(color)
+                    active = color
+                parts.append(cell[-1])
+        if active:
+            parts.append(RESET)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Session recordings: the lines a player typed, replayed at full speed.
+
+A recording is a text file. Its first line is a JSON header with the seed,
+class and map mode of the game (and, for a game resumed from a save, the
+saved state it started from); every line after it is one line of input as
+Game.handle_input got it: moves with their counts ('5w'), inventory and shop
+commands, 'q'. The game is deterministic given its seed, so replaying the
+lines reproduces the session exactly. Replays skip rendering except for the
+final frame, which makes them a quick way to reproduce a reported bug and a
+repeatable workload for profiling the turn loop.
+
+    python main.py --record session.rec
+    python replay.py session.rec
+    python replay.py session.rec --profile profile.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import savefile
+from game import Game
+from renderer import Renderer
+
+FORMAT = 'sota-recording'
+VERSION = 1
+# Commands not replayed: saving would write over the player's save files
+SKIPPED = {'save'}
+
+
+class RecordingError(ValueError):
+    pass
+
+
+class Recording:
+    """Appends each line the game handles to a recording file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def start(self, game: Game, resumed: bool = False):
+        """Begins recording game; a resumed game's current state goes into
+        the header, a new game is described by its seed and class."""
+        header = {
+            'format': FORMAT,
+            'version': VERSION,
+            'seed': game.seed,
+            'class': game.player.character_class,
+            'large_world': game.large_world,
+        }
+        if resumed:
+            header['state'] = base64.b64encode(zlib.compress(savefile.encode_game(game))).decode('ascii')
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.write(json.dumps(header) + '\n')
+        self._file.flush()
+        game.recording = self
+
+    def write(self, line: str):
+        # Flushed per line so a crash keeps everything up to it
+        self._file.write(line.rstrip('\r\n').replace('\n', ' ') + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load(path: str) -> Tuple[Dict, List[str]]:
+    """A recording's header and its input lines."""
+    with open(path, encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            raise RecordingError(f"{path} is not a recording")
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise RecordingError(f"{path} is not a recording")
+        if header.get('version') != VERSION:
+            raise RecordingError(f"Unsupported recording version {header.get('version')}")
+        return header, [line.rstrip('\n') for line in f]
+
+
+def start_game(header: Dict, renderer: Renderer) -> Game:
+    """The game as it was when the recording started. Nothing is generated
+    ahead in the background, so the replay is a single thread's work."""
+    if 'state' in header:
+        game = Game(skip_class_select=True, prefetch_depth=0, renderer=renderer)
+        state = zlib.decompress(base64.b64decode(header['state']))
+        game.apply_save_state(savefile.decode_game(state))
+        return game
+    return Game(character_class=header['class'], seed=header['seed'],
+                large_world=header['large_world'], prefetch_depth=0, renderer=renderer)
+
+
+def replay(header: Dict, lines: List[str], renderer: Renderer, render_frames: bool = False) -> Tuple[Game, int]:
+    """Plays the lines into a new game and draws its final frame. Returns
+    the game and the number of lines handled (a quit or death ends it
+    early). With render_frames every frame in between is drawn too."""
+    game = start_game(header, renderer)
+    handled = 0
+    for line in lines:
+        if game.game_over:
+            break
+        if render_frames:
+            game.render()
+        handled += 1
+        if line.strip().lower() in SKIPPED:
+            continue
+        if not game.handle_input(line):
+            break
+    game.render()
+    return game, handled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded session at full speed")
+    parser.add_argument('recording')
+    parser.add_argument('--frames', action='store_true',
+                        help="render every frame (to nowhere), not just the last")
+    parser.add_argument('--quiet', action='store_true', help="don't show the final frame")
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='JSON',
+                        help="time each phase of the replay and write the results here")
+    args = parser.parse_args()
+
+    try:
+        header, lines = load(args.recording)
+    except (OSError, RecordingError) as e:
+        sys.exit(str(e))
+
+    profiler = None
+    if args.profile:
+        from profiler import Profiler
+        profiler = Profiler()
+        profiler.install()
+
+    with open(os.devnull, 'w') as devnull:
+        sink: Optional[Renderer] = None
+        out = devnull if args.quiet else sys.stdout
+        if args.frames and not args.quiet:
+            # Frames go nowhere; only the last one is drawn to the terminal
+            sink = Renderer(devnull, check_terminal_size=False)
+        renderer = sink or Renderer(out, check_terminal_size=False)
+
+        start = time.perf_counter()
+        game, handled = replay(header, lines, renderer, render_frames=args.frames)
+        elapsed = time.perf_counter() - start
+        if sink is not None:
+            game.renderer = Renderer(out, check_terminal_size=False)
+            game.render()
+
+    if profiler is not None:
+        profiler.dump(args.profile)
+    state = "died" if game.game_over else "alive"
+    print(f"\nReplayed {handled} of {len(lines)} commands in {elapsed:.3f}s "
+          f"({handled / elapsed if elapsed else 0:.0f} commands/s): {game.player.character_class} "
+          f"level {game.player.level}, depth {game.dungeon_level}, {game.player.hp} HP, {state}")
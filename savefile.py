@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+Versioned binary save format.
+
+    header   MAGIC, format version (u16), flags (u16, reserved)
+    strings  table of every distinct string (names, descriptions, messages)
+    body     player, inventory and equipment, the map (a run-length-encoded
+             grid, or the chunked world's seed and changed chunks), then
+             tables of enemies and items keyed by packed positions, the
+             explored cells and the room graph, then the floors above kept in the floor cache
+             (compressed floors)
+
+Integers are LEB128 varints (zigzag for signed ones) and strings are indexes
+into the table, so a save holds no Python code or pickles of its own. Saves
+from before this format (pickled dicts of builtin values and rarities, read
+with no other globals allowed) go through read_legacy and are written back in the new
+format on the next save; so are the pickled chunks of large worlds in saves
+before version 5, which may only hold enemies and items.
+
+Run directly to compare sizes and times against the old format:
+    python savefile.py --width 2000 --height 600
+"""
+
+import argparse
+import ast
+import io
+import pickle
+import re
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import CLASS_DEFS
+from dataclasses import Item, Character, asdict
+from enemy import Enemy, ENEMY_TYPES, TYPE_CODES
+from dungeon_generator import Room, RoomGraph
+from enums import Rarity, EnemyType
+from tile_grid import TileGrid, TILE_CODES
+
+MAGIC = b'SOTA'
+# 2: start and up-stairs positions, and the floor cache
+# 3: explored cells of each floor (fog of war)
+# 4: each floor's rooms and the corridors between them
+# 5: changed large-world chunks as tables of enemies and items, not pickles
+VERSION = 5
+HEADER = struct.Struct('<4sHH')
+
+RARITIES = list(Rarity)
+RARITY_CODES = {rarity: code for code, rarity in enumerate(RARITIES)}
+
+MAP_NONE = 0
+MAP_GRID = 1
+MAP_WORLD = 2
+
+CHARACTER_INTS = ('hp', 'max_hp', 'attack', 'defense', 'level', 'xp', 'xp_to_next', 'gold')
+
+Pos = Tuple[int, int]
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+# -------------------------
+# Encoding primitives
+# -------------------------
+class _Writer:
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.strings: Dict[str, int] = {}
+
+    def uint(self, n: int):
+        out = bytearray()
+        while n > 0x7f:
+            out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        out.append(n)
+        self.parts.append(bytes(out))
+
+    def sint(self, n: int):
+        self.uint(n * 2 if n >= 0 else -n * 2 - 1)
+
+    def f64(self, value: float):
+        self.parts.append(struct.pack('<d', value))
+
+    def text(self, s: str):
+        self.uint(self.strings.setdefault(s, len(self.strings)))
+
+    def blob(self, data: bytes):
+        self.uint(len(data))
+        self.parts.append(data)
+
+    def finish(self, header: bool = True) -> bytes:
+        table = _Writer()
+        table.uint(len(self.strings))
+        for s in self.strings:
+            table.blob(s.encode('utf-8'))
+        body = b''.join(table.parts) + b''.join(self.parts)
+        return HEADER.pack(MAGIC, VERSION, 0) + body if header else body
+
+
+class _Reader:
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = memoryview(data)
+        self.offset = offset
+        self.strings: List[str] = []
+
+    def uint(self) -> int:
+        data = self.data
+        n = shift = 0
+        while True:
+            byte = data[self.offset]
+            self.offset += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return n
+            shift += 7
+
+    def sint(self) -> int:
+        n = self.uint()
+        return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+    def f64(self) -> float:
+        (value,) = struct.unpack_from('<d', self.data, self.offset)
+        self.offset += 8
+        return value
+
+    def text(self) -> str:
+        return self.strings[self.uint()]
+
+    def blob(self) -> bytes:
+        n = self.uint()
+        data = bytes(self.data[self.offset:self.offset + n])
+        self.offset += n
+        return data
+
+    def read_strings(self):
+        self.strings = [self.blob().decode('utf-8') for _ in range(self.uint())]
+
+
+# -------------------------
+# Records
+# -------------------------
+def _write_item(w: _Writer, item: Item):
+    w.text(item.name)
+    w.text(item.item_type)
+    w.sint(item.value)
+    w.text(item.description)
+    w.uint(RARITY_CODES[item.rarity])
+
+
+def _read_item(r: _Reader) -> Item:
+    return Item(r.text(), r.text(), r.sint(), r.text(), RARITIES[r.uint()])
+
+
+def _write_optional_item(w: _Writer, item: Optional[Item]):
+    w.uint(item is not None)
+    if item is not None:
+        _write_item(w, item)
+
+
+def _read_optional_item(r: _Reader) -> Optional[Item]:
+    return _read_item(r) if r.uint() else None
+
+
+# A run of one repeated byte. Spelling out each tile's byte lets the regex
+# engine scan most runs without a backreference, which is a lot faster.
+_RUN = re.compile(b'|'.join(re.escape(bytes([code])) + b'+' for code in sorted(TILE_CODES.values()))
+                  + rb'|(.)\1*', re.DOTALL)
+
+
+def _write_rle(w: _Writer, cells: bytes):
+    runs = [(cells[start], end - start) for start, end in (m.span() for m in _RUN.finditer(cells))]
+    w.uint(len(runs))
+    for code, length in runs:
+        w.uint(code)
+        w.uint(length)
+
+
+def _read_rle(r: _Reader, size: int) -> bytearray:
+    cells = bytearray()
+    for _ in range(r.uint()):
+        code = r.uint()
+        cells += bytes([code]) * r.uint()
+    if len(cells) != size:
+        raise SaveFormatError(f"Grid has {len(cells)} cells, expected {size}")
+    return cells
+
+
+def _write_world(w: _Writer, snapshot: Dict):
+    w.uint(snapshot['seed'])
+    w.uint(snapshot['chunks'][0])
+    w.uint(snapshot['chunks'][1])
+    w.uint(snapshot['chunk_size'])
+    w.uint(snapshot['load_radius'])
+    w.uint(snapshot['rooms_per_chunk'])
+    w.uint(len(snapshot['resident']))
+    for cx, cy in snapshot['resident']:
+        w.uint(cx)
+        w.uint(cy)
+    # Changed chunks are the world's own compressed blobs, stored as-is
+    w.uint(len(snapshot['saved']))
+    for (cx, cy), blob in sorted(snapshot['saved'].items()):
+        w.uint(cx)
+        w.uint(cy)
+        w.blob(blob)
+
+
+def _read_world(r: _Reader, version: int) -> Dict:
+    snapshot = {'seed': r.uint(), 'chunks': (r.uint(), r.uint()), 'chunk_size': r.uint(),
+                'load_radius': r.uint(), 'rooms_per_chunk': r.uint()}
+    snapshot['resident'] = [(r.uint(), r.uint()) for _ in range(r.uint())]
+    saved = {}
+    for _ in range(r.uint()):
+        key = (r.uint(), r.uint())
+        saved[key] = r.blob() if version >= 5 else _convert_chunk(r.blob())
+    snapshot['saved'] = saved
+    return snapshot
+
+
+def encode_chunk(enemies: Dict[Pos, Enemy], items: Dict[Pos, Item]) -> bytes:
+    """A large-world chunk's enemies and items (see world.ChunkedWorld),
+    without header. The same contents always give the same bytes."""
+    w = _Writer()
+    w.uint(len(enemies))
+    for pos, enemy in sorted(enemies.items()):
+        _write_pos(w, pos)
+        w.uint(TYPE_CODES[enemy.type])
+        w.uint(enemy.level)
+        w.sint(enemy.hp)
+    w.uint(len(items))
+    for pos, item in sorted(items.items()):
+        _write_pos(w, pos)
+        _write_item(w, item)
+    return w.finish(header=False)
+
+
+def decode_chunk(data: bytes) -> Tuple[Dict[Pos, Enemy], Dict[Pos, Item]]:
+    r = _Reader(data)
+    r.read_strings()
+    enemies = {}
+    for _ in range(r.uint()):
+        pos = _read_pos(r)
+        enemy = Enemy(ENEMY_TYPES[r.uint()], r.uint())
+        enemy.hp = r.sint()
+        enemies[pos] = enemy
+    items = {}
+    for _ in range(r.uint()):
+        pos = _read_pos(r)
+        items[pos] = _read_item(r)
+    return enemies, items
+
+
+class _ChunkUnpickler(pickle.Unpickler):
+    # Only what a chunk's enemies and items are made of
+    ALLOWED = {('enemy', 'Enemy'), ('dataclasses', 'Item'), ('enums', 'EnemyType'), ('enums', 'Rarity')}
+
+    def find_class(self, module: str, name: str):
+        if (module, name) not in self.ALLOWED:
+            raise SaveFormatError(f"Saved chunk holds {module}.{name}")
+        return super().find_class(module, name)
+
+
+def _convert_chunk(blob: bytes) -> bytes:
+    """A chunk from before version 5 (a compressed pickle) in the current
+    format."""
+    try:
+        enemies, items = _ChunkUnpickler(io.BytesIO(zlib.decompress(blob))).load()
+    except (pickle.UnpicklingError, zlib.error, AttributeError, TypeError, EOFError) as e:
+        raise SaveFormatError(f"Unreadable saved chunk: {e}")
+    return zlib.compress(encode_chunk(enemies, items))
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    # Old save dicts hold builtin values, and each item's rarity (asdict
+    # kept the enum member)
+    ALLOWED = {('enums', 'Rarity')}
+
+    def find_class(self, module: str, name: str):
+        if (module, name) not in self.ALLOWED:
+            raise SaveFormatError(f"Save file holds {module}.{name}")
+        return super().find_class(module, name)
+
+
+# -------------------------
+# Floors
+# -------------------------
+def _write_pos(w: _Writer, pos: Pos):
+    w.uint(pos[0])
+    w.uint(pos[1])
+
+
+def _read_pos(r: _Reader) -> Pos:
+    return r.uint(), r.uint()
+
+
+def _write_cells(w: _Writer, cells: Set[Pos], width: int):
+    # Runs of consecutive packed positions, as (gap since the last run, length)
+    packed = sorted(y * width + x for x, y in cells)
+    runs = []
+    for index in packed:
+        if runs and runs[-1][0] + runs[-1][1] == index:
+            runs[-1][1] += 1
+        else:
+            runs.append([index, 1])
+    w.uint(len(runs))
+    end = 0
+    for start, length in runs:
+        w.uint(start - end)
+        w.uint(length)
+        end = start + length
+
+
+def _read_cells(r: _Reader, width: int) -> Set[Pos]:
+    cells = set()
+    end = 0
+    for _ in range(r.uint()):
+        start = end + r.uint()
+        end = start + r.uint()
+        for index in range(start, end):
+            y, x = divmod(index, width)
+            cells.add((x, y))
+    return cells
+
+
+def _write_graph(w: _Writer, graph: Optional[RoomGraph]):
+    # No rooms stands for no graph (chunked worlds have none)
+    rooms = graph.rooms if graph is not None else []
+    w.uint(len(rooms))
+    for room in rooms:
+        for value in (room.x, room.y, room.width, room.height):
+            w.uint(value)
+    w.uint(len(graph.edges) if rooms else 0)
+    for a, b in graph.edges if rooms else ():
+        w.uint(a)
+        w.uint(b)
+
+
+def _read_graph(r: _Reader) -> Optional[RoomGraph]:
+    rooms = [Room(r.uint(), r.uint(), r.uint(), r.uint()) for _ in range(r.uint())]
+    edges = [(r.uint(), r.uint()) for _ in range(r.uint())]
+    return RoomGraph(rooms, edges) if rooms else None
+
+
+def _write_floor(w: _Writer, grid, start_pos: Pos, stairs_pos: Pos, up_pos: Optional[Pos],
+                 enemies: List[Tuple[Pos, int, int, int]], items: Dict[Pos, Item], explored: Set[Pos],
+                 graph: Optional[RoomGraph]):
+    """Writes a map with its stairs, enemies (pos, type code, level, hp),
+    items, explored cells and room graph."""
+    if isinstance(grid, TileGrid):
+        w.uint(MAP_GRID)
+        w.uint(grid.width)
+        w.uint(grid.height)
+        _write_rle(w, grid.cells)
+    else:
+        w.uint(MAP_WORLD)
+        _write_world(w, grid.snapshot())
+    _write_pos(w, start_pos)
+    _write_pos(w, stairs_pos)
+    w.uint(up_pos is not None)
+    if up_pos is not None:
+        _write_pos(w, up_pos)
+
+    # Positions are packed into one integer, y * width + x
+    width = grid.width
+    w.uint(len(enemies))
+    for (x, y), code, level, hp in sorted(enemies):
+        w.uint(y * width + x)
+        w.uint(code)
+        w.uint(level)
+        w.sint(hp)
+    w.uint(len(items))
+    for (x, y), item in sorted(items.items()):
+        w.uint(y * width + x)
+        _write_item(w, item)
+    _write_cells(w, explored, width)
+    _write_graph(w, graph)
+
+
+def _read_floor(r: _Reader, kind: int, version: int) -> Dict:
+    floor: Dict = {'grid': None, 'world': None, 'up_pos': None, 'enemies': {}, 'items': {},
+                   'explored': set(), 'room_graph': None}
+    if kind == MAP_WORLD:
+        floor['world'] = _read_world(r, version)
+        chunks_x, chunks_y = floor['world']['chunks']
+        width = chunks_x * floor['world']['chunk_size']
+    else:
+        width, height = r.uint(), r.uint()
+        floor['grid'] = TileGrid(width, height, cells=_read_rle(r, width * height))
+    if version >= 2:
+        floor['start_pos'] = _read_pos(r)
+        floor['stairs_pos'] = _read_pos(r)
+        if r.uint():
+            floor['up_pos'] = _read_pos(r)
+    else:
+        floor['start_pos'] = None
+        floor['stairs_pos'] = _read_pos(r)
+
+    for _ in range(r.uint()):
+        y, x = divmod(r.uint(), width)
+        enemy = Enemy(ENEMY_TYPES[r.uint()], r.uint())
+        enemy.hp = r.sint()
+        floor['enemies'][(x, y)] = enemy
+    for _ in range(r.uint()):
+        y, x = divmod(r.uint(), width)
+        floor['items'][(x, y)] = _read_item(r)
+    if version >= 3:
+        floor['explored'] = _read_cells(r, width)
+    if version >= 4:
+        floor['room_graph'] = _read_graph(r)
+    return floor
+
+
+def encode_floor(floor) -> bytes:
+    """A floor kept in the floor cache (see floors.Floor), without header."""
+    w = _Writer()
+    enemies = [(pos, TYPE_CODES[e.type], e.level, e.hp) for pos, e in floor.enemies.items()]
+    _write_floor(w, floor.grid, floor.start_pos, floor.stairs_pos, floor.up_pos, enemies, floor.items,
+                 floor.explored, floor.room_graph)
+    return w.finish(header=False)
+
+
+def decode_floor(data: bytes, version: int = VERSION) -> Dict:
+    """A dict of grid or world (snapshot), start_pos, stairs_pos, up_pos,
+    enemies, items, explored and room_graph. Floors have no header of their own, so
+    ones from older saves need that save's version."""
+    r = _Reader(data)
+    r.read_strings()
+    return _read_floor(r, r.uint(), version)
+
+
+# -------------------------
+# Whole saves
+# -------------------------
+def encode_game(game) -> bytes:
+    w = _Writer()
+    w.uint(game.dungeon_level)
+    w.uint(game.in_shop)
+    w.uint(game.large_world)
+    w.sint(game.seed)
+    version, internal, gauss_next = game.rng.getstate()
+    w.uint(version)
+    w.uint(len(internal))
+    w.parts.append(struct.pack(f'<{len(internal)}I', *internal))
+    w.uint(gauss_next is not None)
+    if gauss_next is not None:
+        w.f64(gauss_next)
+
+    player = game.player
+    w.text(player.name)
+    for field in CHARACTER_INTS:
+        w.sint(getattr(player, field))
+    w.f64(player.crit_chance)
+    w.f64(player.crit_damage)
+    w.text(player.character_class)
+    _write_pos(w, game.player_pos)
+
+    w.uint(len(game.message_log))
+    for msg in game.message_log:
+        w.text(msg)
+    for items in (game.inventory, game.shop_items):
+        w.uint(len(items))
+        for item in items:
+            _write_item(w, item)
+    for item in (game.weapon, game.armor, game.amulet):
+        _write_optional_item(w, item)
+
+    if game.in_shop:
+        w.uint(MAP_NONE)
+    else:
+        store = game.enemies
+        enemies = [(pos, store.types[slot], store.levels[slot], store.hp[slot])
+                   for pos, slot in store.slot_at.items()]
+        _write_floor(w, game.grid, game.start_pos, game.stairs_pos, game.up_pos, enemies, game.items,
+                     game.explored, game.room_graph)
+
+    # Floors the player can climb back to, least recently visited first
+    cached = game.floors.entries()
+    w.uint(len(cached))
+    for level, live, blob in cached:
+        w.uint(level)
+        w.uint(live)
+        w.blob(blob)
+    return w.finish()
+
+
+def decode_game(data: bytes) -> Dict:
+    """Reads a save into a dict of game objects (see read_legacy for the keys)."""
+    if len(data) < HEADER.size:
+        raise SaveFormatError("Save file is truncated")
+    magic, version, _flags = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveFormatError("Not a Shadows of the Abyss save file")
+    if not 1 <= version <= VERSION:
+        raise SaveFormatError(f"Unsupported save version {version}")
+
+    r = _Reader(data, HEADER.size)
+    r.read_strings()
+    state: Dict = {'version': version, 'dungeon_level': r.uint(), 'in_shop': bool(r.uint()),
+                   'large_world': bool(r.uint()), 'seed': r.sint()}
+    rng_version = r.uint()
+    n = r.uint()
+    internal = struct.unpack_from(f'<{n}I', r.data, r.offset)
+    r.offset += 4 * n
+    gauss_next = r.f64() if r.uint() else None
+    state['rng_state'] = (rng_version, internal, gauss_next)
+
+    name = r.text()
+    ints = {field: r.sint() for field in CHARACTER_INTS}
+    state['player'] = Character(name=name, crit_chance=r.f64(), crit_damage=r.f64(),
+                                character_class=r.text(), **ints)
+    state['player_pos'] = _read_pos(r)
+
+    state['message_log'] = [r.text() for _ in range(r.uint())]
+    state['inventory'] = [_read_item(r) for _ in range(r.uint())]
+    state['shop_items'] = [_read_item(r) for _ in range(r.uint())]
+    state['weapon'] = _read_optional_item(r)
+    state['armor'] = _read_optional_item(r)
+    state['amulet'] = _read_optional_item(r)
+
+    kind = r.uint()
+    if kind == MAP_NONE:
+        state.update(grid=None, world=None, start_pos=None, stairs_pos=None, up_pos=None,
+                     enemies={}, items={}, explored=set(), room_graph=None)
+    else:
+        state.update(_read_floor(r, kind, version))
+        if state['start_pos'] is None:
+            state['start_pos'] = state['player_pos']
+
+    state['floors'] = []
+    if version >= 2:
+        for _ in range(r.uint()):
+            state['floors'].append((r.uint(), bool(r.uint()), r.blob()))
+    return state
+
+
+def read_legacy(save_data: Dict) -> Dict:
+    """Converts a pickled save dict from older versions into decode_game's
+    shape: version, player, player_pos, dungeon_level, large_world, seed,
+    rng_state, in_shop, inventory, weapon, armor, amulet, message_log,
+    shop_items, grid, world, start_pos, stairs_pos, up_pos, enemies, items,
+    explored, room_graph and floors (the floor cache's entries, in that version's floor
+    format)."""
+    def item(entry) -> Item:
+        item_dict, rarity_name = entry
+        return Item(**dict(item_dict, rarity=Rarity[rarity_name]))
+
+    def pos(key) -> Pos:
+        # Positions were stored as str((x, y)); read them as literals only
+        return tuple(ast.literal_eval(key)) if isinstance(key, str) else tuple(key)
+
+    player_dict = dict(save_data['player'])
+    player_dict.setdefault('character_class', "Adventurer")
+    state = {
+        'version': VERSION,
+        'player': Character(**player_dict),
+        'player_pos': tuple(save_data['player_pos']),
+        'dungeon_level': save_data['dungeon_level'],
+        'large_world': bool(save_data.get('large_world', False)),
+        # Older saves have no seed
+        'seed': save_data.get('seed'),
+        'rng_state': save_data.get('rng_state'),
+        'in_shop': save_data.get('in_shop', False),
+        'inventory': [item(entry) for entry in save_data.get('inventory', [])],
+        'message_log': save_data.get('message_log', []),
+        'shop_items': [item(entry) for entry in save_data.get('shop_items', [])],
+        'grid': None,
+        'world': _read_legacy_world(save_data.get('world')),
+        'start_pos': tuple(save_data['player_pos']),
+        'stairs_pos': tuple(save_data['stairs_pos']) if save_data.get('stairs_pos') else None,
+        'up_pos': None,
+        'enemies': {},
+        'items': {},
+        'explored': set(),
+        'room_graph': None,
+        'floors': [],
+    }
+    for slot in ('weapon', 'armor', 'amulet'):
+        state[slot] = item(save_data[slot]) if save_data.get(slot) else None
+
+    grid = save_data.get('grid')
+    if isinstance(grid, bytes):
+        width, height = save_data['grid_size']
+        state['grid'] = TileGrid.from_bytes(width, height, grid)
+    elif grid:
+        # Rows of tile names, from before the compact grid
+        state['grid'] = TileGrid.from_tile_names(grid)
+
+    for key, enemy_data in save_data.get('enemies', {}).items():
+        enemy = Enemy(EnemyType[enemy_data['type']], enemy_data['level'])
+        enemy.hp = enemy_data['hp']
+        state['enemies'][pos(key)] = enemy
+    for key, entry in save_data.get('items', {}).items():
+        state['items'][pos(key)] = item(entry)
+    return state
+
+
+def _read_legacy_world(snapshot: Optional[Dict]) -> Optional[Dict]:
+    if snapshot is None:
+        return None
+    return dict(snapshot, saved={key: _convert_chunk(blob) for key, blob in snapshot.get('saved', {}).items()})
+
+
+def write_save(filename: str, game):
+    with open(filename, 'wb') as f:
+        f.write(encode_game(game))
+
+
+def read_save(filename: str) -> Dict:
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if data.startswith(MAGIC):
+        return decode_game(data)
+    try:
+        save_data = _LegacyUnpickler(io.BytesIO(data)).load()
+    except SaveFormatError:
+        raise
+    except (pickle.UnpicklingError, ValueError, EOFError) as e:
+        raise SaveFormatError(f"Not a Shadows of the Abyss save file: {e}")
+    if not isinstance(save_data, dict):
+        raise SaveFormatError("Not a Shadows of the Abyss save file")
+    return read_legacy(save_data)
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def legacy_bytes(game) -> bytes:
+    """The game pickled the way saves were written before this format."""
+    def item(it):
+        return (asdict(it), it.rarity.name) if it else None
+
+    return pickle.dumps({
+        'player': asdict(game.player),
+        'player_pos': game.player_pos,
+        'dungeon_level': game.dungeon_level,
+        'inventory': [item(it) for it in game.inventory],
+        'weapon': item(game.weapon),
+        'armor': item(game.armor),
+        'amulet': item(game.amulet),
+        'message_log': game.message_log,
+        'grid': [[game.grid.get(x, y).name for x in range(game.grid.width)]
+                 for y in range(game.grid.height)],
+        'stairs_pos': game.stairs_pos,
+        'enemies': {str(pos): {'type': e.type.name, 'level': e.level, 'hp': e.hp}
+                    for pos, e in game.enemies.items()},
+        'items': {str(pos): item(it) for pos, it in game.items.items()},
+    })
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(width: int, height: int, seed: int = 1, repeat: int = 5) -> Dict[str, float]:
+    from game import Game  # game imports this module
+
+    game = Game(character_class=next(iter(CLASS_DEFS)), seed=seed)
+    game.width, game.height = width, height
+    game.generate_level()
+
+    new = encode_game(game)
+    old = legacy_bytes(game)
+    return {
+        'width': width,
+        'height': height,
+        'enemies': len(game.enemies),
+        'items': len(game.items),
+        'new_bytes': len(new),
+        'old_bytes': len(old),
+        'new_save_ms': _best_time(lambda: encode_game(game), repeat) * 1000,
+        'old_save_ms': _best_time(lambda: legacy_bytes(game), repeat) * 1000,
+        'new_load_ms': _best_time(lambda: decode_game(new), repeat) * 1000,
+        'old_load_ms': _best_time(lambda: read_legacy(pickle.loads(old)), repeat) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare save size and speed with the old pickle format")
+    parser.add_argument('--width', type=int, default=80)
+    parser.add_argument('--height', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    stats = measure(args.width, args.height, args.seed)
+    print(f"{stats['width']}x{stats['height']} floor, {stats['enemies']} enemies, {stats['items']} items")
+    print(f"  size: {stats['new_bytes']} bytes (pickle: {stats['old_bytes']}, "
+          f"{stats['old_bytes'] / stats['new_bytes']:.1f}x smaller)")
+    print(f"  save: {stats['new_save_ms']:.2f}ms (pickle: {stats['old_save_ms']:.2f}ms)")
+    print(f"  load: {stats['new_load_ms']:.2f}ms (pickle: {stats['old_load_ms']:.2f}ms)")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Multi-session game server: many players on one process.
+
+Every TCP (telnet) connection plays its own Game. Lines are read without
+blocking and fed to Game.handle_input, and each game renders into its own
+output buffer, which is sent after every command. Games are kept in a save
+archive under the name the player logs in with, and saved when they leave.
+
+    python server.py --port 4000 --archive server.arc
+    telnet localhost 4000
+"""
+
+import argparse
+import asyncio
+import io
+import re
+import signal
+from typing import Set
+
+from archive import SaveArchive
+from game import Game
+from renderer import Renderer
+
+NAME_PROMPT = "Your name: "
+# Telnet option negotiation (IAC sequences) some clients send with their input
+TELNET_IAC = re.compile(rb'\xff[\xfb-\xfe].|\xff[\xf0-\xfa]', re.DOTALL)
+MAX_NAME = 20
+
+
+class GameServer:
+    def __init__(self, archive_path: str):
+        self.archive = SaveArchive(archive_path)
+        # Names with a session open, so one save isn't played twice at once
+        self.playing: Set[str] = set()
+        self.sessions = 0
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving Shadows of the Abyss on {addresses}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.archive.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            writer.write(b"=== SHADOWS OF THE ABYSS ===\r\n" + NAME_PROMPT.encode())
+            name = await self._read_line(reader)
+            if name is None:
+                return
+            name = name.strip()[:MAX_NAME]
+            if not name:
+                writer.write(b"A name is needed to keep your game.\r\n")
+                return
+            if name in self.playing:
+                writer.write(b"That name is already playing.\r\n")
+                return
+
+            self.playing.add(name)
+            self.sessions += 1
+            try:
+                out = io.StringIO()
+                game = self._open(name, out)
+                try:
+                    await self._play(game, out, reader, writer)
+                finally:
+                    # Encoding and writing the save take a while; keep them off the event loop
+                    await asyncio.get_running_loop().run_in_executor(None, self._keep, name, game)
+            finally:
+                self.playing.discard(name)
+                self.sessions -= 1
+        except (ConnectionError, asyncio.CancelledError):
+            # The client went away, or the server is shutting down; either
+            # way the game was saved above
+            pass
+        finally:
+            writer.close()
+
+    def _keep(self, name: str, game: Game):
+        if not game.game_over:
+            self.archive.save(name, game)
+        elif name in self.archive:
+            # A dead character isn't resumed; the next login starts over
+            self.archive.delete(name)
+
+    def _open(self, name: str, out: io.StringIO) -> Game:
+        # The client's terminal size isn't known, so no wrapping is assumed
+        renderer = Renderer(out, check_terminal_size=False)
+        # No floor prefetching: taking a prefetched floor waits on the one
+        # worker every session shares, and that wait would hold the event loop
+        game = Game(skip_class_select=True, prefetch_depth=0, renderer=renderer)
+        if name in self.archive:
+            self.archive.load(name, game)
+            game.add_message(f"Welcome back, {name}!")
+        else:
+            game.mode = 'class'
+        game.archive_slot = (self.archive, name)
+        return game
+
+    async def _play(self, game: Game, out: io.StringIO, reader: asyncio.StreamReader,
+                    writer: asyncio.StreamWriter):
+        while True:
+            game.render()
+            self._send(writer, out, '' if game.game_over else game.prompt)
+            await writer.drain()
+            if game.game_over:
+                break
+            line = await self._read_line(reader)
+            if line is None:
+                break
+            if not game.handle_input(line):
+                writer.write(b"\r\nThanks for playing!\r\n")
+                break
+
+    @staticmethod
+    def _send(writer: asyncio.StreamWriter, out: io.StringIO, prompt: str):
+        # One write per command: the frame the game rendered, then the prompt
+        frame = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        writer.write((frame + prompt).encode('utf-8'))
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader):
+        """The next line from the client, or None once it has gone."""
+        try:
+            line = await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError):
+            return None
+        if not line:
+            return None
+        return TELNET_IAC.sub(b'', line).decode('utf-8', 'replace')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many games of Shadows of the Abyss")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--archive', default='server.arc', help="save archive for the players' games")
+    args = parser.parse_args()
+
+    game_server = GameServer(args.archive)
+    # Stopped like Ctrl-C, so the archive's pending index is written on the way out
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(game_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        game_server.close()
@@ -0,0 +1,95 @@
+from typing import List, Optional
+from enums import TileType
+
+# Each cell holds the byte of its tile's map character ('#', '.', ...), so a
+# row of the grid is already its own text.
+TILE_CODES = {tile: ord(tile.value) for tile in TileType}
+TILE_BY_CODE: List[Optional[TileType]] = [None] * 256
+for _tile, _code in TILE_CODES.items():
+    TILE_BY_CODE[_code] = _tile
+
+WALL = TILE_CODES[TileType.WALL]
+FLOOR = TILE_CODES[TileType.FLOOR]
+
+
+class TileGrid:
+    def __init__(self, width: int, height: int, fill: TileType = TileType.WALL,
+                 cells: Optional[bytearray] = None):
+        self.width = width
+        self.height = height
+        if cells is None:
+            cells = bytearray([TILE_CODES[fill]]) * (width * height)
+        elif len(cells) != width * height:
+            raise ValueError(f"Expected {width * height} cells, got {len(cells)}")
+        self.cells = cells
+
+    # -------------------------
+    # Cell access
+    # -------------------------
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x: int, y: int) -> TileType:
+        return TILE_BY_CODE[self.cells[y * self.width + x]]
+
+    def set(self, x: int, y: int, tile: TileType):
+        self.cells[y * self.width + x] = TILE_CODES[tile]
+
+    def code(self, x: int, y: int) -> int:
+        return self.cells[y * self.width + x]
+
+    def is_wall(self, x: int, y: int) -> bool:
+        return self.cells[y * self.width + x] == WALL
+
+    def is_floor(self, x: int, y: int) -> bool:
+        return self.cells[y * self.width + x] == FLOOR
+
+    def row(self, y: int, x1: int = 0, x2: Optional[int] = None) -> str:
+        start = y * self.width
+        end = start + (self.width if x2 is None else x2)
+        return self.cells[start + x1:end].decode('ascii')
+
+    # -------------------------
+    # Carving (clipped to the grid)
+    # -------------------------
+    def fill_rect(self, x: int, y: int, width: int, height: int, tile: TileType):
+        x1, x2 = max(0, x), min(self.width, x + width)
+        y1, y2 = max(0, y), min(self.height, y + height)
+        if x1 >= x2 or y1 >= y2:
+            return
+        span = bytes([TILE_CODES[tile]]) * (x2 - x1)
+        w = self.width
+        for row in range(y1, y2):
+            self.cells[row * w + x1:row * w + x2] = span
+
+    def fill_row(self, y: int, x1: int, x2: int, tile: TileType):
+        # Inclusive of both ends, in either order
+        self.fill_rect(min(x1, x2), y, abs(x2 - x1) + 1, 1, tile)
+
+    def fill_col(self, x: int, y1: int, y2: int, tile: TileType):
+        if not 0 <= x < self.width:
+            return
+        top, bottom = max(0, min(y1, y2)), min(self.height - 1, max(y1, y2))
+        if top > bottom:
+            return
+        w = self.width
+        self.cells[top * w + x:bottom * w + x + 1:w] = bytes([TILE_CODES[tile]]) * (bottom - top + 1)
+
+    # -------------------------
+    # Serialization
+    # -------------------------
+    def to_bytes(self) -> bytes:
+        return bytes(self.cells)
+
+    @classmethod
+    def from_bytes(cls, width: int, height: int, data: bytes) -> 'TileGrid':
+        return cls(width, height, cells=bytearray(data))
+
+    @classmethod
+    def from_tile_names(cls, rows: List[List[str]]) -> 'TileGrid':
+        # Grids from older saves were stored as rows of TileType names
+        cells = bytearray(TILE_CODES[TileType[name]] for row in rows for name in row)
+        return cls(len(rows[0]) if rows else 0, len(rows), cells=cells)
+
+    def copy(self) -> 'TileGrid':
+        return TileGrid(self.width, self.height, cells=bytearray(self.cells))
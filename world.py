@@ -0,0 +1,239 @@
+"""
+Chunked, lazily generated floors for large-world mode.
+
+The floor is a grid of square chunks. Only the chunks around the player are
+kept in memory; each is generated on demand from a seed derived from the floor
+seed and its coordinates, so a chunk that was evicted can be rebuilt exactly.
+Enemies and items of evicted chunks are kept (in the save format's tables,
+zlib-compressed) only if the player changed them.
+"""
+
+import random
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dungeon_generator import DungeonGenerator, Room
+from enums import TileType
+from savefile import decode_chunk, encode_chunk
+from tile_grid import TileGrid, WALL, FLOOR
+
+Pos = Tuple[int, int]
+# populate(chunk) -> (enemies, items) for a freshly generated chunk
+Populate = Callable[['Chunk'], Tuple[Dict[Pos, object], Dict[Pos, object]]]
+
+UNLOADED_CHAR = ' '
+
+
+class Chunk:
+    def __init__(self, cx: int, cy: int, size: int, grid: TileGrid, rooms: List[Room], rng: random.Random):
+        self.cx = cx
+        self.cy = cy
+        self.origin = (cx * size, cy * size)
+        self.size = size
+        self.grid = grid
+        # Rooms in world coordinates
+        self.rooms = rooms
+        # Continues the chunk's stream after map generation, for spawning
+        self.rng = rng
+        self.spawn_state: Optional[bytes] = None
+
+    def contains(self, pos: Pos) -> bool:
+        ox, oy = self.origin
+        return ox <= pos[0] < ox + self.size and oy <= pos[1] < oy + self.size
+
+
+class ChunkedWorld:
+    def __init__(self, seed: int, chunks_x: int, chunks_y: int, chunk_size: int = 64,
+                 load_radius: int = 1, rooms_per_chunk: int = 8, populate: Optional[Populate] = None):
+        self.seed = seed
+        self.chunks_x = chunks_x
+        self.chunks_y = chunks_y
+        self.chunk_size = chunk_size
+        self.load_radius = load_radius
+        self.rooms_per_chunk = rooms_per_chunk
+        self.populate = populate
+        self.width = chunks_x * chunk_size
+        self.height = chunks_y * chunk_size
+
+        self.chunks: Dict[Pos, Chunk] = {}
+        # Compressed enemies/items of evicted chunks the player changed
+        self.saved: Dict[Pos, bytes] = {}
+
+        rng = random.Random(seed)
+        start = (chunks_x // 2, chunks_y // 2)
+        stairs = start
+        if chunks_x * chunks_y > 1:
+            while stairs == start:
+                stairs = (rng.randrange(chunks_x), rng.randrange(chunks_y))
+        self.start_pos = self._build(*start).rooms[0].center
+        self.stairs_pos = self._build(*stairs).rooms[-1].center
+
+    # -------------------------
+    # Chunk generation
+    # -------------------------
+    def _derive(self, *key) -> int:
+        return random.Random(':'.join(str(k) for k in (self.seed,) + key)).getrandbits(64)
+
+    def _gate(self, kind: str, cx: int, cy: int) -> int:
+        # Where the corridor crosses the edge shared by two chunks; both
+        # sides derive the same offset.
+        return 2 + self._derive(kind, cx, cy) % (self.chunk_size - 4)
+
+    def _build(self, cx: int, cy: int) -> Chunk:
+        size = self.chunk_size
+        rng = random.Random(self._derive(cx, cy))
+        gen = DungeonGenerator(size, size, rng=rng)
+        grid, rooms = gen.generate(self.rooms_per_chunk)
+
+        anchor_x, anchor_y = rooms[0].center
+        gates = []
+        if cx + 1 < self.chunks_x:
+            gates.append((size - 1, self._gate('e', cx, cy)))
+        if cx > 0:
+            gates.append((0, self._gate('e', cx - 1, cy)))
+        if cy + 1 < self.chunks_y:
+            gates.append((self._gate('s', cx, cy), size - 1))
+        if cy > 0:
+            gates.append((self._gate('s', cx, cy - 1), 0))
+        for gx, gy in gates:
+            if gx in (0, size - 1):
+                grid.fill_col(anchor_x, anchor_y, gy, TileType.FLOOR)
+                grid.fill_row(gy, anchor_x, gx, TileType.FLOOR)
+            else:
+                grid.fill_row(anchor_y, anchor_x, gx, TileType.FLOOR)
+                grid.fill_col(gx, anchor_y, gy, TileType.FLOOR)
+
+        ox, oy = cx * size, cy * size
+        world_rooms = [Room(r.x + ox, r.y + oy, r.width, r.height) for r in rooms]
+        return Chunk(cx, cy, size, grid, world_rooms, rng)
+
+    # -------------------------
+    # Residency
+    # -------------------------
+    def chunk_of(self, pos: Pos) -> Pos:
+        return pos[0] // self.chunk_size, pos[1] // self.chunk_size
+
+    def _wanted(self, pos: Pos, radius: int):
+        pcx, pcy = self.chunk_of(pos)
+        for cy in range(max(0, pcy - radius), min(self.chunks_y, pcy + radius + 1)):
+            for cx in range(max(0, pcx - radius), min(self.chunks_x, pcx + radius + 1)):
+                yield cx, cy
+
+    def update(self, pos: Pos, enemies: Dict, items: Dict, populate: bool = True):
+        """Loads the chunks around pos and evicts those out of range, moving
+        their enemies and items in and out of the game's dicts."""
+        # Evict one ring further out than we load, so walking back and forth
+        # over a chunk border doesn't thrash.
+        keep = set(self._wanted(pos, self.load_radius + 1))
+        for key in [k for k in self.chunks if k not in keep]:
+            self._evict(self.chunks.pop(key), enemies, items)
+
+        for key in self._wanted(pos, self.load_radius):
+            if key not in self.chunks:
+                self._load(key, enemies, items, populate)
+
+    def _load(self, key: Pos, enemies: Dict, items: Dict, populate: bool):
+        chunk = self._build(*key)
+        self.chunks[key] = chunk
+        if not populate:
+            return
+        blob = self.saved.pop(key, None)
+        if blob is not None:
+            chunk_enemies, chunk_items = decode_chunk(zlib.decompress(blob))
+        elif self.populate is not None:
+            chunk_enemies, chunk_items = self.populate(chunk)
+        else:
+            chunk_enemies, chunk_items = {}, {}
+        chunk.spawn_state = self._pack(chunk_enemies, chunk_items)
+        enemies.update(chunk_enemies)
+        items.update(chunk_items)
+
+    def _evict(self, chunk: Chunk, enemies: Dict, items: Dict):
+        chunk_enemies = {pos: enemies.pop(pos) for pos in [p for p in enemies if chunk.contains(p)]}
+        chunk_items = {pos: items.pop(pos) for pos in [p for p in items if chunk.contains(p)]}
+        state = self._pack(chunk_enemies, chunk_items)
+        key = (chunk.cx, chunk.cy)
+        if state != chunk.spawn_state:
+            self.saved[key] = zlib.compress(state)
+        else:
+            # Untouched since it was generated; it can be rebuilt from the seed
+            self.saved.pop(key, None)
+
+    def _pack(self, enemies: Dict, items: Dict) -> bytes:
+        return encode_chunk(enemies, items)
+
+    # -------------------------
+    # Grid access (same interface as TileGrid)
+    # -------------------------
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def code(self, x: int, y: int) -> int:
+        size = self.chunk_size
+        chunk = self.chunks.get((x // size, y // size))
+        if chunk is None:
+            # Nothing walks into unloaded chunks
+            return WALL
+        return chunk.grid.cells[(y % size) * size + x % size]
+
+    def get(self, x: int, y: int) -> TileType:
+        return TileType(chr(self.code(x, y)))
+
+    def is_wall(self, x: int, y: int) -> bool:
+        return self.code(x, y) == WALL
+
+    def is_floor(self, x: int, y: int) -> bool:
+        return self.code(x, y) == FLOOR
+
+    def row(self, y: int, x1: int = 0, x2: Optional[int] = None) -> str:
+        size = self.chunk_size
+        x2 = self.width if x2 is None else x2
+        cy, ly = divmod(y, size)
+        parts = []
+        x = x1
+        while x < x2:
+            cx, lx = divmod(x, size)
+            end = min(x2, (cx + 1) * size)
+            chunk = self.chunks.get((cx, cy))
+            if chunk is None:
+                parts.append(UNLOADED_CHAR * (end - x))
+            else:
+                parts.append(chunk.grid.row(ly, lx, lx + end - x))
+            x = end
+        return ''.join(parts)
+
+    # -------------------------
+    # Save / restore
+    # -------------------------
+    def memory_stats(self) -> Dict[str, int]:
+        return {
+            'resident_chunks': len(self.chunks),
+            'resident_bytes': sum(len(c.grid.cells) for c in self.chunks.values()),
+            'saved_chunks': len(self.saved),
+            'saved_bytes': sum(len(blob) for blob in self.saved.values()),
+        }
+
+    def snapshot(self) -> Dict:
+        # Resident chunks' enemies and items live in the game's own dicts and
+        # are saved with them; only the list of chunks is needed here.
+        return {
+            'seed': self.seed,
+            'chunks': (self.chunks_x, self.chunks_y),
+            'chunk_size': self.chunk_size,
+            'load_radius': self.load_radius,
+            'rooms_per_chunk': self.rooms_per_chunk,
+            'resident': sorted(self.chunks),
+            'saved': dict(self.saved),
+        }
+
+    @classmethod
+    def restore(cls, state: Dict, populate: Optional[Populate] = None) -> 'ChunkedWorld':
+        chunks_x, chunks_y = state['chunks']
+        world = cls(state['seed'], chunks_x, chunks_y, state['chunk_size'],
+                    state['load_radius'], state['rooms_per_chunk'], populate)
+        world.saved = dict(state['saved'])
+        # Their enemies and items come back through the game's dicts; with no
+        # spawn state recorded they are kept when these chunks are evicted.
+        for key in state['resident']:
+            world.chunks[tuple(key)] = world._build(*key)
+        return world